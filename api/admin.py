@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ImageAnalysis
+from .models import ImageAnalysis, AnalysisCacheEntry, AnalysisRollup, CleanupCheckpoint, VideoAnalysis
 
 
 @admin.register(ImageAnalysis)
@@ -11,10 +11,16 @@ class ImageAnalysisAdmin(admin.ModelAdmin):
 
     fieldsets = (
         ('Image Information', {
-            'fields': ('id', 'original_image', 'processed_image')
+            'fields': ('id', 'original_image', 'processed_image', 'encoding_profile',
+                       'output_mode', 'face_crops')
         }),
         ('Analysis Results', {
-            'fields': ('status', 'total_faces', 'blurred_faces', 'face_data')
+            'fields': ('status', 'total_faces', 'blurred_faces', 'blur_threshold',
+                       'apply_correction', 'face_data', 'statistics')
+        }),
+        ('Performance', {
+            'fields': ('stage_timings',),
+            'classes': ('collapse',)
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at', 'processed_at')
@@ -23,4 +29,34 @@ class ImageAnalysisAdmin(admin.ModelAdmin):
             'fields': ('error_message',),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(AnalysisCacheEntry)
+class AnalysisCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'analysis', 'blur_threshold', 'apply_correction',
+                    'algorithm_version', 'hits', 'last_used_at']
+    search_fields = ['content_hash']
+    readonly_fields = ['cache_key', 'created_at', 'last_used_at']
+
+
+@admin.register(AnalysisRollup)
+class AnalysisRollupAdmin(admin.ModelAdmin):
+    list_display = ['period', 'bucket_start', 'completed', 'failed', 'total_faces',
+                    'blurred_faces', 'updated_at']
+    list_filter = ['period']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(CleanupCheckpoint)
+class CleanupCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['name', 'cutoff', 'rows_deleted', 'bytes_freed', 'locked_until', 'started_at', 'updated_at']
+    readonly_fields = ['started_at', 'updated_at']
+
+
+@admin.register(VideoAnalysis)
+class VideoAnalysisAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'frames_processed', 'detect_every', 'frame_stride', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['id']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'processed_at']
@@ -0,0 +1,658 @@
+import os
+import threading
+import tracemalloc
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import result_cache
+from .compute import ComputeQueueFull, get_compute_executor
+from .metrics import observe_analysis
+from .models import ImageAnalysis
+from .rollups import apply_rollup_changes, compute_statistics, refresh_contribution
+from .services.batch import analyze_image_file, get_process_pool
+from .singleflight import SingleFlight
+from .services.encoding import (
+    DEFAULT_PROFILE,
+    FORMAT_EXTENSIONS,
+    EncodingProfile,
+    build_encoding_profiles,
+    get_encode_executor
+)
+from .services.pipeline import (
+    OUTPUT_MODES,
+    AnalysisContext,
+    AnalysisPipeline,
+    PipelineStage,
+    blurred_face_ids,
+    build_default_pipeline,
+    build_reevaluation_pipeline,
+    build_render_pipeline
+)
+
+_persist_executor = None
+_persist_executor_lock = threading.Lock()
+_render_flight = SingleFlight()
+
+BATCH_UPDATE_FIELDS = [
+    'status',
+    'total_faces',
+    'blurred_faces',
+    'face_data',
+    'blur_threshold',
+    'apply_correction',
+    'stage_timings',
+    'statistics',
+    'rollup_contribution',
+    'processed_image',
+    'encoding_profile',
+    'output_mode',
+    'face_crops',
+    'processed_at',
+    'error_message',
+    'updated_at',
+]
+
+
+def get_encoding_profiles() -> Dict[str, EncodingProfile]:
+    return build_encoding_profiles(getattr(settings, 'ENCODING_PROFILES', None))
+
+
+def get_encoding_profile(name: str = None) -> EncodingProfile:
+    """The profile called ``name``, or OUTPUT_ENCODING_PROFILE when omitted"""
+    name = name or getattr(settings, 'OUTPUT_ENCODING_PROFILE', DEFAULT_PROFILE)
+    profiles = get_encoding_profiles()
+    if name not in profiles:
+        raise ValueError(f"Unknown encoding profile '{name}', use {', '.join(profiles)}")
+
+    return profiles[name]
+
+
+def get_output_mode(name: str = None) -> str:
+    """``name``, or OUTPUT_MODE when omitted"""
+    name = name or getattr(settings, 'OUTPUT_MODE', 'full')
+    if name not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode '{name}', use {', '.join(OUTPUT_MODES)}")
+
+    return name
+
+
+def get_pipeline_options(blur_threshold: float = 100.0, apply_correction: bool = True,
+                         encoding_profile: str = None, output_mode: str = None) -> Dict:
+    return {
+        'blur_threshold': blur_threshold,
+        'apply_correction': apply_correction,
+        'detection_max_side': getattr(settings, 'FACE_DETECTION_MAX_SIDE', None),
+        'refine_detections': getattr(settings, 'FACE_DETECTION_REFINE', True),
+        'metrics_decode_reduction': getattr(settings, 'ANALYSIS_METRICS_DECODE_REDUCTION', 1),
+        'tiled_min_pixels': getattr(settings, 'FACE_DETECTION_TILED_MIN_PIXELS', None),
+        'tile_size': getattr(settings, 'FACE_DETECTION_TILE_SIZE', 1024),
+        'tile_workers': getattr(settings, 'FACE_DETECTION_TILE_WORKERS', None),
+        'encoding': get_encoding_profile(encoding_profile).as_dict(),
+        'lazy_correction': getattr(settings, 'LAZY_CORRECTION', False),
+        'output_mode': get_output_mode(output_mode),
+    }
+
+
+def get_processed_path(analysis, encoding: Dict = None) -> str:
+    extension = FORMAT_EXTENSIONS[encoding['format']] if encoding else '.jpg'
+    return os.path.join('media', 'processed', f'processed_{analysis.id}{extension}')
+
+
+def get_crops_path(analysis, encoding: Dict) -> str:
+    """Face crop path template, formatted with ``face_id``"""
+    extension = FORMAT_EXTENSIONS[encoding['format']]
+    return os.path.join('media', 'processed', 'crops', f'{analysis.id}_face_{{face_id}}{extension}')
+
+
+def build_context(analysis: ImageAnalysis, options: Dict, image_bytes: bytes = None) -> AnalysisContext:
+    context = AnalysisContext(
+        image_path=analysis.original_image.path,
+        output_path=get_processed_path(analysis, options['encoding']),
+        crops_path=get_crops_path(analysis, options['encoding']),
+        image_bytes=image_bytes,
+        **options
+    )
+    if getattr(settings, 'ENCODE_IN_BACKGROUND', True):
+        context.encode_executor = get_encode_executor(getattr(settings, 'ENCODE_WORKERS', None))
+
+    return context
+
+
+def get_persist_executor() -> ThreadPoolExecutor:
+    global _persist_executor
+
+    with _persist_executor_lock:
+        if _persist_executor is None:
+            _persist_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'FILE_PERSIST_WORKERS', 2),
+                thread_name_prefix='persist-original'
+            )
+        return _persist_executor
+
+
+def create_analysis_from_bytes(filename: str, data: bytes,
+                               content_hash: str = None) -> Tuple[ImageAnalysis, Future]:
+    """
+    Create the row for an upload that is analyzed from memory. The original
+    file is written on a background thread; the returned future resolves to
+    the name it was stored under.
+    """
+    image_field = ImageAnalysis._meta.get_field('original_image')
+    name = default_storage.get_available_name(image_field.generate_filename(None, filename))
+    analysis = ImageAnalysis.objects.create(
+        original_image=name,
+        status='pending',
+        content_hash=content_hash
+    )
+    future = get_persist_executor().submit(default_storage.save, name, ContentFile(data))
+
+    return analysis, future
+
+
+class DatabaseSaveStage(PipelineStage):
+    name = 'db_save'
+
+    def __init__(self, analysis, persist_future: Future = None):
+        self.analysis = analysis
+        self.persist_future = persist_future
+
+    def run(self, context):
+        analysis = self.analysis
+        if self.persist_future is not None:
+            analysis.original_image.name = self.persist_future.result()
+        apply_results(analysis, context)
+        save_with_rollups(analysis)
+
+
+def apply_results(analysis: ImageAnalysis, context: AnalysisContext):
+    context.wait_for_encode()
+    if context.apply_correction:
+        apply_output(
+            analysis,
+            context.output_mode,
+            context.encoding.name,
+            output_path=context.output_path if context.encoded_image is not None else None,
+            face_crops=context.face_crops,
+            clear_stale=context.lazy_correction and context.output_stale
+        )
+    elif blurred_face_ids(analysis.face_data) != blurred_face_ids(context.face_data):
+        # Nothing is rendered this time, and the stored output shows the old blurred set
+        clear_processed_image(analysis, analysis.encoding_profile)
+        set_face_crops(analysis, [])
+
+    analysis.total_faces = context.blur_stats['total_faces']
+    analysis.blurred_faces = context.blur_stats['blurred_faces']
+    analysis.face_data = context.face_data
+    analysis.blur_threshold = context.blur_threshold
+    analysis.apply_correction = context.apply_correction
+    analysis.stage_timings = context.stage_timings
+    analysis.statistics = compute_statistics(
+        analysis.face_data, analysis.total_faces, analysis.blurred_faces
+    )
+    analysis.status = 'completed'
+    analysis.processed_at = timezone.now()
+
+
+def apply_output(analysis: ImageAnalysis, output_mode: str, encoding_profile: str,
+                 output_path: str = None, face_crops: List[Dict] = None, clear_stale: bool = False):
+    """
+    Point the row at the correction output of a run and drop what it
+    replaced: the files of another output mode and, with ``clear_stale``,
+    a processed image that no longer matches the results.
+    """
+    if output_path:
+        set_processed_image(analysis, output_path.replace('media/', ''), encoding_profile)
+    elif output_mode != 'full' or clear_stale:
+        clear_processed_image(analysis, encoding_profile)
+
+    if face_crops is not None:
+        set_face_crops(analysis, face_crops)
+    elif output_mode != 'crops':
+        set_face_crops(analysis, [])
+    analysis.output_mode = output_mode
+
+
+def has_output(analysis: ImageAnalysis, output_mode: str, encoding_profile: str) -> bool:
+    """Whether the stored correction output is of ``output_mode`` and ``encoding_profile``"""
+    if analysis.output_mode != output_mode:
+        return False
+    if output_mode == 'overlay':
+        return True
+    if (analysis.encoding_profile or DEFAULT_PROFILE) != encoding_profile:
+        return False
+    if output_mode == 'crops':
+        return len(analysis.face_crops) == analysis.total_faces and all(
+            os.path.exists(default_storage.path(crop['image'])) for crop in analysis.face_crops
+        )
+
+    return bool(analysis.processed_image) and os.path.exists(analysis.processed_image.path)
+
+
+def set_face_crops(analysis: ImageAnalysis, face_crops: List[Dict]):
+    crops = [
+        {'face_id': crop['face_id'], 'image': crop['path'].replace('media/', '')}
+        for crop in face_crops
+    ]
+    names = {crop['image'] for crop in crops}
+    for crop in analysis.face_crops:
+        if crop['image'] not in names:
+            _remove_media(crop['image'])
+    analysis.face_crops = crops
+
+
+def remove_output_files(analysis: ImageAnalysis):
+    if analysis.processed_image:
+        _remove_media(analysis.processed_image.name)
+    for crop in analysis.face_crops:
+        _remove_media(crop['image'])
+
+
+def _remove_media(name: str):
+    try:
+        os.remove(default_storage.path(name))
+    except FileNotFoundError:
+        pass
+
+
+def set_processed_image(analysis: ImageAnalysis, name: str, encoding_profile: str):
+    # A new output format means a new file name; drop the old file
+    if analysis.processed_image and analysis.processed_image.name != name:
+        try:
+            os.remove(analysis.processed_image.path)
+        except FileNotFoundError:
+            pass
+    analysis.processed_image = name
+    analysis.encoding_profile = encoding_profile
+
+
+def clear_processed_image(analysis: ImageAnalysis, encoding_profile: str):
+    """Drop an outdated processed image; the next fetch renders it with ``encoding_profile``"""
+    if analysis.processed_image:
+        try:
+            os.remove(analysis.processed_image.path)
+        except FileNotFoundError:
+            pass
+    analysis.processed_image = None
+    analysis.encoding_profile = encoding_profile
+
+
+def render_processed_image(analysis: ImageAnalysis) -> ImageAnalysis:
+    """
+    Render the processed image of a lazily corrected analysis from its
+    stored face data, if that has not happened yet. Concurrent calls in
+    this process share one render; across processes the row lock makes
+    later callers find the image already written.
+    """
+    return _render_flight.do(analysis.pk, _render_processed_image, analysis.pk)
+
+
+def _render_processed_image(pk) -> ImageAnalysis:
+    with transaction.atomic():
+        analysis = ImageAnalysis.objects.select_for_update().get(pk=pk)
+        if not analysis.output_pending:
+            return analysis
+
+        options = get_pipeline_options(analysis.blur_threshold, True, analysis.encoding_profile, 'full')
+        options['lazy_correction'] = False
+        context = AnalysisContext(
+            image_path=analysis.original_image.path,
+            output_path=get_processed_path(analysis, options['encoding']),
+            **options
+        )
+        context.face_data = analysis.face_data
+        build_render_pipeline().run(context)
+
+        set_processed_image(analysis, context.output_path.replace('media/', ''), context.encoding.name)
+        analysis.stage_timings = analysis.stage_timings + [
+            dict(timing, deferred=True) for timing in context.stage_timings
+        ]
+        analysis.save(update_fields=['processed_image', 'encoding_profile', 'stage_timings', 'updated_at'])
+
+    return analysis
+
+
+def save_with_rollups(analysis: ImageAnalysis):
+    """Save a finished analysis and move its rollup contribution in the same transaction"""
+    with transaction.atomic():
+        changes = refresh_contribution(analysis)
+        analysis.save()
+        apply_rollup_changes(changes)
+
+
+def bulk_save_with_rollups(analyses: List[ImageAnalysis]):
+    with transaction.atomic():
+        changes = [change for analysis in analyses for change in refresh_contribution(analysis)]
+        ImageAnalysis.objects.bulk_update(analyses, BATCH_UPDATE_FIELDS, batch_size=200)
+        apply_rollup_changes(changes)
+
+
+def run_analysis(analysis, blur_threshold: float = 100.0,
+                 apply_correction: bool = True, image_bytes: bytes = None,
+                 persist_future: Future = None, encoding_profile: str = None,
+                 output_mode: str = None) -> AnalysisContext:
+    """
+    Run the full analysis pipeline for ``analysis`` and persist the results,
+    including the per-stage timings. On failure the row is marked as failed
+    and the exception is re-raised for the caller to report or retry.
+
+    With ``image_bytes`` the image is decoded from memory; ``persist_future``
+    is the pending write of the original file, joined before the row is saved.
+    Rows with a ``content_hash`` are (re-)registered in the result cache.
+    The processed image is written with ``encoding_profile`` (default
+    OUTPUT_ENCODING_PROFILE), on the encode threads unless
+    ENCODE_IN_BACKGROUND is off. With LAZY_CORRECTION it is left for
+    ``render_processed_image`` on first fetch. ``output_mode`` (default
+    OUTPUT_MODE) picks the full frame, per-face crops or no pixels at all.
+    """
+    context, options = prepare_analysis(
+        analysis, blur_threshold, apply_correction, image_bytes, encoding_profile, output_mode
+    )
+    pipeline = build_default_pipeline().with_stages(DatabaseSaveStage(analysis, persist_future))
+
+    return _run_pipeline(pipeline, context, analysis, options, persist_future)
+
+
+async def run_analysis_async(analysis, blur_threshold: float = 100.0,
+                             apply_correction: bool = True, image_bytes: bytes = None,
+                             persist_future: Future = None,
+                             encoding_profile: str = None,
+                             output_mode: str = None) -> AnalysisContext:
+    """
+    ``run_analysis`` for the async views: the pixel stages run on the
+    bounded compute executor and the database work through ``sync_to_async``,
+    so the event loop is never blocked.
+    """
+    previous_status = analysis.status
+    context, options = await sync_to_async(prepare_analysis)(
+        analysis, blur_threshold, apply_correction, image_bytes, encoding_profile, output_mode
+    )
+
+    return await _run_pipeline_async(
+        build_default_pipeline(), context, analysis, options, persist_future, previous_status
+    )
+
+
+def prepare_analysis(analysis, blur_threshold: float = 100.0, apply_correction: bool = True,
+                     image_bytes: bytes = None, encoding_profile: str = None,
+                     output_mode: str = None) -> Tuple[AnalysisContext, Dict]:
+    if getattr(settings, 'ANALYSIS_TRACE_ALLOCATIONS', False) and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    analysis.status = 'processing'
+    analysis.save()
+    if analysis.content_hash:
+        result_cache.invalidate(analysis)
+
+    options = get_pipeline_options(blur_threshold, apply_correction, encoding_profile, output_mode)
+
+    return build_context(analysis, options, image_bytes), options
+
+
+def run_analysis_batch(analyses: List[ImageAnalysis], blur_threshold: float = 100.0,
+                       apply_correction: bool = True, encoding_profile: str = None,
+                       output_mode: str = None) -> List[ImageAnalysis]:
+    """
+    Analyze ``analyses`` one after another in this process with the warm
+    services and write them all back with a single ``bulk_update``. An image
+    that fails is marked as failed without affecting the rest of the batch.
+
+    With background encoding, each image is encoded while the next one is
+    decoded and scored. At most one encode is pending at a time.
+    """
+    options = get_pipeline_options(blur_threshold, apply_correction, encoding_profile, output_mode)
+    pipeline = build_default_pipeline()
+    result_cache.invalidate_many([analysis for analysis in analyses if analysis.content_hash])
+
+    def finish(analysis, context, error=None):
+        if error is None:
+            try:
+                apply_results(analysis, context)
+            except Exception as e:
+                error = e
+        if error is None:
+            observe_analysis(context.stage_timings, context.blur_stats)
+        else:
+            observe_analysis(context.stage_timings, error=error)
+            analysis.status = 'failed'
+            analysis.error_message = str(error)
+            analysis.stage_timings = context.stage_timings
+            analysis.processed_at = timezone.now()
+        analysis.updated_at = analysis.processed_at
+
+    pending = None
+    for analysis in analyses:
+        context = build_context(analysis, options)
+        try:
+            pipeline.run(context)
+        except Exception as e:
+            finish(analysis, context, e)
+            continue
+
+        if pending is not None:
+            finish(*pending)
+        pending = (analysis, context)
+
+    if pending is not None:
+        finish(*pending)
+
+    bulk_save_with_rollups(analyses)
+
+    for analysis in analyses:
+        if analysis.content_hash:
+            result_cache.store(analysis, analysis.content_hash, options)
+
+    return analyses
+
+
+def can_reevaluate(analysis: ImageAnalysis) -> bool:
+    return analysis.status == 'completed' and all(
+        'blur_analysis' in face for face in analysis.face_data
+    )
+
+
+def reevaluate_analysis(analysis: ImageAnalysis, blur_threshold: float = 100.0,
+                        apply_correction: bool = True, encoding_profile: str = None,
+                        output_mode: str = None) -> AnalysisContext:
+    """
+    Re-derive ``is_blurred``, ``blur_level`` and the totals of a completed
+    analysis for a new threshold from its stored per-face scores. The
+    image is only decoded and re-rendered when correction output is
+    requested and the set of blurred faces changed, or none was rendered
+    with the requested encoding profile and output mode.
+    """
+    context, options = prepare_reevaluation(
+        analysis, blur_threshold, apply_correction, encoding_profile, output_mode
+    )
+    pipeline = build_reevaluation_pipeline().with_stages(DatabaseSaveStage(analysis))
+
+    return _run_pipeline(pipeline, context, analysis, options)
+
+
+async def reevaluate_analysis_async(analysis: ImageAnalysis, blur_threshold: float = 100.0,
+                                    apply_correction: bool = True,
+                                    encoding_profile: str = None,
+                                    output_mode: str = None) -> AnalysisContext:
+    context, options = await sync_to_async(prepare_reevaluation)(
+        analysis, blur_threshold, apply_correction, encoding_profile, output_mode
+    )
+
+    return await _run_pipeline_async(build_reevaluation_pipeline(), context, analysis, options)
+
+
+def prepare_reevaluation(analysis: ImageAnalysis, blur_threshold: float = 100.0,
+                         apply_correction: bool = True, encoding_profile: str = None,
+                         output_mode: str = None) -> Tuple[AnalysisContext, Dict]:
+    if analysis.content_hash:
+        result_cache.invalidate(analysis)
+
+    options = get_pipeline_options(blur_threshold, apply_correction, encoding_profile, output_mode)
+    context = build_context(analysis, options)
+    context.face_data = analysis.face_data
+    context.output_exists = has_output(analysis, context.output_mode, context.encoding.name)
+
+    return context, options
+
+
+def _run_pipeline(pipeline, context: AnalysisContext, analysis: ImageAnalysis,
+                  options: Dict, persist_future: Future = None) -> AnalysisContext:
+    try:
+        pipeline.run(context)
+    except Exception as e:
+        _mark_failed(context, analysis, e, persist_future)
+        raise
+
+    observe_analysis(context.stage_timings, context.blur_stats)
+
+    # The db_save stage cannot persist its own timing, so store it separately
+    ImageAnalysis.objects.filter(pk=analysis.pk).update(stage_timings=context.stage_timings)
+    analysis.stage_timings = context.stage_timings
+
+    if analysis.content_hash:
+        result_cache.store(analysis, analysis.content_hash, options)
+
+    return context
+
+
+async def _run_pipeline_async(pipeline, context: AnalysisContext, analysis: ImageAnalysis,
+                              options: Dict, persist_future: Future = None,
+                              previous_status: str = None) -> AnalysisContext:
+    try:
+        await get_compute_executor().run(pipeline.run, context)
+    except ComputeQueueFull:
+        # Rejected before anything ran: the row keeps its previous state
+        if previous_status is not None and analysis.status != previous_status:
+            analysis.status = previous_status
+            await ImageAnalysis.objects.filter(pk=analysis.pk).aupdate(
+                status=previous_status,
+                updated_at=timezone.now()
+            )
+        raise
+    except Exception as e:
+        await sync_to_async(_mark_failed)(context, analysis, e, persist_future)
+        raise
+
+    save_pipeline = AnalysisPipeline([DatabaseSaveStage(analysis, persist_future)])
+    return await sync_to_async(_run_pipeline)(save_pipeline, context, analysis, options, persist_future)
+
+
+def _mark_failed(context: AnalysisContext, analysis: ImageAnalysis, error: Exception,
+                 persist_future: Future = None):
+    observe_analysis(context.stage_timings, error=error)
+    if persist_future is not None:
+        analysis.original_image.name = persist_future.result()
+    analysis.status = 'failed'
+    analysis.error_message = str(error)
+    analysis.stage_timings = context.stage_timings
+    analysis.processed_at = timezone.now()
+    save_with_rollups(analysis)
+
+
+def create_analyses_from_uploads(uploads) -> List[ImageAnalysis]:
+    """Store the uploaded files and create their rows with a single INSERT"""
+    image_field = ImageAnalysis._meta.get_field('original_image')
+    analyses = []
+    for upload in uploads:
+        name = default_storage.save(image_field.generate_filename(None, upload.name), upload)
+        analyses.append(ImageAnalysis(original_image=name, status='processing'))
+
+    return ImageAnalysis.objects.bulk_create(analyses)
+
+
+def run_batch_analysis(analyses: List[ImageAnalysis], blur_threshold: float = 100.0,
+                       apply_correction: bool = True, encoding_profile: str = None,
+                       output_mode: str = None) -> Iterator[ImageAnalysis]:
+    """
+    Fan ``analyses`` out over the shared process pool and yield each result
+    as soon as its worker finishes. Rows are written back with one
+    ``bulk_update`` once the batch is done or the consumer stops iterating;
+    in the latter case the rows without a result are marked failed and
+    whatever their still running workers write is removed.
+    """
+    pool = get_process_pool(getattr(settings, 'BATCH_MAX_WORKERS', None))
+    options = get_pipeline_options(blur_threshold, apply_correction, encoding_profile, output_mode)
+    futures = {
+        pool.submit(
+            analyze_image_file,
+            analysis.original_image.path,
+            get_processed_path(analysis, options['encoding']),
+            crops_path=get_crops_path(analysis, options['encoding']),
+            **options
+        ): analysis
+        for analysis in analyses
+    }
+
+    finished = []
+    try:
+        for future in as_completed(futures):
+            analysis = futures[future]
+            analysis.processed_at = timezone.now()
+            analysis.updated_at = analysis.processed_at
+            try:
+                result = future.result()
+            except Exception as e:
+                observe_analysis([], error=e)
+                analysis.status = 'failed'
+                analysis.error_message = str(e)
+            else:
+                observe_analysis(result['stage_timings'], result['blur_stats'])
+                analysis.status = 'completed'
+                analysis.total_faces = result['blur_stats']['total_faces']
+                analysis.blurred_faces = result['blur_stats']['blurred_faces']
+                analysis.face_data = result['face_data']
+                analysis.blur_threshold = blur_threshold
+                analysis.apply_correction = apply_correction
+                analysis.stage_timings = result['stage_timings']
+                analysis.statistics = compute_statistics(
+                    analysis.face_data, analysis.total_faces, analysis.blurred_faces
+                )
+                if apply_correction:
+                    apply_output(
+                        analysis,
+                        options['output_mode'],
+                        options['encoding']['name'],
+                        output_path=result['output_path'],
+                        face_crops=result['face_crops'],
+                        clear_stale=options['lazy_correction']
+                    )
+            finished.append(analysis)
+
+            yield analysis
+    finally:
+        recorded = {analysis.pk for analysis in finished}
+        for future, analysis in futures.items():
+            if analysis.pk in recorded:
+                continue
+            if not future.cancel():
+                # The worker may be overwriting this row's outputs right now
+                future.add_done_callback(_discard_batch_output)
+                remove_output_files(analysis)
+                analysis.processed_image = None
+                analysis.face_crops = []
+            analysis.status = 'failed'
+            analysis.error_message = 'Batch stopped before this image was analyzed'
+            analysis.processed_at = timezone.now()
+            analysis.updated_at = analysis.processed_at
+            finished.append(analysis)
+        bulk_save_with_rollups(finished)
+
+
+def _discard_batch_output(future: Future):
+    """Remove the files a batch worker wrote for a row that never recorded them"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    paths = [crop['path'] for crop in result['face_crops'] or []]
+    if result['output_path']:
+        paths.append(result['output_path'])
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,334 @@
+"""
+Async (ASGI) versions of the ``ImageAnalysisViewSet`` actions.
+
+Under an ASGI server the request body is received on the event loop, so
+slow uploads do not hold a thread. Database work goes through
+``sync_to_async`` and the OpenCV stages run on the bounded compute executor
+(``api.compute``), which lets one process keep many requests in flight
+while the executor keeps the cores busy. Responses match the sync views.
+"""
+import json
+import os
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.utils.decorators import method_decorator
+from django.utils import timezone
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from .analysis import (
+    can_reevaluate,
+    create_analysis_from_bytes,
+    get_pipeline_options,
+    reevaluate_analysis_async,
+    remove_output_files,
+    run_analysis_async
+)
+from .batching import QueueUnavailable, queue_analyses
+from .cache import hash_content, result_cache
+from .compute import ComputeQueueFull, get_compute_executor
+from .models import ImageAnalysis
+from .pagination import AnalysisCursorPagination
+from .rollups import delete_analyses
+from .serializers import (
+    AnalysisListQuerySerializer,
+    AnalyzeImageSerializer,
+    ImageAnalysisDetailSerializer,
+    ImageAnalysisSerializer,
+    ImageUploadSerializer,
+    ReevaluateSerializer
+)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAnalysisView(View):
+    http_method_names = []
+
+    def get_data(self, request):
+        """``(data, error_response)``; a malformed JSON body is a 400, as in the DRF views"""
+        if request.content_type == 'application/json':
+            try:
+                return json.loads(request.body or b'{}'), None
+            except ValueError as e:
+                return None, JsonResponse({'detail': f'JSON parse error - {e}'}, status=400)
+
+        data = request.POST.copy()
+        data.update(request.FILES)
+        return data, None
+
+    async def get_analysis(self, pk) -> ImageAnalysis:
+        try:
+            return await ImageAnalysis.objects.aget(pk=pk)
+        except (ImageAnalysis.DoesNotExist, ValueError):
+            raise Http404('No ImageAnalysis matches the given query.')
+
+    async def serialize(self, request, instance, serializer_class, **kwargs):
+        def render():
+            return serializer_class(instance, context={'request': request}, **kwargs).data
+
+        return await sync_to_async(render)()
+
+    async def reevaluate(self, request, analysis, blur_threshold, apply_correction,
+                         encoding_profile=None, output_mode=None):
+        try:
+            await reevaluate_analysis_async(
+                analysis,
+                blur_threshold=blur_threshold,
+                apply_correction=apply_correction,
+                encoding_profile=encoding_profile,
+                output_mode=output_mode
+            )
+        except ComputeQueueFull as e:
+            return self.overloaded(e)
+        except Exception as e:
+            return JsonResponse({
+                'error': 'Image re-evaluation failed',
+                'detail': str(e)
+            }, status=500)
+
+        return JsonResponse({
+            'message': 'Image analysis re-evaluated',
+            'data': await self.serialize(request, analysis, ImageAnalysisDetailSerializer)
+        })
+
+    def overloaded(self, error):
+        return JsonResponse({
+            'error': 'Server busy',
+            'detail': str(error)
+        }, status=503)
+
+
+class AsyncImageListView(AsyncAnalysisView):
+    http_method_names = ['get']
+
+    async def get(self, request):
+        query = AnalysisListQuerySerializer(data=request.GET)
+        if not query.is_valid():
+            return JsonResponse(query.errors, status=400)
+
+        def render():
+            drf_request = Request(request)
+            paginator = AnalysisCursorPagination()
+            page = paginator.paginate_queryset(
+                query.filter_queryset(ImageAnalysis.objects.all()),
+                drf_request
+            )
+            serializer = ImageAnalysisSerializer(
+                page,
+                many=True,
+                fields=query.get_fields_to_render(),
+                context={'request': request}
+            )
+            return {
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'data': serializer.data
+            }
+
+        try:
+            return JsonResponse(await sync_to_async(render)())
+        except NotFound as e:
+            return JsonResponse({'detail': str(e.detail)}, status=404)
+
+
+class AsyncUploadView(AsyncAnalysisView):
+    http_method_names = ['post']
+
+    async def post(self, request):
+        data, error_response = self.get_data(request)
+        if error_response is not None:
+            return error_response
+
+        serializer = ImageUploadSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        analysis = await sync_to_async(ImageAnalysis.objects.create)(
+            original_image=serializer.validated_data['image'],
+            status='pending'
+        )
+
+        return JsonResponse({
+            'message': 'Image uploaded successfully',
+            'data': await self.serialize(request, analysis, ImageAnalysisSerializer)
+        }, status=201)
+
+
+class AsyncAnalyzeView(AsyncAnalysisView):
+    http_method_names = ['post']
+
+    async def post(self, request):
+        data, error_response = self.get_data(request)
+        if error_response is not None:
+            return error_response
+
+        serializer = AnalyzeImageSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        data = serializer.validated_data
+        blur_threshold = data.get('blur_threshold', 100.0)
+        apply_correction = data.get('apply_correction', True)
+        encoding_profile = data.get('encoding_profile')
+        output_mode = data.get('output_mode')
+        executor = get_compute_executor()
+
+        image_bytes = None
+        persist_future = None
+        if data.get('image_id'):
+            analysis = await self.get_analysis(data['image_id'])
+            if can_reevaluate(analysis) and not data.get('force_reanalyze', False):
+                return await self.reevaluate(
+                    request, analysis, blur_threshold, apply_correction, encoding_profile, output_mode
+                )
+        else:
+            upload = data['image']
+            upload.seek(0)
+            image_bytes = upload.read()
+            try:
+                content_hash = await executor.run(hash_content, image_bytes)
+            except ComputeQueueFull as e:
+                return self.overloaded(e)
+
+            cached = await sync_to_async(result_cache.lookup)(
+                content_hash,
+                get_pipeline_options(blur_threshold, apply_correction, encoding_profile, output_mode)
+            )
+            if cached is not None:
+                return JsonResponse({
+                    'message': 'Image analysis completed (cached result)',
+                    'cached': True,
+                    'data': await self.serialize(request, cached, ImageAnalysisDetailSerializer)
+                })
+
+            if not data.get('async_processing', False):
+                analysis, persist_future = await sync_to_async(create_analysis_from_bytes)(
+                    upload.name,
+                    image_bytes,
+                    content_hash=content_hash
+                )
+            else:
+                upload.seek(0)
+                analysis = await sync_to_async(ImageAnalysis.objects.create)(
+                    original_image=upload,
+                    status='processing',
+                    content_hash=content_hash
+                )
+
+        if data.get('async_processing', False):
+            if analysis.status != 'processing':
+                await ImageAnalysis.objects.filter(pk=analysis.pk).aupdate(
+                    status='processing',
+                    updated_at=timezone.now()
+                )
+            # Publishing talks to the broker, so keep it off the loop
+            try:
+                task_id, = await sync_to_async(queue_analyses)(
+                    [analysis.id],
+                    blur_threshold,
+                    apply_correction,
+                    encoding_profile,
+                    output_mode
+                )
+            except QueueUnavailable as e:
+                return JsonResponse({
+                    'error': 'Could not queue analysis',
+                    'detail': str(e)
+                }, status=503)
+
+            return JsonResponse({
+                'message': 'Image processing started',
+                'task_id': task_id,
+                'analysis_id': str(analysis.id),
+                'status': 'processing'
+            }, status=202)
+
+        try:
+            await run_analysis_async(
+                analysis,
+                blur_threshold=blur_threshold,
+                apply_correction=apply_correction,
+                image_bytes=image_bytes,
+                persist_future=persist_future,
+                encoding_profile=encoding_profile,
+                output_mode=output_mode
+            )
+        except ComputeQueueFull as e:
+            return self.overloaded(e)
+        except Exception as e:
+            return JsonResponse({
+                'error': 'Image processing failed',
+                'detail': str(e)
+            }, status=500)
+
+        return JsonResponse({
+            'message': 'Image analysis completed',
+            'data': await self.serialize(request, analysis, ImageAnalysisDetailSerializer)
+        })
+
+
+class AsyncReevaluateView(AsyncAnalysisView):
+    http_method_names = ['post']
+
+    async def post(self, request, pk):
+        data, error_response = self.get_data(request)
+        if error_response is not None:
+            return error_response
+
+        serializer = ReevaluateSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        analysis = await self.get_analysis(pk)
+        if not can_reevaluate(analysis):
+            return JsonResponse({
+                'error': 'Analysis has no stored scores to re-evaluate',
+                'detail': f"Status is '{analysis.status}'"
+            }, status=409)
+
+        return await self.reevaluate(
+            request,
+            analysis,
+            serializer.validated_data.get('blur_threshold', 100.0),
+            serializer.validated_data.get('apply_correction', True),
+            serializer.validated_data.get('encoding_profile'),
+            serializer.validated_data.get('output_mode')
+        )
+
+
+class AsyncImageDetailView(AsyncAnalysisView):
+    http_method_names = ['get', 'delete']
+
+    async def get(self, request, pk):
+        analysis = await self.get_analysis(pk)
+
+        return JsonResponse({
+            'data': await self.serialize(request, analysis, ImageAnalysisDetailSerializer)
+        })
+
+    async def delete(self, request, pk):
+        analysis = await self.get_analysis(pk)
+
+        def remove_files():
+            if analysis.original_image and os.path.exists(analysis.original_image.path):
+                os.remove(analysis.original_image.path)
+            remove_output_files(analysis)
+
+        await sync_to_async(remove_files, thread_sensitive=False)()
+        await sync_to_async(delete_analyses)([analysis])
+
+        return JsonResponse(
+            {'message': 'Image analysis deleted successfully'},
+            status=204
+        )
+
+
+class AsyncComputeStatsView(AsyncAnalysisView):
+    http_method_names = ['get']
+
+    async def get(self, request):
+        return JsonResponse({'data': get_compute_executor().stats()})
+
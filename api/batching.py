@@ -0,0 +1,51 @@
+import logging
+from typing import List
+
+from django.conf import settings
+from django.utils import timezone
+
+from .analysis import save_with_rollups
+from .models import ImageAnalysis
+from .tasks import process_images_batch
+
+logger = logging.getLogger(__name__)
+
+
+class QueueUnavailable(Exception):
+    """A batch could not be published; its rows and the ones after it are marked failed"""
+
+
+def queue_analyses(analysis_ids, blur_threshold: float = 100.0, apply_correction: bool = True,
+                   encoding_profile: str = None, output_mode: str = None,
+                   batch_size: int = None) -> List[str]:
+    """
+    Publish ``analysis_ids`` as ``process_images_batch`` tasks of up to
+    ANALYSIS_TASK_BATCH_SIZE IDs and return their task ids. Every batch is
+    on the broker before this returns, so a task id handed to a client
+    always refers to a published task.
+    """
+    batch_size = batch_size or getattr(settings, 'ANALYSIS_TASK_BATCH_SIZE', 32)
+    ids = [str(analysis_id) for analysis_id in analysis_ids]
+
+    task_ids = []
+    for start in range(0, len(ids), batch_size):
+        try:
+            task = process_images_batch.apply_async(
+                args=(ids[start:start + batch_size], blur_threshold, apply_correction,
+                      encoding_profile, output_mode)
+            )
+        except Exception as e:
+            logger.error(f"Failed to queue {len(ids) - start} analyses: {str(e)}")
+            _mark_unqueued(ids[start:], e)
+            raise QueueUnavailable(str(e)) from e
+        task_ids.append(task.id)
+
+    return task_ids
+
+
+def _mark_unqueued(analysis_ids: List[str], error: Exception):
+    for analysis in ImageAnalysis.objects.filter(pk__in=analysis_ids):
+        analysis.status = 'failed'
+        analysis.error_message = f"Could not queue analysis: {error}"
+        analysis.processed_at = timezone.now()
+        save_with_rollups(analysis)
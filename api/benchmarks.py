@@ -0,0 +1,221 @@
+"""
+Shared helpers for the ``bench_*`` management commands: synthetic test
+images, box matching and latency summaries.
+"""
+import os
+import resource
+import tracemalloc
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+
+def draw_synthetic_face(image: np.ndarray, cx: int, cy: int, size: int):
+    """Draw a cartoon face the frontal-face Haar cascade reliably detects"""
+    cv2.ellipse(image, (cx, cy), (int(size * 0.42), int(size * 0.55)), 0, 0, 360,
+                (150, 170, 200), -1)
+    for side in (-1, 1):
+        eye_x, eye_y = cx + side * int(size * 0.18), cy - int(size * 0.1)
+        cv2.ellipse(image, (eye_x, eye_y - int(size * 0.1)),
+                    (int(size * 0.11), int(size * 0.03)), 0, 0, 360, (40, 40, 50), -1)
+        cv2.ellipse(image, (eye_x, eye_y), (int(size * 0.08), int(size * 0.045)),
+                    0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(image, (eye_x, eye_y), int(size * 0.035), (30, 30, 30), -1)
+    cv2.ellipse(image, (cx, cy + int(size * 0.12)), (int(size * 0.05), int(size * 0.09)),
+                0, 0, 360, (120, 140, 170), -1)
+    cv2.ellipse(image, (cx, cy + int(size * 0.3)), (int(size * 0.15), int(size * 0.04)),
+                0, 0, 360, (60, 60, 140), -1)
+
+
+def generate_synthetic_image(width: int, height: int, face_count: int,
+                             blur_sigma: float = 0.0, face_size: int = None,
+                             seed: int = 0) -> Tuple[np.ndarray, List[Box]]:
+    """
+    A noisy background with ``face_count`` non-overlapping faces laid out on
+    a grid. Returns the BGR image and the ground-truth face boxes; faces are
+    Gaussian-blurred with ``blur_sigma`` when it is non-zero.
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.integers(70, 110, (height, width, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (0, 0), 2)
+
+    boxes = []
+    if face_count == 0:
+        return image, boxes
+
+    columns = int(np.ceil(np.sqrt(face_count * width / float(height))))
+    rows = int(np.ceil(face_count / float(columns)))
+    cell_w, cell_h = width // columns, height // rows
+    size = face_size or int(min(cell_w, cell_h) * 0.6)
+
+    for index in range(face_count):
+        row, column = divmod(index, columns)
+        cx = column * cell_w + cell_w // 2
+        cy = row * cell_h + cell_h // 2
+        draw_synthetic_face(image, cx, cy, size)
+
+        half_w, half_h = int(size * 0.5), int(size * 0.6)
+        box = (max(cx - half_w, 0), max(cy - half_h, 0), 2 * half_w, 2 * half_h)
+        boxes.append(box)
+
+        if blur_sigma > 0:
+            x, y, w, h = box
+            region = image[y:y + h, x:x + w]
+            image[y:y + h, x:x + w] = cv2.GaussianBlur(region, (0, 0), blur_sigma)
+
+    return image, boxes
+
+
+def load_images(directory: str, limit: int = None) -> List[Tuple[str, np.ndarray]]:
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(('.jpg', '.jpeg', '.png')):
+            continue
+        image = cv2.imread(os.path.join(directory, name))
+        if image is not None:
+            images.append((name, image))
+        if limit and len(images) >= limit:
+            break
+
+    return images
+
+
+def face_boxes(face_data: List[Dict]) -> List[Box]:
+    return [
+        (face['bounding_box']['x'], face['bounding_box']['y'],
+         face['bounding_box']['width'], face['bounding_box']['height'])
+        for face in face_data
+    ]
+
+
+def iou(a: Box, b: Box) -> float:
+    ax1, ay1, bx1, by1 = a[0] + a[2], a[1] + a[3], b[0] + b[2], b[1] + b[3]
+    inter_w = min(ax1, bx1) - max(a[0], b[0])
+    inter_h = min(ay1, by1) - max(a[1], b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    intersection = inter_w * inter_h
+    return intersection / float(a[2] * a[3] + b[2] * b[3] - intersection)
+
+
+def matched_count(reference: Sequence[Box], candidates: Sequence[Box],
+                  min_iou: float = 0.5) -> int:
+    """Greedy one-to-one matching of ``candidates`` against ``reference``"""
+    remaining = list(candidates)
+    matched = 0
+    for box in reference:
+        best = max(remaining, key=lambda candidate: iou(box, candidate), default=None)
+        if best is not None and iou(box, best) >= min_iou:
+            remaining.remove(best)
+            matched += 1
+
+    return matched
+
+
+def summarize_latencies(samples_ms: Sequence[float]) -> Dict:
+    values = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        'runs': int(values.size),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+    }
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of this process (``ru_maxrss`` is KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def encode_synthetic_jpeg(width: int, height: int, face_count: int,
+                          blur_sigma: float = 0.0, seed: int = 0) -> bytes:
+    image, _ = generate_synthetic_image(width, height, face_count, blur_sigma=blur_sigma, seed=seed)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def measure_pipeline_memory(data: bytes, copy_free: bool) -> Dict:
+    """
+    Run the analysis pipeline once on an encoded image and report bytes
+    allocated per stage plus peak RSS. Meant to run in a fresh process so
+    the peak belongs to this run alone.
+    """
+    from .services import AnalysisContext, build_default_pipeline, preload_services
+
+    preload_services()
+    baseline_rss = peak_rss_kb()
+    tracemalloc.start()
+    context = AnalysisContext(image_bytes=data, apply_correction=True, copy_free=copy_free)
+    build_default_pipeline().run(context)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'stages': context.stage_timings,
+        'faces': len(context.face_data),
+        'traced_peak_bytes': traced_peak,
+        'peak_rss_kb': peak_rss_kb(),
+        'peak_rss_growth_kb': peak_rss_kb() - baseline_rss,
+    }
+
+
+def run_pipeline_case(data: bytes, repeat: int, apply_correction: bool = True,
+                      warmup: int = 1, lazy_correction: bool = False,
+                      output_mode: str = 'full') -> Dict:
+    """
+    Run the analysis pipeline ``repeat`` times (after ``warmup`` untimed
+    runs) on an encoded image and summarize latency per stage and end to end. Meant to run in a fresh
+    process so the reported peak RSS belongs to this case alone.
+    """
+    from .services import AnalysisContext, build_default_pipeline, preload_services
+
+    preload_services()
+    pipeline = build_default_pipeline()
+    stage_samples: Dict[str, List[float]] = {}
+    total_samples = []
+    faces = 0
+
+    options = {
+        'apply_correction': apply_correction,
+        'lazy_correction': lazy_correction,
+        'output_mode': output_mode,
+    }
+    for _ in range(warmup):
+        pipeline.run(AnalysisContext(image_bytes=data, **options))
+
+    for _ in range(repeat):
+        context = AnalysisContext(image_bytes=data, **options)
+        pipeline.run(context)
+        faces = len(context.face_data)
+        for timing in context.stage_timings:
+            stage_samples.setdefault(timing['stage'], []).append(timing['wall_ms'])
+        total_samples.append(sum(timing['wall_ms'] for timing in context.stage_timings))
+
+    total = summarize_latencies(total_samples)
+    total['images_per_sec'] = round(1000.0 / total['p50_ms'], 3) if total['p50_ms'] else None
+
+    return {
+        'faces': faces,
+        'stages': {stage: summarize_latencies(samples) for stage, samples in stage_samples.items()},
+        'total': total,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def init_budget_worker(opencv_threads: int = None):
+    """Process pool initializer: apply an OpenCV thread count (None keeps OpenCV's default)"""
+    from .services import preload_services
+
+    if opencv_threads:
+        cv2.setNumThreads(opencv_threads)
+    preload_services()
+
+
+def analyze_encoded(data: bytes, apply_correction: bool = True) -> int:
+    from .services import AnalysisContext, build_default_pipeline
+
+    context = AnalysisContext(image_bytes=data, apply_correction=apply_correction)
+    build_default_pipeline().run(context)
+    return len(context.face_data)
@@ -0,0 +1,35 @@
+from typing import Dict, Iterator, List
+
+import numpy as np
+from django.conf import settings
+
+from .services import get_image_processor
+from .services.burst import select_best_shot
+
+
+def decode_frames(images: List) -> Iterator[np.ndarray]:
+    """Grayscale frames of the uploaded ``images``, decoded only when reached"""
+    image_processor = get_image_processor()
+    for image in images:
+        image.seek(0)
+        yield image_processor.decode_image(image.read(), grayscale=True)
+
+
+def run_best_shot(images: List, blur_threshold: float = 100.0,
+                  target_score: float = None) -> Dict:
+    """Pick the sharpest of the uploaded burst ``images``, frame and per face"""
+    result = select_best_shot(
+        decode_frames(images),
+        blur_threshold=blur_threshold,
+        target_score=target_score,
+        detection_max_side=getattr(settings, 'BURST_DETECTION_MAX_SIDE', 640),
+        track_min_score=getattr(settings, 'BURST_TRACK_MIN_SCORE', 0.5)
+    )
+
+    result['frames_received'] = len(images)
+    for frame in result['frames']:
+        frame['filename'] = images[frame['frame']].name
+    if result['best_frame'] is not None:
+        result['best_filename'] = images[result['best_frame']].name
+
+    return result
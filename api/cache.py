@@ -0,0 +1,134 @@
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import observe_cache_lookup
+from .models import AnalysisCacheEntry, ImageAnalysis
+from .services.pipeline import ALGORITHM_VERSION
+
+
+def hash_content(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_upload(upload) -> str:
+    digest = hashlib.sha256()
+    upload.seek(0)
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of finished analyses, keyed on the SHA-256 of the
+    upload plus every option that changes the result. Entries live in the
+    database so all web and worker processes share them; the least recently
+    used ones are evicted past ``ANALYSIS_CACHE_MAX_ENTRIES``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'ANALYSIS_CACHE_ENABLED', True)
+
+    @property
+    def max_entries(self) -> int:
+        return getattr(settings, 'ANALYSIS_CACHE_MAX_ENTRIES', 10000)
+
+    def _increment(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def make_key(self, content_hash: str, options: Dict) -> str:
+        payload = json.dumps(
+            {'content_hash': content_hash, 'version': ALGORITHM_VERSION, 'options': options},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def lookup(self, content_hash: str, options: Dict) -> Optional[ImageAnalysis]:
+        if not self.enabled:
+            return None
+
+        cache_key = self.make_key(content_hash, options)
+        entry = (
+            AnalysisCacheEntry.objects
+            .select_related('analysis')
+            .filter(cache_key=cache_key, analysis__status='completed')
+            .first()
+        )
+        observe_cache_lookup(entry is not None)
+        if entry is None:
+            self._increment('misses')
+            return None
+
+        AnalysisCacheEntry.objects.filter(pk=entry.pk).update(
+            hits=F('hits') + 1,
+            last_used_at=timezone.now()
+        )
+        self._increment('hits')
+        return entry.analysis
+
+    def store(self, analysis: ImageAnalysis, content_hash: str, options: Dict):
+        if not self.enabled or analysis.status != 'completed':
+            return
+
+        try:
+            with transaction.atomic():
+                AnalysisCacheEntry.objects.create(
+                    cache_key=self.make_key(content_hash, options),
+                    content_hash=content_hash,
+                    analysis=analysis,
+                    blur_threshold=options['blur_threshold'],
+                    apply_correction=options['apply_correction'],
+                    algorithm_version=ALGORITHM_VERSION
+                )
+        except IntegrityError:
+            # A concurrent identical upload finished first; keep its entry
+            return
+
+        self._increment('stores')
+        self.evict()
+
+    def evict(self):
+        excess = AnalysisCacheEntry.objects.count() - self.max_entries
+        if excess <= 0:
+            return
+
+        stale_ids = list(
+            AnalysisCacheEntry.objects
+            .order_by('last_used_at')
+            .values_list('id', flat=True)[:excess]
+        )
+        AnalysisCacheEntry.objects.filter(id__in=stale_ids).delete()
+        self._increment('evictions', len(stale_ids))
+
+    def invalidate(self, analysis: ImageAnalysis):
+        AnalysisCacheEntry.objects.filter(analysis=analysis).delete()
+
+    def invalidate_many(self, analyses: List[ImageAnalysis]):
+        if analyses:
+            AnalysisCacheEntry.objects.filter(analysis__in=analyses).delete()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+
+        return stats
+
+
+result_cache = ResultCache()
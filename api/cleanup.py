@@ -0,0 +1,261 @@
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CleanupCheckpoint, ImageAnalysis, VideoAnalysis
+from .rollups import apply_rollup_changes
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'expired_analyses'
+
+
+def _remove_file(path: str, dry_run: bool) -> Optional[int]:
+    """Size of ``path`` in bytes, unlinked unless ``dry_run``; None when it is already gone"""
+    try:
+        size = os.stat(path).st_size
+        if not dry_run:
+            os.remove(path)
+        return size
+    except FileNotFoundError:
+        return None
+
+
+def _expired_batch(cutoff, after: Tuple, batch_size: int) -> List[Tuple]:
+    queryset = ImageAnalysis.objects.filter(created_at__lt=cutoff)
+    if after[0] is not None:
+        queryset = queryset.filter(
+            Q(created_at__gt=after[0]) | Q(created_at=after[0], id__gt=after[1])
+        )
+
+    return list(
+        queryset
+        .order_by('created_at', 'id')
+        .values_list(
+            'id', 'created_at', 'original_image', 'processed_image', 'face_crops', 'rollup_contribution'
+        )[:batch_size]
+    )
+
+
+class _CheckpointLost(Exception):
+    """Another run took over the checkpoint after this run's claim lapsed"""
+
+
+def _claim_checkpoint(days: int, restart: bool) -> Optional[CleanupCheckpoint]:
+    """
+    The checkpoint to work from, claimed for this run, or None while
+    another run holds it. The claim lasts CLEANUP_LOCK_TIMEOUT seconds and
+    every batch renews it, so a run that died stops blocking the next one.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            checkpoint = CleanupCheckpoint.objects.select_for_update().filter(name=CHECKPOINT_NAME).first()
+            if checkpoint is not None and checkpoint.locked_until and checkpoint.locked_until > now:
+                return None
+            if checkpoint is not None and restart:
+                checkpoint.delete()
+                checkpoint = None
+            if checkpoint is None:
+                checkpoint = CleanupCheckpoint(name=CHECKPOINT_NAME, cutoff=now - timedelta(days=days))
+            checkpoint.locked_by = uuid.uuid4()
+            checkpoint.locked_until = now + _lock_timeout()
+            checkpoint.save()
+    except IntegrityError:
+        # Another run created the checkpoint first
+        return None
+
+    return checkpoint
+
+
+def _lock_timeout() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'CLEANUP_LOCK_TIMEOUT', 900))
+
+
+def cleanup_expired_analyses(days: int = 30, batch_size: int = None, time_budget: float = None,
+                             dry_run: bool = False, workers: int = None,
+                             restart: bool = False) -> Dict:
+    """
+    Delete analyses created more than ``days`` ago together with their files.
+
+    Rows are walked oldest first in keyset-paginated batches of
+    ``batch_size``. Each batch unlinks its files on a thread pool, then
+    removes its rows with one ``DELETE ... WHERE id IN``, takes their
+    contributions back out of the stats rollups and advances the
+    checkpoint, all in one transaction. A run stops between batches once
+    ``time_budget`` seconds have passed. The next run resumes from the
+    checkpoint with the same cutoff, and ``restart`` discards it. Re-running
+    an interrupted batch is harmless because files that are already gone
+    are skipped.
+
+    Only one run works from the checkpoint at a time: a run that finds it
+    claimed by another (say the beat task and the management command)
+    deletes nothing and reports ``skipped``.
+
+    ``dry_run`` only measures what would be freed. It neither deletes nor
+    moves the checkpoint.
+    """
+    batch_size = batch_size or getattr(settings, 'CLEANUP_BATCH_SIZE', 500)
+    workers = workers or getattr(settings, 'CLEANUP_UNLINK_WORKERS', 8)
+    started = time.monotonic()
+
+    if dry_run:
+        checkpoint = None if restart else CleanupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+        if checkpoint is None:
+            checkpoint = CleanupCheckpoint(cutoff=timezone.now() - timedelta(days=days))
+    else:
+        checkpoint = _claim_checkpoint(days, restart)
+
+    report = {
+        'cutoff': checkpoint.cutoff.isoformat() if checkpoint else None,
+        'resumed': bool(checkpoint and checkpoint.last_created_at),
+        'dry_run': dry_run,
+        'skipped': checkpoint is None,
+        'batches': 0,
+        'rows_deleted': 0,
+        'files_deleted': 0,
+        'bytes_freed': 0,
+        'complete': False,
+    }
+    if checkpoint is None:
+        logger.info("Cleanup skipped: another run holds the checkpoint")
+        report['elapsed'] = round(time.monotonic() - started, 3)
+        return report
+
+    try:
+        _delete_expired(checkpoint, report, started, batch_size, time_budget, dry_run, workers)
+    finally:
+        if not dry_run:
+            owned = CleanupCheckpoint.objects.filter(pk=checkpoint.pk, locked_by=checkpoint.locked_by)
+            if report['complete']:
+                owned.delete()
+            else:
+                owned.update(locked_by=None, locked_until=None)
+
+    report['elapsed'] = round(time.monotonic() - started, 3)
+    logger.info(
+        f"Cleanup {'(dry run) ' if dry_run else ''}{'finished' if report['complete'] else 'paused'}: "
+        f"{report['rows_deleted']} rows, {report['files_deleted']} files, "
+        f"{report['bytes_freed']} bytes in {report['elapsed']}s"
+    )
+    return report
+
+
+def _delete_expired(checkpoint: CleanupCheckpoint, report: Dict, started: float, batch_size: int,
+                    time_budget: Optional[float], dry_run: bool, workers: int):
+    cutoff = checkpoint.cutoff
+    after = (checkpoint.last_created_at, checkpoint.last_id)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cleanup-unlink') as executor:
+        while True:
+            # Every run gets through at least one batch, however small the budget
+            elapsed = time.monotonic() - started
+            if report['batches'] and time_budget is not None and elapsed >= time_budget:
+                break
+
+            rows = _expired_batch(cutoff, after, batch_size)
+            if not rows:
+                report['complete'] = True
+                break
+
+            paths = [
+                default_storage.path(name)
+                for _, _, original, processed, face_crops, _ in rows
+                for name in [original, processed] + [crop['image'] for crop in face_crops or []]
+                if name
+            ]
+            sizes = [
+                size for size in executor.map(lambda path: _remove_file(path, dry_run), paths)
+                if size is not None
+            ]
+            after = (rows[-1][1], rows[-1][0])
+
+            report['batches'] += 1
+            report['files_deleted'] += len(sizes)
+            report['bytes_freed'] += sum(sizes)
+
+            if dry_run:
+                report['rows_deleted'] += len(rows)
+                continue
+
+            try:
+                with transaction.atomic():
+                    # Lock the checkpoint first; it must still be this run's
+                    if not CleanupCheckpoint.objects.select_for_update().filter(
+                        pk=checkpoint.pk, locked_by=checkpoint.locked_by
+                    ).exists():
+                        raise _CheckpointLost()
+
+                    _, deleted = ImageAnalysis.objects.filter(pk__in=[row[0] for row in rows]).delete()
+                    apply_rollup_changes([(row[5], -1) for row in rows if row[5]])
+
+                    checkpoint.last_created_at, checkpoint.last_id = after
+                    checkpoint.rows_deleted += deleted.get(ImageAnalysis._meta.label, 0)
+                    checkpoint.bytes_freed += sum(sizes)
+                    checkpoint.locked_until = timezone.now() + _lock_timeout()
+                    checkpoint.save()
+            except _CheckpointLost:
+                logger.warning("Cleanup stopped: another run took over the checkpoint")
+                break
+            report['rows_deleted'] += deleted.get(ImageAnalysis._meta.label, 0)
+
+
+def cleanup_expired_videos(days: int = 30, batch_size: int = None, dry_run: bool = False,
+                           workers: int = None) -> Dict:
+    """
+    Delete video analyses created more than ``days`` ago together with the
+    uploaded clip and the per-frame results file. Each batch unlinks its
+    files and then deletes its rows, so an interrupted run simply leaves
+    the remaining rows for the next one.
+    """
+    batch_size = batch_size or getattr(settings, 'CLEANUP_BATCH_SIZE', 500)
+    workers = workers or getattr(settings, 'CLEANUP_UNLINK_WORKERS', 8)
+    cutoff = timezone.now() - timedelta(days=days)
+    report = {'rows_deleted': 0, 'files_deleted': 0, 'bytes_freed': 0}
+
+    after = None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cleanup-unlink') as executor:
+        while True:
+            queryset = VideoAnalysis.objects.filter(created_at__lt=cutoff)
+            if after is not None:
+                queryset = queryset.filter(pk__gt=after)
+            rows = list(queryset.order_by('pk').values_list('id', 'video', 'results_file')[:batch_size])
+            if not rows:
+                break
+
+            paths = [
+                default_storage.path(name)
+                for _, video, results in rows
+                for name in (video, results)
+                if name
+            ]
+            sizes = [
+                size for size in executor.map(lambda path: _remove_file(path, dry_run), paths)
+                if size is not None
+            ]
+            report['files_deleted'] += len(sizes)
+            report['bytes_freed'] += sum(sizes)
+            after = rows[-1][0]
+
+            if dry_run:
+                report['rows_deleted'] += len(rows)
+                continue
+
+            _, deleted = VideoAnalysis.objects.filter(pk__in=[row[0] for row in rows]).delete()
+            report['rows_deleted'] += deleted.get(VideoAnalysis._meta.label, 0)
+
+    logger.info(
+        f"Video cleanup {'(dry run) ' if dry_run else ''}finished: {report['rows_deleted']} rows, "
+        f"{report['files_deleted']} files, {report['bytes_freed']} bytes"
+    )
+    return report
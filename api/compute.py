@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+from django.conf import settings
+
+from .metrics import COMPUTE_QUEUE_DEPTH, COMPUTE_WAIT
+from .services.cpu_budget import available_cpus
+
+_compute_executor = None
+_compute_executor_lock = threading.Lock()
+
+
+class ComputeQueueFull(Exception):
+    pass
+
+
+class ComputeExecutor:
+    """
+    Bounded thread pool for the OpenCV stages of the async views.
+
+    OpenCV releases the GIL, so a few threads keep every core busy while the
+    event loop goes on receiving uploads and talking to the database. At most
+    ``max_queue`` jobs may wait for a thread; beyond that ``submit`` raises
+    ``ComputeQueueFull`` instead of letting latency grow without bound.
+    """
+
+    def __init__(self, max_workers: int = None, max_queue: int = None):
+        self.max_workers = max_workers or available_cpus()
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='compute'
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                self._rejected += 1
+                raise ComputeQueueFull(f'{self._queued} jobs already waiting for a compute thread')
+            self._queued += 1
+        COMPUTE_QUEUE_DEPTH.inc()
+        submitted_at = time.perf_counter()
+
+        def job():
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            COMPUTE_QUEUE_DEPTH.dec()
+            COMPUTE_WAIT.observe(wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+
+        return self._executor.submit(job)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            started = self._completed + self._active
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'queue_depth': self._queued,
+                'active': self._active,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'mean_wait_ms': round(self._total_wait / started * 1000, 3) if started else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+            }
+
+
+def get_compute_executor() -> ComputeExecutor:
+    global _compute_executor
+
+    with _compute_executor_lock:
+        if _compute_executor is None:
+            _compute_executor = ComputeExecutor(
+                max_workers=getattr(settings, 'COMPUTE_MAX_WORKERS', None),
+                max_queue=getattr(settings, 'COMPUTE_MAX_QUEUE', None)
+            )
+        return _compute_executor
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+import json
+
+from api.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = 'Add finished analyses that predate the stats rollups to them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows locked and folded in per transaction'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine-readable JSON'
+        )
+
+    def handle(self, *args, **options):
+        report = backfill_rollups(batch_size=options['batch_size'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {report['rows']} analyses to the rollups in {report['batches']} batches"
+        ))
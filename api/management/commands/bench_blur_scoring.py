@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+import json
+import time
+
+import numpy as np
+
+from api.benchmarks import summarize_latencies
+from api.services import BlurDetector
+
+
+class Command(BaseCommand):
+    help = 'Compare per-crop and integral-image blur scoring of many faces in one frame'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolution',
+            default='4000x3000',
+            help='WIDTHxHEIGHT of the frame'
+        )
+        parser.add_argument(
+            '--faces',
+            default='2,10,50,100',
+            help='Comma separated face counts'
+        )
+        parser.add_argument(
+            '--face-size',
+            type=int,
+            default=160,
+            help='Side of every face box in pixels'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per case and mode'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine-readable JSON instead of a table'
+        )
+
+    def handle(self, *args, **options):
+        width, height = (int(v) for v in options['resolution'].split('x'))
+        size = options['face_size']
+        rng = np.random.default_rng(0)
+        gray = rng.integers(0, 256, (height, width), dtype=np.uint8)
+        detector = BlurDetector()
+
+        results = []
+        for face_count in (int(v) for v in options['faces'].split(',')):
+            # Spread: faces anywhere in the frame (group photos). Overlapping:
+            # faces packed into a region a tenth of the frame's side.
+            for layout, (area_width, area_height) in (
+                ('spread', (width, height)),
+                ('overlapping', (max(width // 10, size + 1), max(height // 10, size + 1))),
+            ):
+                boxes = [
+                    (int(rng.integers(0, area_width - size)), int(rng.integers(0, area_height - size)), size, size)
+                    for _ in range(face_count)
+                ]
+                timings = {}
+                for mode, score in (
+                    ('per_crop', lambda: [detector.calculate_blur_score(gray[y:y + h, x:x + w])
+                                          for x, y, w, h in boxes]),
+                    ('integral', lambda: detector.calculate_blur_scores(gray, boxes)),
+                ):
+                    samples = []
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        score()
+                        samples.append((time.perf_counter() - start) * 1000)
+                    timings[mode] = summarize_latencies(samples)
+
+                results.append({
+                    'faces': face_count,
+                    'layout': layout,
+                    'coverage': round(detector.box_coverage(boxes), 3),
+                    'per_crop_ms': timings['per_crop'],
+                    'integral_ms': timings['integral'],
+                    'selected': 'integral' if detector.uses_integral(boxes) else 'per_crop',
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'faces':>6}  {'layout':<12}{'coverage':>9}{'crop ms':>10}{'integral ms':>13}  selected"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['faces']:>6}  {row['layout']:<12}{row['coverage']:>9.3f}"
+                f"{row['per_crop_ms']['p50_ms']:>10.2f}{row['integral_ms']['p50_ms']:>13.2f}"
+                f"  {row['selected']}"
+            )
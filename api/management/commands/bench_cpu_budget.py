@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand
+from concurrent.futures import ProcessPoolExecutor, wait
+import json
+import multiprocessing
+import time
+
+from api.benchmarks import analyze_encoded, encode_synthetic_jpeg, init_budget_worker
+from api.services import available_cpus, read_cgroup_cpu_quota
+
+
+class Command(BaseCommand):
+    help = 'Measure throughput of worker x OpenCV-thread splits of the CPU budget and pick the best'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolution',
+            default='1920x1080',
+            help='WIDTHxHEIGHT of the synthetic images'
+        )
+        parser.add_argument(
+            '--faces',
+            type=int,
+            default=4,
+            help='Faces per synthetic image'
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=None,
+            help='Images analyzed per split (defaults to 8 per CPU)'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine-readable JSON instead of a table'
+        )
+
+    def handle(self, *args, **options):
+        cpus = available_cpus()
+        width, height = (int(v) for v in options['resolution'].split('x'))
+        images = [
+            encode_synthetic_jpeg(width, height, options['faces'], blur_sigma=3.0, seed=seed)
+            for seed in range(options['images'] or 8 * cpus)
+        ]
+
+        # Every divisor split of the budget, plus today's default of one
+        # worker per CPU with OpenCV free to use every core in each of them
+        splits = [(workers, cpus // workers) for workers in range(1, cpus + 1) if cpus % workers == 0]
+        splits.append((cpus, None))
+
+        results = []
+        for workers, opencv_threads in splits:
+            with ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_budget_worker,
+                initargs=(opencv_threads,)
+            ) as pool:
+                # Warm every worker before timing
+                wait([pool.submit(analyze_encoded, images[0]) for _ in range(workers)])
+
+                start = time.perf_counter()
+                wait([pool.submit(analyze_encoded, data) for data in images])
+                elapsed = time.perf_counter() - start
+
+            results.append({
+                'workers': workers,
+                'opencv_threads': opencv_threads or 'default',
+                'images_per_sec': round(len(images) / elapsed, 2),
+            })
+
+        budgeted = [row for row in results if row['opencv_threads'] != 'default']
+        best = max(budgeted, key=lambda row: row['images_per_sec'])
+        report = {
+            'cpus': cpus,
+            'cgroup_quota': read_cgroup_cpu_quota(),
+            'images': len(images),
+            'results': results,
+            'recommended': {
+                'CPU_BUDGET_WORKERS': best['workers'],
+                'CPU_BUDGET_OPENCV_THREADS': best['opencv_threads'],
+            },
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{cpus} CPUs (cgroup quota: {report['cgroup_quota'] or 'none'}), "
+            f"{len(images)} images of {options['resolution']}"
+        )
+        self.stdout.write(f"{'workers':>8}{'opencv threads':>16}{'images/s':>10}")
+        for row in results:
+            self.stdout.write(f"{row['workers']:>8}{row['opencv_threads']:>16}{row['images_per_sec']:>10.2f}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Best split: CPU_BUDGET_WORKERS={best['workers']} "
+            f"CPU_BUDGET_OPENCV_THREADS={best['opencv_threads']}"
+        ))
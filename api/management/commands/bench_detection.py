@@ -0,0 +1,136 @@
+from django.core.management.base import BaseCommand
+import json
+import os
+import time
+
+import cv2
+
+from api.benchmarks import (
+    face_boxes,
+    generate_synthetic_image,
+    load_images,
+    matched_count,
+    summarize_latencies
+)
+from api.services import detect_faces_tiled, get_face_detector
+
+
+class Command(BaseCommand):
+    help = 'Benchmark full-resolution vs coarse-to-fine and tiled face detection (latency and recall)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--images',
+            help='Directory of real photos; synthetic images are generated when omitted'
+        )
+        parser.add_argument(
+            '--caps',
+            default='640,1024,1600,2048',
+            help='Comma separated max-side caps for the coarse pass'
+        )
+        parser.add_argument(
+            '--workers',
+            default='1,2,4,8',
+            help='Comma separated thread counts for tiled detection (empty to skip)'
+        )
+        parser.add_argument(
+            '--tile-size',
+            type=int,
+            default=1024,
+            help='Tile size for tiled detection'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed runs per image and mode'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine-readable JSON instead of a table'
+        )
+
+    def handle(self, *args, **options):
+        caps = [int(cap) for cap in options['caps'].split(',') if cap]
+        workers = [int(count) for count in options['workers'].split(',') if count]
+        images = self._load_images(options['images'])
+        detector = get_face_detector()
+
+        modes = [('full', None, False, None)]
+        for cap in caps:
+            modes.append((f'cap={cap}', cap, False, None))
+            modes.append((f'cap={cap}+refine', cap, True, None))
+        for count in workers:
+            modes.append((f'tiled x{count}', None, False, count))
+
+        reference = {}
+        results = []
+        for label, cap, refine, tile_workers in modes:
+            samples = []
+            found = matched = expected = 0
+            for name, gray in images:
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    if tile_workers:
+                        face_data = detect_faces_tiled(
+                            gray, tile_size=options['tile_size'], workers=tile_workers
+                        )
+                    elif cap is None:
+                        face_data = detector.detect_faces_in_gray(gray)
+                    else:
+                        face_data = detector.detect_faces_coarse_to_fine(gray, max_side=cap, refine=refine)
+                    samples.append((time.perf_counter() - start) * 1000)
+
+                boxes = face_boxes(face_data)
+                if label == 'full':
+                    reference[name] = boxes
+                found += len(boxes)
+                expected += len(reference[name])
+                matched += matched_count(reference[name], boxes)
+
+            row = {'mode': label, 'faces': found}
+            row.update(summarize_latencies(samples))
+            row['recall'] = round(matched / expected, 3) if expected else None
+            results.append(row)
+
+        full_p50 = results[0]['p50_ms']
+        for row in results:
+            row['speedup'] = round(full_p50 / row['p50_ms'], 2) if row['p50_ms'] else None
+
+        if options['json']:
+            self.stdout.write(json.dumps(
+                {'images': len(images), 'cpus': os.cpu_count(), 'results': results}, indent=2
+            ))
+            return
+
+        self.stdout.write(
+            f"{len(images)} images, {os.cpu_count()} CPUs, "
+            f"recall measured against full-resolution detection"
+        )
+        self.stdout.write(f"{'mode':<20}{'p50 ms':>10}{'p95 ms':>10}{'speedup':>10}{'faces':>8}{'recall':>8}")
+        for row in results:
+            recall = '-' if row['recall'] is None else f"{row['recall']:.3f}"
+            self.stdout.write(
+                f"{row['mode']:<20}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+                f"{row['speedup']:>10.2f}{row['faces']:>8}{recall:>8}"
+            )
+
+    def _load_images(self, directory):
+        if directory:
+            images = load_images(directory)
+        else:
+            images = [
+                (
+                    f'synthetic_{width}x{height}_{faces}',
+                    generate_synthetic_image(width, height, faces, face_size=face_size, seed=i)[0]
+                )
+                for i, (width, height, faces, face_size) in enumerate([
+                    (2000, 1500, 6, None),
+                    (4000, 3000, 12, None),
+                    (6000, 4000, 24, None),
+                    (4000, 3000, 40, 60),
+                ])
+            ]
+
+        return [(name, cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)) for name, image in images]
@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+import time
+
+import cv2
+
+from api.analysis import get_encoding_profiles
+from api.benchmarks import generate_synthetic_image, summarize_latencies
+from api.services import get_image_processor
+
+
+class Command(BaseCommand):
+    help = 'Compare encode time, output size and fidelity of the output encoding profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolutions',
+            default='1920x1080,4000x3000',
+            help='Comma separated WIDTHxHEIGHT list'
+        )
+        parser.add_argument(
+            '--profiles',
+            help='Comma separated profile names (defaults to every configured profile)'
+        )
+        parser.add_argument(
+            '--faces',
+            type=int,
+            default=8,
+            help='Faces per synthetic image'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed encodes per profile and resolution'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine-readable JSON instead of a table'
+        )
+
+    def handle(self, *args, **options):
+        profiles = get_encoding_profiles()
+        if options['profiles']:
+            names = [name for name in options['profiles'].split(',') if name]
+            unknown = set(names) - set(profiles)
+            if unknown:
+                raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+            profiles = {name: profiles[name] for name in names}
+
+        image_processor = get_image_processor()
+        results = []
+        for resolution in options['resolutions'].split(','):
+            width, height = (int(v) for v in resolution.split('x'))
+            image, _ = generate_synthetic_image(width, height, options['faces'], blur_sigma=3.0)
+
+            for profile in profiles.values():
+                params = profile.imencode_params()
+                # Warm the codec once before timing
+                data = image_processor.encode_image(image, profile.extension, params)
+
+                samples = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    data = image_processor.encode_image(image, profile.extension, params)
+                    samples.append((time.perf_counter() - start) * 1000)
+
+                decoded = image_processor.decode_image(data)
+                lossless = not cv2.norm(image, decoded, cv2.NORM_INF)
+                results.append({
+                    'resolution': resolution,
+                    'profile': profile.name,
+                    'format': profile.format,
+                    'encode_ms': summarize_latencies(samples),
+                    'bytes': len(data),
+                    'bits_per_pixel': round(len(data) * 8 / (width * height), 3),
+                    'psnr_db': None if lossless else round(cv2.PSNR(image, decoded), 2),
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'resolution':<12}{'profile':<14}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'KiB':>10}{'bpp':>8}{'PSNR dB':>9}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['resolution']:<12}{row['profile']:<14}"
+                f"{row['encode_ms']['p50_ms']:>9.1f}{row['encode_ms']['p95_ms']:>9.1f}"
+                f"{row['bytes'] / 1024:>10.1f}{row['bits_per_pixel']:>8.2f}"
+                f"{'lossless' if row['psnr_db'] is None else row['psnr_db']:>9}"
+            )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+
+from api.benchmarks import encode_synthetic_jpeg, measure_pipeline_memory
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory and per-stage allocations of the copying and copy-free pipelines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolutions',
+            default='1920x1080,4000x3000,6000x4000',
+            help='Comma separated WIDTHxHEIGHT list'
+        )
+        parser.add_argument(
+            '--faces',
+            type=int,
+            default=12,
+            help='Blurred faces per synthetic image'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine-readable JSON instead of a table'
+        )
+
+    def handle(self, *args, **options):
+        resolutions = [
+            tuple(int(v) for v in resolution.split('x'))
+            for resolution in options['resolutions'].split(',') if resolution
+        ]
+
+        results = []
+        for width, height in resolutions:
+            data = encode_synthetic_jpeg(width, height, options['faces'], blur_sigma=3.0)
+            for copy_free in (False, True):
+                # A fresh process per run so ru_maxrss is this run's peak
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                    result = pool.submit(measure_pipeline_memory, data, copy_free).result()
+                result.update({
+                    'resolution': f'{width}x{height}',
+                    'mode': 'copy-free' if copy_free else 'copying',
+                })
+                results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for result in results:
+            self.stdout.write(
+                f"\n{result['resolution']} {result['mode']}: faces={result['faces']} "
+                f"traced peak={result['traced_peak_bytes'] / 2 ** 20:.1f} MiB "
+                f"RSS growth={result['peak_rss_growth_kb'] / 1024:.1f} MiB"
+            )
+            self.stdout.write(f"  {'stage':<12}{'wall ms':>10}{'allocated MiB':>16}")
+            for stage in result['stages']:
+                self.stdout.write(
+                    f"  {stage['stage']:<12}{stage['wall_ms']:>10.1f}"
+                    f"{stage['bytes_allocated'] / 2 ** 20:>16.2f}"
+                )
@@ -0,0 +1,182 @@
+from django.core.management.base import BaseCommand, CommandError
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import multiprocessing
+import os
+
+from api.benchmarks import encode_synthetic_jpeg, run_pipeline_case
+from api.services import OUTPUT_MODES
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the analysis pipeline stage by stage over a matrix of synthetic images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolutions',
+            default='640x480,1920x1080,4000x3000',
+            help='Comma separated WIDTHxHEIGHT list'
+        )
+        parser.add_argument(
+            '--faces',
+            default='0,4,16',
+            help='Comma separated face counts'
+        )
+        parser.add_argument(
+            '--blur',
+            default='0,3',
+            help='Comma separated Gaussian sigmas applied to the faces (0 keeps them sharp)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per case'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=1,
+            help='Untimed runs per case before measuring'
+        )
+        parser.add_argument(
+            '--metrics-only',
+            action='store_true',
+            help='Run with apply_correction=False (no correct/annotate/encode stages)'
+        )
+        parser.add_argument(
+            '--lazy',
+            action='store_true',
+            help='Run with LAZY_CORRECTION (detection and scoring only, output rendered on fetch)'
+        )
+        parser.add_argument(
+            '--output-mode',
+            choices=OUTPUT_MODES,
+            default='full',
+            help='Correction output to produce: the full frame, face crops or overlay only'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine-readable JSON instead of a table'
+        )
+        parser.add_argument(
+            '--save',
+            help='Write the results as a JSON baseline to this path'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Baseline JSON (from --save) to compare against; exits non-zero on regressions'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.15,
+            help='Allowed relative p50 slowdown before a stage counts as a regression'
+        )
+        parser.add_argument(
+            '--min-delta-ms',
+            type=float,
+            default=1.0,
+            help='Ignore slowdowns smaller than this many milliseconds'
+        )
+
+    def handle(self, *args, **options):
+        resolutions = [
+            tuple(int(v) for v in resolution.split('x'))
+            for resolution in options['resolutions'].split(',') if resolution
+        ]
+        face_counts = [int(count) for count in options['faces'].split(',') if count]
+        blur_levels = [float(sigma) for sigma in options['blur'].split(',') if sigma]
+
+        cases = []
+        for (width, height), faces, sigma in itertools.product(resolutions, face_counts, blur_levels):
+            data = encode_synthetic_jpeg(width, height, faces, blur_sigma=sigma)
+            # A fresh process per case so ru_maxrss is this case's peak
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                result = pool.submit(
+                    run_pipeline_case, data, options['repeat'],
+                    not options['metrics_only'], options['warmup'], options['lazy'],
+                    options['output_mode']
+                ).result()
+            result.update({
+                'case': f'{width}x{height}/faces={faces}/blur={sigma:g}',
+                'expected_faces': faces,
+            })
+            cases.append(result)
+
+        report = {
+            'cpus': os.cpu_count(),
+            'repeat': options['repeat'],
+            'apply_correction': not options['metrics_only'],
+            'lazy_correction': options['lazy'],
+            'output_mode': options['output_mode'],
+            'cases': cases,
+        }
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        regressions = []
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = self._compare(report, baseline, options['tolerance'], options['min_delta_ms'])
+            report['regressions'] = regressions
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_table(report)
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}')
+
+    def _compare(self, report, baseline, tolerance, min_delta_ms):
+        baseline_cases = {case['case']: case for case in baseline.get('cases', [])}
+        regressions = []
+        for case in report['cases']:
+            reference = baseline_cases.get(case['case'])
+            if reference is None:
+                continue
+
+            rows = [('total', case['total'], reference['total'])]
+            rows += [
+                (stage, summary, reference['stages'][stage])
+                for stage, summary in case['stages'].items()
+                if stage in reference['stages']
+            ]
+            for stage, current, previous in rows:
+                delta = current['p50_ms'] - previous['p50_ms']
+                if delta > min_delta_ms and current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                    regressions.append({
+                        'case': case['case'],
+                        'stage': stage,
+                        'baseline_p50_ms': previous['p50_ms'],
+                        'p50_ms': current['p50_ms'],
+                        'change': round(delta / previous['p50_ms'], 3) if previous['p50_ms'] else None,
+                    })
+
+        return regressions
+
+    def _print_table(self, report):
+        self.stdout.write(f"{report['cpus']} CPUs, {report['repeat']} runs per case")
+        for case in report['cases']:
+            total = case['total']
+            self.stdout.write(
+                f"\n{case['case']}: faces={case['faces']}/{case['expected_faces']} "
+                f"p50={total['p50_ms']:.1f} ms p95={total['p95_ms']:.1f} ms "
+                f"{total['images_per_sec']:.2f} img/s peak RSS={case['peak_rss_kb'] / 1024:.1f} MiB"
+            )
+            self.stdout.write(f"  {'stage':<12}{'p50 ms':>10}{'p95 ms':>10}")
+            for stage, summary in case['stages'].items():
+                self.stdout.write(f"  {stage:<12}{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}")
+
+        for regression in report.get('regressions', []):
+            self.stdout.write(self.style.ERROR(
+                f"REGRESSION {regression['case']} {regression['stage']}: "
+                f"{regression['baseline_p50_ms']:.1f} -> {regression['p50_ms']:.1f} ms "
+                f"(+{regression['change'] * 100:.0f}%)"
+            ))
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+import json
+
+from api.cleanup import cleanup_expired_analyses, cleanup_expired_videos
+
+
+class Command(BaseCommand):
+    help = 'Delete expired image and video analyses and their files in resumable batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Delete analyses created more than this many days ago'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows per DELETE (defaults to CLEANUP_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Threads unlinking files (defaults to CLEANUP_UNLINK_WORKERS)'
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=float,
+            help='Stop after this many seconds; the next run resumes from the checkpoint'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted and freed'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Discard the checkpoint of an interrupted run and start over'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine-readable JSON'
+        )
+
+    def handle(self, *args, **options):
+        report = cleanup_expired_analyses(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            time_budget=options['time_budget'],
+            dry_run=options['dry_run'],
+            workers=options['workers'],
+            restart=options['restart']
+        )
+        report['videos'] = cleanup_expired_videos(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            workers=options['workers']
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        verb = 'Would free' if report['dry_run'] else 'Freed'
+        if report['skipped']:
+            self.stdout.write(self.style.WARNING('Another cleanup run holds the checkpoint; analyses skipped'))
+        else:
+            self.stdout.write(
+                f"{verb} {report['rows_deleted']} rows, {report['files_deleted']} files, "
+                f"{report['bytes_freed'] / 1024 / 1024:.1f} MiB created before {report['cutoff']} "
+                f"in {report['batches']} batches ({report['elapsed']}s)"
+            )
+        videos = report['videos']
+        self.stdout.write(
+            f"{verb} {videos['rows_deleted']} video analyses, {videos['files_deleted']} files, "
+            f"{videos['bytes_freed'] / 1024 / 1024:.1f} MiB"
+        )
+        if report['complete']:
+            self.stdout.write(self.style.SUCCESS('Cleanup complete'))
+        elif not report['skipped']:
+            self.stdout.write(self.style.WARNING('Time budget reached; run again to resume'))
@@ -1,7 +1,10 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+import os
 import subprocess
 import sys
 
+from api.services import plan_cpu_budget
+
 
 class Command(BaseCommand):
     help = 'Start Celery worker'
@@ -10,20 +13,62 @@ class Command(BaseCommand):
         parser.add_argument(
             '--concurrency',
             type=int,
-            default=2,
-            help='Number of concurrent workers'
+            help='Number of concurrent workers (defaults to the CPU budget)'
+        )
+        parser.add_argument(
+            '--pool',
+            choices=['prefork', 'threads', 'solo'],
+            default='prefork',
+            help='Worker pool. OpenCV releases the GIL, so threads also scale'
+        )
+        parser.add_argument(
+            '--autoscale',
+            help='MAX,MIN pool size; the CPU budget is planned for MAX'
+        )
+        parser.add_argument(
+            '--prefetch-multiplier',
+            type=int,
+            default=1,
+            help='Tasks reserved per pool slot. Analyses are long and CPU bound, '
+                 'so 1 keeps work spread over workers'
         )
 
     def handle(self, *args, **options):
-        concurrency = options['concurrency']
-        self.stdout.write(self.style.SUCCESS('Starting Celery worker...'))
+        autoscale = options['autoscale']
+        if autoscale:
+            try:
+                workers = max(int(value) for value in autoscale.split(','))
+            except ValueError:
+                raise CommandError('--autoscale must be MAX,MIN')
+        elif options['pool'] == 'solo':
+            workers = 1
+        else:
+            workers = options['concurrency']
+
+        budget = plan_cpu_budget(workers=workers)
+        self.stdout.write(self.style.SUCCESS(
+            f'Starting Celery worker ({budget.workers} x {budget.opencv_threads} OpenCV threads '
+            f'on {budget.cpus} CPUs, {options["pool"]} pool)...'
+        ))
+
+        # Pool processes report metrics through files the worker aggregates
+        env = dict(os.environ)
+        env.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/face_blur_metrics/celery')
+        env['CPU_BUDGET_OPENCV_THREADS'] = str(budget.opencv_threads)
+
+        command = [
+            'celery', '-A', 'face_blur_api', 'worker',
+            '--loglevel=info',
+            f'--pool={options["pool"]}',
+            f'--prefetch-multiplier={options["prefetch_multiplier"]}'
+        ]
+        if autoscale:
+            command.append(f'--autoscale={autoscale}')
+        elif options['pool'] != 'solo':
+            command.append(f'--concurrency={budget.workers}')
 
         try:
-            subprocess.call([
-                'celery', '-A', 'face_blur_api', 'worker',
-                '--loglevel=info',
-                f'--concurrency={concurrency}'
-            ])
+            subprocess.call(command, env=env)
         except KeyboardInterrupt:
             self.stdout.write(self.style.WARNING('Celery worker stopped'))
-            sys.exit(0)
\ No newline at end of file
+            sys.exit(0)
@@ -0,0 +1,103 @@
+"""
+Prometheus metrics for the analysis pipeline.
+
+Set ``PROMETHEUS_MULTIPROC_DIR`` (gunicorn.conf.py does) before this module
+is imported to run in multi-process mode: every gunicorn worker or Celery
+pool process then writes its samples to that directory and ``render_metrics``
+combines them, so one scrape covers all of them.
+"""
+import os
+from typing import Dict, List, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+STAGE_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+STAGE_DURATION = Histogram(
+    'face_blur_stage_duration_seconds',
+    'Wall time of each analysis pipeline stage',
+    ['stage'],
+    buckets=STAGE_BUCKETS
+)
+IMAGES_ANALYZED = Counter(
+    'face_blur_images_analyzed_total',
+    'Images run through the analysis pipeline (use rate() for images/sec)',
+    ['status']
+)
+FACES_PROCESSED = Counter(
+    'face_blur_faces_processed_total',
+    'Faces detected and scored'
+)
+BLURRED_FACES = Counter(
+    'face_blur_blurred_faces_total',
+    'Faces classified as blurred'
+)
+ANALYSIS_FAILURES = Counter(
+    'face_blur_analysis_failures_total',
+    'Failed analyses by exception type',
+    ['exception']
+)
+CACHE_LOOKUPS = Counter(
+    'face_blur_cache_lookups_total',
+    'Result cache lookups',
+    ['result']
+)
+COMPUTE_QUEUE_DEPTH = Gauge(
+    'face_blur_compute_queue_depth',
+    'Jobs waiting for a compute thread (async views)',
+    multiprocess_mode='livesum'
+)
+COMPUTE_WAIT = Histogram(
+    'face_blur_compute_wait_seconds',
+    'Time jobs waited for a compute thread (async views)',
+    buckets=STAGE_BUCKETS
+)
+
+
+def observe_analysis(stage_timings: List[Dict], blur_stats: Dict = None, error: Exception = None):
+    for timing in stage_timings:
+        STAGE_DURATION.labels(stage=timing['stage']).observe(timing['wall_ms'] / 1000.0)
+
+    if error is not None:
+        IMAGES_ANALYZED.labels(status='failed').inc()
+        ANALYSIS_FAILURES.labels(exception=type(error).__name__).inc()
+        return
+
+    IMAGES_ANALYZED.labels(status='completed').inc()
+    if blur_stats:
+        FACES_PROCESSED.inc(blur_stats.get('total_faces', 0))
+        BLURRED_FACES.inc(blur_stats.get('blurred_faces', 0))
+
+
+def observe_cache_lookup(hit: bool):
+    CACHE_LOOKUPS.labels(result='hit' if hit else 'miss').inc()
+
+
+def get_metrics_registry():
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    return generate_latest(get_metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Drop a finished worker's live gauges; its counters stay in the totals"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 import uuid
 
 
@@ -20,17 +21,35 @@ class ImageAnalysis(models.Model):
         null=True,
         blank=True
     )
+    # Name of the encoding profile processed_image was written with
+    encoding_profile = models.CharField(max_length=32, null=True, blank=True)
+    # full, crops or overlay (see OUTPUT_MODES); crops are [{'face_id', 'image'}]
+    output_mode = models.CharField(max_length=16, default='full')
+    face_crops = models.JSONField(default=list, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_faces = models.IntegerField(default=0)
     blurred_faces = models.IntegerField(default=0)
     face_data = models.JSONField(default=list, blank=True)
+    blur_threshold = models.FloatField(null=True, blank=True)
+    apply_correction = models.BooleanField(default=True)
+    stage_timings = models.JSONField(default=list, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     processed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(null=True, blank=True)
+    # Computed once when the analysis completes (see api/rollups.py)
+    statistics = models.JSONField(null=True, blank=True)
+    # What this row currently adds to AnalysisRollup, so it can be taken back
+    rollup_contribution = models.JSONField(null=True, blank=True, editable=False)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Cursor pagination of the list endpoint, optionally filtered by status
+            models.Index(fields=['-created_at', '-id'], name='analysis_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='analysis_status_created_idx'),
+        ]
         verbose_name = 'Image Analysis'
         verbose_name_plural = 'Image Analyses'
 
@@ -41,9 +60,124 @@ class ImageAnalysis(models.Model):
     def has_blurred_faces(self):
         return self.blurred_faces > 0
 
+    @property
+    def output_pending(self):
+        """Correction was requested but, with LAZY_CORRECTION, not rendered yet"""
+        return (
+            self.status == 'completed'
+            and self.apply_correction
+            and self.output_mode == 'full'
+            and not self.processed_image
+        )
+
     @property
     def blur_percentage(self):
         """Calculate percentage of blurred faces"""
         if self.total_faces == 0:
             return 0
-        return (self.blurred_faces / self.total_faces) * 100
\ No newline at end of file
+        return (self.blurred_faces / self.total_faces) * 100
+
+
+class AnalysisCacheEntry(models.Model):
+    """Maps an upload's SHA-256 plus analysis parameters to a finished analysis"""
+    cache_key = models.CharField(max_length=64, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    analysis = models.ForeignKey(
+        ImageAnalysis,
+        on_delete=models.CASCADE,
+        related_name='cache_entries'
+    )
+    blur_threshold = models.FloatField()
+    apply_correction = models.BooleanField()
+    algorithm_version = models.CharField(max_length=20)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'Analysis Cache Entry'
+        verbose_name_plural = 'Analysis Cache Entries'
+
+    def __str__(self):
+        return f"Cache {self.content_hash[:12]} -> {self.analysis_id}"
+
+
+class AnalysisRollup(models.Model):
+    """Per-hour and per-day totals of finished analyses, kept up to date incrementally"""
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    completed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    total_faces = models.IntegerField(default=0)
+    blurred_faces = models.IntegerField(default=0)
+    # Face counts per blur-score bin; bins are api.rollups.BLUR_HISTOGRAM_EDGES
+    blur_histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['period', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket_start'], name='unique_rollup_bucket'),
+        ]
+        verbose_name = 'Analysis Rollup'
+        verbose_name_plural = 'Analysis Rollups'
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start:%Y-%m-%d %H:00}: {self.completed} completed"
+
+
+class CleanupCheckpoint(models.Model):
+    """Progress of an interrupted cleanup run, so the next run resumes where it stopped"""
+    name = models.CharField(max_length=64, unique=True)
+    cutoff = models.DateTimeField()
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    last_id = models.UUIDField(null=True, blank=True)
+    rows_deleted = models.BigIntegerField(default=0)
+    bytes_freed = models.BigIntegerField(default=0)
+    # The run working from this checkpoint; its claim lapses at locked_until
+    locked_by = models.UUIDField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Cleanup Checkpoint'
+        verbose_name_plural = 'Cleanup Checkpoints'
+
+    def __str__(self):
+        return f"{self.name}: {self.rows_deleted} rows before {self.cutoff:%Y-%m-%d}"
+
+
+class VideoAnalysis(models.Model):
+    """Per-face blur scores over a video clip; per-frame results are in ``results_file`` (NDJSON)"""
+    VIDEO_EXTENSIONS = ['mp4', 'avi', 'mov', 'mkv', 'webm']
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    video = models.FileField(
+        upload_to='videos/',
+        validators=[FileExtensionValidator(allowed_extensions=VIDEO_EXTENSIONS)]
+    )
+    status = models.CharField(max_length=20, choices=ImageAnalysis.STATUS_CHOICES, default='pending')
+    blur_threshold = models.FloatField(default=100.0)
+    detect_every = models.IntegerField(default=10)
+    frame_stride = models.IntegerField(default=1)
+    frames_processed = models.IntegerField(default=0)
+    # Frame, detection and scene-change counts plus per-face totals (see VideoSummary)
+    summary = models.JSONField(null=True, blank=True)
+    results_file = models.FileField(upload_to='video_results/', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name = 'Video Analysis'
+        verbose_name_plural = 'Video Analyses'
+
+    def __str__(self):
+        return f"Video analysis {self.id} - {self.status}"
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AnalysisCursorPagination(CursorPagination):
+    """
+    Keyset pagination over ``(created_at, id)``, newest first. Pages cost the
+    same however deep the cursor is, and no ``COUNT(*)`` is issued.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,237 @@
+"""
+Hourly and daily rollups of finished analyses.
+
+Every completed or failed analysis adds its counts to the hour and day
+bucket of its ``processed_at``. What it added is stored on the row
+(``rollup_contribution``) so that re-analysis, re-evaluation and deletion
+can take exactly that back; the stats endpoint then reads a handful of
+rollup rows instead of scanning ``ImageAnalysis``.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AnalysisRollup, ImageAnalysis
+
+# Upper bounds of the blur-score bins; the last bin is open-ended
+BLUR_HISTOGRAM_EDGES = [25, 50, 100, 200, 400, 800, 1600]
+PERIODS = ('hour', 'day')
+
+
+def blur_histogram(blur_scores: Iterable[float]) -> List[int]:
+    histogram = [0] * (len(BLUR_HISTOGRAM_EDGES) + 1)
+    for score in blur_scores:
+        histogram[bisect_right(BLUR_HISTOGRAM_EDGES, score)] += 1
+    return histogram
+
+
+def compute_statistics(face_data: List[Dict], total_faces: int, blurred_faces: int) -> Optional[Dict]:
+    """The per-analysis statistics, computed once when the analysis completes"""
+    if not face_data:
+        return None
+
+    blur_scores = [
+        face.get('blur_analysis', {}).get('blur_score', 0)
+        for face in face_data
+    ]
+
+    return {
+        'total_faces': total_faces,
+        'sharp_faces': total_faces - blurred_faces,
+        'blurred_faces': blurred_faces,
+        'blur_percentage': (blurred_faces / total_faces) * 100 if total_faces else 0,
+        'average_blur_score': round(sum(blur_scores) / len(blur_scores), 2),
+        'min_blur_score': round(min(blur_scores), 2),
+        'max_blur_score': round(max(blur_scores), 2),
+        'blur_histogram': blur_histogram(blur_scores),
+    }
+
+
+def bucket_start(moment: datetime, period: str) -> datetime:
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def contribution_of(analysis: ImageAnalysis) -> Optional[Dict]:
+    if analysis.status not in ('completed', 'failed'):
+        return None
+
+    histogram = (analysis.statistics or {}).get('blur_histogram')
+    return {
+        'status': analysis.status,
+        'at': (analysis.processed_at or timezone.now()).isoformat(),
+        'total_faces': analysis.total_faces if analysis.status == 'completed' else 0,
+        'blurred_faces': analysis.blurred_faces if analysis.status == 'completed' else 0,
+        'blur_histogram': histogram if analysis.status == 'completed' and histogram else [],
+    }
+
+
+def refresh_contribution(analysis: ImageAnalysis) -> List[Tuple[Dict, int]]:
+    """
+    Point ``analysis.rollup_contribution`` at its current state and return
+    the rollup changes this implies; apply them with ``apply_rollup_changes``
+    in the same transaction that saves the row.
+    """
+    changes = []
+    if analysis.rollup_contribution:
+        changes.append((analysis.rollup_contribution, -1))
+
+    analysis.rollup_contribution = contribution_of(analysis)
+    if analysis.rollup_contribution:
+        changes.append((analysis.rollup_contribution, 1))
+
+    return changes
+
+
+def removal_changes(analyses: Iterable[ImageAnalysis]) -> List[Tuple[Dict, int]]:
+    return [
+        (analysis.rollup_contribution, -1)
+        for analysis in analyses
+        if analysis.rollup_contribution
+    ]
+
+
+def apply_rollup_changes(changes: List[Tuple[Dict, int]]):
+    """Fold signed contributions into their hour and day buckets, one row lock per bucket"""
+    deltas = defaultdict(lambda: {
+        'completed': 0,
+        'failed': 0,
+        'total_faces': 0,
+        'blurred_faces': 0,
+        'blur_histogram': [0] * (len(BLUR_HISTOGRAM_EDGES) + 1),
+    })
+    for contribution, sign in changes:
+        moment = datetime.fromisoformat(contribution['at'])
+        for period in PERIODS:
+            delta = deltas[(period, bucket_start(moment, period))]
+            delta[contribution['status']] += sign
+            delta['total_faces'] += sign * contribution['total_faces']
+            delta['blurred_faces'] += sign * contribution['blurred_faces']
+            for index, count in enumerate(contribution['blur_histogram']):
+                delta['blur_histogram'][index] += sign * count
+
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        for (period, start), delta in sorted(deltas.items()):
+            rollup, _ = AnalysisRollup.objects.select_for_update().get_or_create(
+                period=period,
+                bucket_start=start,
+                defaults={'blur_histogram': [0] * (len(BLUR_HISTOGRAM_EDGES) + 1)}
+            )
+            rollup.completed += delta['completed']
+            rollup.failed += delta['failed']
+            rollup.total_faces += delta['total_faces']
+            rollup.blurred_faces += delta['blurred_faces']
+            rollup.blur_histogram = [
+                current + change
+                for current, change in zip(rollup.blur_histogram, delta['blur_histogram'])
+            ]
+            rollup.save()
+
+
+def get_rollup_stats(period: str = 'day', since: datetime = None, until: datetime = None) -> Dict:
+    """
+    Buckets of ``period`` between ``since`` and ``until`` plus their totals.
+    Cost depends on the number of buckets in the range, not on the number
+    of analyses.
+    """
+    until = until or timezone.now()
+    since = since or until - (timedelta(days=30) if period == 'day' else timedelta(hours=48))
+
+    buckets = list(
+        AnalysisRollup.objects
+        .filter(
+            period=period,
+            bucket_start__gte=bucket_start(since, period),
+            bucket_start__lte=until
+        )
+        .order_by('bucket_start')
+        .values('bucket_start', 'completed', 'failed', 'total_faces', 'blurred_faces', 'blur_histogram')
+    )
+
+    totals = {
+        'completed': sum(bucket['completed'] for bucket in buckets),
+        'failed': sum(bucket['failed'] for bucket in buckets),
+        'total_faces': sum(bucket['total_faces'] for bucket in buckets),
+        'blurred_faces': sum(bucket['blurred_faces'] for bucket in buckets),
+        'blur_histogram': [sum(counts) for counts in zip(*[
+            bucket['blur_histogram'] for bucket in buckets
+        ])] or [0] * (len(BLUR_HISTOGRAM_EDGES) + 1),
+    }
+    totals['average_faces'] = (
+        round(totals['total_faces'] / totals['completed'], 2) if totals['completed'] else 0
+    )
+    totals['blur_percentage'] = (
+        round(totals['blurred_faces'] / totals['total_faces'] * 100, 2) if totals['total_faces'] else 0
+    )
+
+    return {
+        'period': period,
+        'since': since,
+        'until': until,
+        'blur_histogram_edges': BLUR_HISTOGRAM_EDGES,
+        'totals': totals,
+        'buckets': buckets,
+    }
+
+
+def backfill_rollups(batch_size: int = 500) -> Dict:
+    """
+    Fold finished analyses that predate the rollups (no ``rollup_contribution``)
+    into them, filling in their ``statistics`` on the way. Each batch is
+    locked and committed together with its rollup changes, so the command is
+    safe to re-run and to run while analyses complete.
+    """
+    report = {'batches': 0, 'rows': 0}
+    after = None
+    while True:
+        with transaction.atomic():
+            queryset = ImageAnalysis.objects.filter(
+                status__in=['completed', 'failed'],
+                rollup_contribution__isnull=True
+            )
+            if after is not None:
+                queryset = queryset.filter(pk__gt=after)
+            analyses = list(queryset.select_for_update().order_by('pk')[:batch_size])
+            if not analyses:
+                break
+
+            changes = []
+            for analysis in analyses:
+                if analysis.status == 'completed' and analysis.statistics is None:
+                    analysis.statistics = compute_statistics(
+                        analysis.face_data, analysis.total_faces, analysis.blurred_faces
+                    )
+                # Rows finished before processed_at was recorded are bucketed by their last update
+                analysis.processed_at = analysis.processed_at or analysis.updated_at
+                changes.extend(refresh_contribution(analysis))
+
+            ImageAnalysis.objects.bulk_update(
+                analyses, ['statistics', 'processed_at', 'rollup_contribution'], batch_size=200
+            )
+            apply_rollup_changes(changes)
+
+        after = analyses[-1].pk
+        report['batches'] += 1
+        report['rows'] += len(analyses)
+
+    return report
+
+
+def delete_analyses(analyses: List[ImageAnalysis]) -> int:
+    """Delete rows and take their contributions back out of the rollups atomically"""
+    with transaction.atomic():
+        apply_rollup_changes(removal_changes(analyses))
+        _, deleted = ImageAnalysis.objects.filter(
+            pk__in=[analysis.pk for analysis in analyses]
+        ).delete()
+
+    return deleted.get(ImageAnalysis._meta.label, 0)
@@ -1,5 +1,44 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import serializers
-from .models import ImageAnalysis
+from .analysis import get_encoding_profiles
+from .models import ImageAnalysis, VideoAnalysis
+from .services import OUTPUT_MODES
+
+
+class EncodingProfileField(serializers.CharField):
+    """Name of an encoding profile; OUTPUT_ENCODING_PROFILE when omitted"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('help_text', "Output encoding profile, e.g. jpeg, jpeg-web, webp or png")
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        name = super().to_internal_value(data)
+        profiles = get_encoding_profiles()
+        if name not in profiles:
+            raise serializers.ValidationError(
+                f"Unknown encoding profile. Available: {', '.join(profiles)}"
+            )
+        return name
+
+
+class OutputModeField(serializers.ChoiceField):
+    """full, crops or overlay; OUTPUT_MODE when omitted"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault(
+            'help_text',
+            "full: corrected, annotated image; crops: one corrected image per face; "
+            "overlay: no image, draw overlay_url yourself"
+        )
+        super().__init__(OUTPUT_MODES, **kwargs)
 
 
 class ImageUploadSerializer(serializers.Serializer):
@@ -27,11 +66,14 @@ class FaceDataSerializer(serializers.Serializer):
 
 
 class ImageAnalysisSerializer(serializers.ModelSerializer):
+    """Pass ``fields`` to render only a subset of the fields"""
     face_data = FaceDataSerializer(many=True, read_only=True)
     blur_percentage = serializers.FloatField(read_only=True)
     has_blurred_faces = serializers.BooleanField(read_only=True)
     original_image_url = serializers.SerializerMethodField()
     processed_image_url = serializers.SerializerMethodField()
+    face_crops = serializers.SerializerMethodField()
+    overlay_url = serializers.SerializerMethodField()
 
     class Meta:
         model = ImageAnalysis
@@ -42,9 +84,15 @@ class ImageAnalysisSerializer(serializers.ModelSerializer):
             'blurred_faces',
             'blur_percentage',
             'has_blurred_faces',
+            'blur_threshold',
+            'apply_correction',
             'face_data',
             'original_image_url',
             'processed_image_url',
+            'encoding_profile',
+            'output_mode',
+            'face_crops',
+            'overlay_url',
             'created_at',
             'updated_at',
             'processed_at',
@@ -55,13 +103,23 @@ class ImageAnalysisSerializer(serializers.ModelSerializer):
             'status',
             'total_faces',
             'blurred_faces',
+            'blur_threshold',
+            'apply_correction',
             'face_data',
+            'encoding_profile',
+            'output_mode',
             'created_at',
             'updated_at',
             'processed_at',
             'error_message'
         ]
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_original_image_url(self, obj):
         if obj.original_image:
             request = self.context.get('request')
@@ -72,20 +130,44 @@ class ImageAnalysisSerializer(serializers.ModelSerializer):
 
     def get_processed_image_url(self, obj):
         if obj.processed_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.processed_image.url)
-            return obj.processed_image.url
-        return None
+            url = obj.processed_image.url
+        elif obj.output_pending:
+            # Rendered when this URL is first requested
+            url = reverse('image-processed', kwargs={'pk': obj.pk})
+        else:
+            return None
+
+        return self._absolute(url)
+
+    def get_face_crops(self, obj):
+        return [
+            {'face_id': crop['face_id'], 'url': self._absolute(default_storage.url(crop['image']))}
+            for crop in obj.face_crops
+        ]
+
+    def get_overlay_url(self, obj):
+        if obj.status != 'completed':
+            return None
+        return self._absolute(reverse('image-overlay', kwargs={'pk': obj.pk}))
+
+    def _absolute(self, url):
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(url)
+        return url
 
 
 class ImageAnalysisDetailSerializer(ImageAnalysisSerializer):
     statistics = serializers.SerializerMethodField()
 
     class Meta(ImageAnalysisSerializer.Meta):
-        fields = ImageAnalysisSerializer.Meta.fields + ['statistics']
+        fields = ImageAnalysisSerializer.Meta.fields + ['statistics', 'stage_timings']
+        read_only_fields = ImageAnalysisSerializer.Meta.read_only_fields + ['stage_timings']
 
     def get_statistics(self, obj):
+        # Stored at completion; rows finished before that field existed are computed here
+        if obj.statistics is not None:
+            return obj.statistics
         if not obj.face_data:
             return None
 
@@ -111,6 +193,13 @@ class AnalyzeImageSerializer(serializers.Serializer):
     apply_correction = serializers.BooleanField(default=True)
     blur_threshold = serializers.FloatField(default=100.0, min_value=0)
     async_processing = serializers.BooleanField(default=False)
+    encoding_profile = EncodingProfileField()
+    output_mode = OutputModeField()
+    force_reanalyze = serializers.BooleanField(
+        default=False,
+        help_text="Re-run detection and scoring for a completed image_id instead of "
+                  "re-evaluating its stored scores"
+    )
 
     def validate(self, data):
         if not data.get('image_id') and not data.get('image'):
@@ -124,3 +213,223 @@ class AnalyzeImageSerializer(serializers.Serializer):
             )
 
         return data
+
+
+class ReevaluateSerializer(serializers.Serializer):
+    blur_threshold = serializers.FloatField(default=100.0, min_value=0)
+    apply_correction = serializers.BooleanField(default=True)
+    encoding_profile = EncodingProfileField()
+    output_mode = OutputModeField()
+
+
+class BatchAnalyzeSerializer(serializers.Serializer):
+    image_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    images = serializers.ListField(child=serializers.ImageField(), required=False)
+    apply_correction = serializers.BooleanField(default=True)
+    blur_threshold = serializers.FloatField(default=100.0, min_value=0)
+    encoding_profile = EncodingProfileField()
+    output_mode = OutputModeField()
+
+    def validate_images(self, value):
+        upload_serializer = ImageUploadSerializer()
+        return [upload_serializer.validate_image(image) for image in value]
+
+    def validate(self, data):
+        image_count = len(data.get('image_ids', [])) + len(data.get('images', []))
+        if image_count == 0:
+            raise serializers.ValidationError(
+                "Either 'image_ids' or 'images' must be provided"
+            )
+
+        max_images = getattr(settings, 'BATCH_MAX_IMAGES', 500)
+        if image_count > max_images:
+            raise serializers.ValidationError(
+                f"Too many images in one batch. Max is {max_images}."
+            )
+
+        return data
+
+
+class BestShotSerializer(serializers.Serializer):
+    images = serializers.ListField(
+        child=serializers.ImageField(),
+        min_length=2,
+        help_text="Frames of one burst, in capture order and of one size"
+    )
+    blur_threshold = serializers.FloatField(default=100.0, min_value=0)
+    target_score = serializers.FloatField(
+        required=False,
+        min_value=0,
+        help_text="Stop at the first frame whose least sharp face scores at least this"
+    )
+
+    def validate_images(self, value):
+        max_frames = getattr(settings, 'BURST_MAX_FRAMES', 20)
+        if len(value) > max_frames:
+            raise serializers.ValidationError(
+                f"Too many frames in one burst. Max is {max_frames}."
+            )
+
+        upload_serializer = ImageUploadSerializer()
+        return [upload_serializer.validate_image(image) for image in value]
+
+
+class AnalysisListQuerySerializer(serializers.Serializer):
+    """Query parameters of the list endpoint"""
+    DEFAULT_FIELDS = [
+        field for field in ImageAnalysisSerializer.Meta.fields if field != 'face_data'
+    ]
+
+    status = serializers.ChoiceField(choices=ImageAnalysis.STATUS_CHOICES, required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    fields = serializers.CharField(
+        required=False,
+        help_text="Comma separated fields to return; face_data is only included when listed"
+    )
+
+    def validate_fields(self, value):
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown = set(fields) - set(ImageAnalysisSerializer.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        return fields
+
+    def filter_queryset(self, queryset):
+        data = self.validated_data
+        if data.get('status'):
+            queryset = queryset.filter(status=data['status'])
+        if data.get('created_after'):
+            queryset = queryset.filter(created_at__gte=data['created_after'])
+        if data.get('created_before'):
+            queryset = queryset.filter(created_at__lt=data['created_before'])
+
+        # The per-face JSON dominates row size; only load it when it is rendered
+        if 'face_data' in self.get_fields_to_render():
+            return queryset.defer('stage_timings', 'statistics', 'rollup_contribution')
+        return queryset.defer('face_data', 'stage_timings', 'statistics', 'rollup_contribution')
+
+    def get_fields_to_render(self):
+        return self.validated_data.get('fields') or self.DEFAULT_FIELDS
+
+
+class AnalysisStatsQuerySerializer(serializers.Serializer):
+    """Query parameters of the stats endpoint"""
+    MAX_BUCKETS = 24 * 31
+
+    period = serializers.ChoiceField(choices=['hour', 'day'], default='day')
+    since = serializers.DateTimeField(
+        required=False,
+        help_text="Start of the range (default: 48 hours or 30 days before 'until')"
+    )
+    until = serializers.DateTimeField(required=False, help_text="End of the range (default: now)")
+
+    def validate(self, data):
+        since, until = data.get('since'), data.get('until') or timezone.now()
+        if since:
+            if since > until:
+                raise serializers.ValidationError("'since' must be before 'until'")
+            bucket = timedelta(hours=1) if data['period'] == 'hour' else timedelta(days=1)
+            if (until - since) / bucket > self.MAX_BUCKETS:
+                raise serializers.ValidationError(
+                    f"Range spans more than {self.MAX_BUCKETS} {data['period']} buckets"
+                )
+        return data
+
+
+class OverlayQuerySerializer(serializers.Serializer):
+    """Query parameters of the overlay endpoint"""
+    format = serializers.ChoiceField(choices=['json', 'svg'], default='json')
+
+
+class VariantQuerySerializer(serializers.Serializer):
+    """Query parameters of the variant endpoint"""
+    source = serializers.ChoiceField(choices=['processed', 'original'], default='processed')
+    size = serializers.IntegerField(help_text="Longest side in pixels, one of VARIANT_SIZES")
+    format = serializers.ChoiceField(choices=[], default='jpeg')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['format'].choices = list(getattr(settings, 'VARIANT_FORMATS', {'jpeg': 'jpeg'}))
+
+    def validate_size(self, value):
+        sizes = getattr(settings, 'VARIANT_SIZES', [128, 256, 512, 1024])
+        if value not in sizes:
+            raise serializers.ValidationError(
+                f"Unsupported size. Available: {', '.join(str(size) for size in sizes)}"
+            )
+        return value
+
+
+class VideoAnalyzeSerializer(serializers.Serializer):
+    video = serializers.FileField()
+    blur_threshold = serializers.FloatField(default=100.0, min_value=0)
+    detect_every = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Run full face detection every N processed frames (default VIDEO_DETECT_EVERY)"
+    )
+    frame_stride = serializers.IntegerField(
+        default=1,
+        min_value=1,
+        help_text="Process every N-th frame; the others are skipped without decoding"
+    )
+    max_frames = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Stop after this many processed frames (capped at VIDEO_MAX_FRAMES)"
+    )
+    async_processing = serializers.BooleanField(default=False)
+
+    def validate_video(self, value):
+        max_size = getattr(settings, 'VIDEO_MAX_UPLOAD_SIZE', 200 * 1024 * 1024)
+        if value.size > max_size:
+            raise serializers.ValidationError(
+                f"Video file too large. Max size is {max_size // (1024 * 1024)}MB."
+            )
+
+        ext = value.name.split('.')[-1].lower()
+        if ext not in VideoAnalysis.VIDEO_EXTENSIONS:
+            raise serializers.ValidationError(
+                f"Unsupported file extension. Allowed: {', '.join(VideoAnalysis.VIDEO_EXTENSIONS)}"
+            )
+
+        return value
+
+
+class VideoAnalysisSerializer(serializers.ModelSerializer):
+    video_url = serializers.SerializerMethodField()
+    results_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = VideoAnalysis
+        fields = [
+            'id',
+            'status',
+            'blur_threshold',
+            'detect_every',
+            'frame_stride',
+            'frames_processed',
+            'summary',
+            'video_url',
+            'results_url',
+            'created_at',
+            'updated_at',
+            'processed_at',
+            'error_message'
+        ]
+        read_only_fields = fields
+
+    def get_video_url(self, obj):
+        return self._absolute(obj.video.url) if obj.video else None
+
+    def get_results_url(self, obj):
+        return self._absolute(obj.results_file.url) if obj.results_file else None
+
+    def _absolute(self, url):
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(url)
+        return url
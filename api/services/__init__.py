@@ -1,5 +1,79 @@
 from .face_detector import FaceDetector
 from .blur_detector import BlurDetector
 from .image_processor import ImageProcessor
+from .registry import (
+    ServiceRegistry,
+    registry,
+    get_face_detector,
+    get_blur_detector,
+    get_image_processor,
+    preload_services,
+)
+from .pipeline import (
+    AnalysisContext,
+    AnalysisPipeline,
+    PipelineStage,
+    OUTPUT_MODES,
+    build_default_pipeline,
+)
+from .tiling import detect_faces_tiled
+from .overlay import build_overlay, render_overlay_svg
+from .burst import BurstSelector, select_best_shot
+from .video import (
+    SceneChangeDetector,
+    TemplateTracker,
+    VideoAnalyzer,
+    VideoSummary,
+    analyze_video,
+    get_frame_count,
+    read_frames,
+)
+from .encoding import (
+    EncodingProfile,
+    build_encoding_profiles,
+    get_encode_executor,
+)
+from .cpu_budget import (
+    CpuBudget,
+    apply_cpu_budget,
+    available_cpus,
+    plan_cpu_budget,
+    read_cgroup_cpu_quota,
+)
 
-__all__ = ['FaceDetector', 'BlurDetector', 'ImageProcessor']
\ No newline at end of file
+__all__ = [
+    'FaceDetector',
+    'BlurDetector',
+    'ImageProcessor',
+    'ServiceRegistry',
+    'registry',
+    'get_face_detector',
+    'get_blur_detector',
+    'get_image_processor',
+    'preload_services',
+    'AnalysisContext',
+    'AnalysisPipeline',
+    'PipelineStage',
+    'OUTPUT_MODES',
+    'build_default_pipeline',
+    'detect_faces_tiled',
+    'build_overlay',
+    'render_overlay_svg',
+    'BurstSelector',
+    'select_best_shot',
+    'SceneChangeDetector',
+    'TemplateTracker',
+    'VideoAnalyzer',
+    'VideoSummary',
+    'analyze_video',
+    'get_frame_count',
+    'read_frames',
+    'EncodingProfile',
+    'build_encoding_profiles',
+    'get_encode_executor',
+    'CpuBudget',
+    'apply_cpu_budget',
+    'available_cpus',
+    'plan_cpu_budget',
+    'read_cgroup_cpu_quota',
+]
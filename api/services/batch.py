@@ -0,0 +1,68 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+from .cpu_budget import apply_cpu_budget, plan_cpu_budget
+from .pipeline import AnalysisContext, build_default_pipeline
+from .registry import preload_services
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    """
+    Shared, bounded pool of analysis worker processes.
+
+    Workers are spawned rather than forked so they never inherit the web
+    process' threads or database connections. By default the pool gets this
+    process' share of the CPU budget (its OpenCV threads) and the worker
+    processes split that share between them, so a batch never uses more
+    CPUs than the single-image path would. Each one applies its OpenCV
+    thread limit and warms its own service registry once at start-up.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            budget = plan_cpu_budget()
+            max_workers = max_workers or budget.opencv_threads
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(max(1, budget.opencv_threads // max_workers),)
+            )
+        return _pool
+
+
+def _init_worker(opencv_threads: int):
+    apply_cpu_budget(plan_cpu_budget(opencv_threads=opencv_threads))
+    preload_services()
+
+
+def shutdown_process_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def analyze_image_file(image_path: str, output_path: str = None, **options) -> Dict:
+    """
+    Run the pixel stages of the pipeline in a worker process. ``options``
+    are passed through to ``AnalysisContext``.
+    """
+    context = AnalysisContext(image_path=image_path, output_path=output_path, **options)
+    build_default_pipeline().run(context)
+
+    return {
+        'face_data': context.face_data,
+        'blur_stats': context.blur_stats,
+        'stage_timings': context.stage_timings,
+        'output_path': output_path if context.encoded_image is not None else None,
+        'face_crops': context.face_crops,
+    }
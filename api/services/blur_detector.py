@@ -1,10 +1,19 @@
 import cv2
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 
 class BlurDetector:
 
+    # Integral-image scoring pays for a Laplacian and two integrals over the
+    # whole region covering the boxes, so it only wins once the boxes cover
+    # that region about this many times over (overlapping or repeated boxes).
+    # `manage.py bench_blur_scoring` measures it: 50 faces spread over a
+    # 4000x3000 frame take ~6 ms per crop and ~100 ms integrally, the same
+    # faces packed to a coverage of ~10 ~4 ms and ~1.5 ms; the two break even
+    # at a coverage of about 1.
+    integral_min_coverage = 1.0
+
     def __init__(self, threshold: float = 100.0):
 
         self.threshold = threshold
@@ -30,27 +39,147 @@ class BlurDetector:
         blur_score = self.calculate_blur_score(image)
         return blur_score < threshold
 
+    def calculate_blur_scores(self, gray: np.ndarray,
+                              boxes: List[Tuple[int, int, int, int]]) -> List[float]:
+        """
+        Score many ``(x, y, width, height)`` boxes of one grayscale frame.
+
+        The Laplacian is computed once over the region covering all boxes and
+        summed through integral images of L and L^2, so each box costs a few
+        lookups plus its one-pixel border, which is recomputed the way a
+        per-crop Laplacian sees it. The result matches
+        ``calculate_blur_score`` on each crop.
+        """
+        if not boxes:
+            return []
+
+        height, width = gray.shape[:2]
+        clipped = []
+        for x, y, w, h in boxes:
+            x0, y0 = max(int(x), 0), max(int(y), 0)
+            x1, y1 = min(int(x) + int(w), width), min(int(y) + int(h), height)
+            clipped.append((x0, y0, x1, y1))
+
+        roi_x = min(box[0] for box in clipped)
+        roi_y = min(box[1] for box in clipped)
+        roi_x1 = max(box[2] for box in clipped)
+        roi_y1 = max(box[3] for box in clipped)
+
+        laplacian = cv2.Laplacian(gray[roi_y:roi_y1, roi_x:roi_x1], cv2.CV_32F)
+        sums, squares = cv2.integral2(laplacian, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+        scores = []
+        for x0, y0, x1, y1 in clipped:
+            crop = gray[y0:y1, x0:x1]
+            if crop.shape[0] < 3 or crop.shape[1] < 3:
+                scores.append(self.calculate_blur_score(crop))
+                continue
+
+            top, left = y0 - roi_y + 1, x0 - roi_x + 1
+            bottom, right = y1 - roi_y - 1, x1 - roi_x - 1
+            total = (sums[bottom, right] - sums[top, right]
+                     - sums[bottom, left] + sums[top, left])
+            total_sq = (squares[bottom, right] - squares[top, right]
+                        - squares[bottom, left] + squares[top, left])
+
+            border = self._crop_border_laplacian(crop)
+            total += border.sum()
+            total_sq += np.dot(border, border)
+
+            count = crop.shape[0] * crop.shape[1]
+            mean = total / count
+            scores.append(float(max(total_sq / count - mean * mean, 0.0)))
+
+        return scores
+
+    def box_coverage(self, boxes: List[Tuple[int, int, int, int]]) -> float:
+        """Total box area over the area of the region covering all boxes"""
+        box_area = sum(int(w) * int(h) for _, _, w, h in boxes)
+        roi_width = max(x + w for x, _, w, _ in boxes) - min(x for x, _, _, _ in boxes)
+        roi_height = max(y + h for _, y, _, h in boxes) - min(y for _, y, _, _ in boxes)
+
+        return box_area / float(max(roi_width * roi_height, 1))
+
+    def uses_integral(self, boxes: List[Tuple[int, int, int, int]]) -> bool:
+        # A single box costs the same either way
+        return len(boxes) > 1 and self.box_coverage(boxes) >= self.integral_min_coverage
+
+    def score_boxes(self, gray: np.ndarray,
+                    boxes: List[Tuple[int, int, int, int]]) -> List[float]:
+        """Scores of ``boxes``, integrally when they overlap enough to make it cheaper"""
+        if not boxes:
+            return []
+
+        if self.uses_integral(boxes):
+            return self.calculate_blur_scores(gray, boxes)
+
+        return [self.calculate_blur_score(gray[y:y + h, x:x + w]) for x, y, w, h in boxes]
+
+    def _crop_border_laplacian(self, crop: np.ndarray) -> np.ndarray:
+        h, w = crop.shape[:2]
+        top = cv2.Laplacian(crop[:2], cv2.CV_64F)[0]
+        bottom = cv2.Laplacian(crop[h - 2:], cv2.CV_64F)[1]
+        left = cv2.Laplacian(crop[:, :2], cv2.CV_64F)[1:h - 1, 0]
+        right = cv2.Laplacian(crop[:, w - 2:], cv2.CV_64F)[1:h - 1, 1]
+
+        return np.concatenate([top, bottom, left, right])
+
     def analyze_faces_blur(self, face_regions: List[np.ndarray],
-                           face_data: List[Dict]) -> List[Dict]:
+                           face_data: List[Dict],
+                           threshold: float = None,
+                           gray: np.ndarray = None) -> List[Dict]:
 
-        updated_face_data = []
+        if threshold is None:
+            threshold = self.threshold
 
-        for i, (face_region, face_info) in enumerate(zip(face_regions, face_data)):
-            blur_score = self.calculate_blur_score(face_region)
-            is_blurred = blur_score < self.threshold
+        if gray is not None:
+            blur_scores = self.score_boxes(gray, [
+                (face['bounding_box']['x'], face['bounding_box']['y'],
+                 face['bounding_box']['width'], face['bounding_box']['height'])
+                for face in face_data
+            ])
+        else:
+            blur_scores = [self.calculate_blur_score(face_region)
+                           for face_region in face_regions]
 
+        updated_face_data = []
+
+        for blur_score, face_info in zip(blur_scores, face_data):
             face_info_copy = face_info.copy()
-            face_info_copy['blur_analysis'] = {
-                'blur_score': round(blur_score, 2),
-                'is_blurred': is_blurred,
-                'threshold': self.threshold,
-                'blur_level': self._get_blur_level(blur_score)
-            }
+            face_info_copy['blur_analysis'] = self._build_blur_analysis(blur_score, threshold)
+
+            updated_face_data.append(face_info_copy)
 
+        return updated_face_data
+
+    def reclassify_faces(self, face_data: List[Dict], threshold: float = None) -> List[Dict]:
+        """
+        Re-derive ``is_blurred``/``blur_level`` for a new threshold from the
+        stored scores, without touching any pixels.
+        """
+        if threshold is None:
+            threshold = self.threshold
+
+        updated_face_data = []
+        for face_info in face_data:
+            blur_analysis = face_info.get('blur_analysis', {})
+            blur_score = blur_analysis.get('raw_score', blur_analysis.get('blur_score', 0))
+
+            face_info_copy = face_info.copy()
+            face_info_copy['blur_analysis'] = self._build_blur_analysis(blur_score, threshold)
             updated_face_data.append(face_info_copy)
 
         return updated_face_data
 
+    def _build_blur_analysis(self, blur_score: float, threshold: float) -> Dict:
+        return {
+            'blur_score': round(blur_score, 2),
+            'raw_score': blur_score,
+            'is_blurred': blur_score < threshold,
+            'threshold': threshold,
+            'blur_level': self._get_blur_level(blur_score)
+        }
+
     def _get_blur_level(self, blur_score: float) -> str:
         if blur_score < 50:
             return 'severe'
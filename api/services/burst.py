@@ -0,0 +1,152 @@
+from typing import Dict, Iterable, List
+
+import cv2
+import numpy as np
+
+from .registry import get_blur_detector, get_face_detector
+from .video import Box, TemplateTracker
+
+
+class BurstSelector:
+    """
+    Picks the sharpest shot of a burst: frames of one subject taken moments
+    apart. Faces are detected once, on the first frame at no more than
+    ``detection_max_side`` pixels, and found in the later frames by template
+    matching at that same low resolution. Only the blur scoring runs at full
+    resolution, one ``score_boxes`` pass per frame for all of its faces.
+
+    A frame scores as its least sharp face, a face that could not be found
+    counting as 0, so the best frame is the one where everyone is sharp.
+    Without faces, the whole frame's Laplacian variance is used.
+    """
+
+    def __init__(self, blur_threshold: float = 100.0, target_score: float = None,
+                 detection_max_side: int = 640, track_min_score: float = 0.5):
+        self.blur_threshold = blur_threshold
+        self.target_score = target_score
+        self.detection_max_side = detection_max_side
+        self.track_min_score = track_min_score
+        self.frames: List[Dict] = []
+        self.stopped_early = False
+        self._shape = None
+        self._scale = 1.0
+        self._trackers: List[TemplateTracker] = []
+        self._reference_boxes: Dict[int, Box] = {}
+        self._small_boxes: Dict[int, Box] = {}
+        self._best_faces: Dict[int, Dict] = {}
+
+    def process(self, index: int, gray: np.ndarray) -> Dict:
+        """Score one grayscale frame; sets ``stopped_early`` once it clears ``target_score``"""
+        if self._shape is None:
+            self._shape = gray.shape[:2]
+            self._scale = min(1.0, self.detection_max_side / float(max(self._shape)))
+            self._detect(gray)
+        elif gray.shape[:2] != self._shape:
+            raise ValueError("Burst frames must all have the same size")
+
+        face_data = self._locate(gray, reference=not self.frames)
+        face_data = get_blur_detector().analyze_faces_blur(
+            [], face_data, threshold=self.blur_threshold, gray=gray
+        )
+
+        if self._reference_boxes:
+            scores = {face['face_id']: face['blur_analysis']['raw_score'] for face in face_data}
+            frame_score = min(scores.get(face_id, 0.0) for face_id in self._reference_boxes)
+        else:
+            frame_score = get_blur_detector().calculate_blur_score(gray)
+
+        for face in face_data:
+            best = self._best_faces.get(face['face_id'])
+            if best is None or face['blur_analysis']['raw_score'] > best['blur_analysis']['raw_score']:
+                self._best_faces[face['face_id']] = dict(face, best_frame=index)
+
+        result = {'frame': index, 'frame_score': round(frame_score, 2), 'faces': face_data}
+        self.frames.append(dict(result, raw_score=frame_score))
+        if self.target_score is not None and frame_score >= self.target_score:
+            self.stopped_early = True
+
+        return result
+
+    def result(self) -> Dict:
+        best = max(self.frames, key=lambda frame: frame['raw_score'], default=None)
+        faces = []
+        for face_id in sorted(self._reference_boxes):
+            face = self._best_faces.get(face_id)
+            if face is not None:
+                faces.append({
+                    'face_id': face_id,
+                    'best_frame': face['best_frame'],
+                    'bounding_box': face['bounding_box'],
+                    'blur_analysis': face['blur_analysis'],
+                })
+
+        return {
+            'frames_analyzed': len(self.frames),
+            'stopped_early': self.stopped_early,
+            'target_score': self.target_score,
+            'best_frame': best['frame'] if best else None,
+            'best_frame_score': best['frame_score'] if best else None,
+            'faces': faces,
+            'frames': [
+                {key: value for key, value in frame.items() if key != 'raw_score'}
+                for frame in self.frames
+            ],
+        }
+
+    def _detect(self, gray: np.ndarray):
+        face_data = get_face_detector().detect_faces_coarse_to_fine(
+            gray, max_side=self.detection_max_side
+        )
+        small = self._downscale(gray)
+        for face in face_data:
+            box = tuple(face['bounding_box'][key] for key in ('x', 'y', 'width', 'height'))
+            small_box = tuple(max(int(round(value * self._scale)), 1) for value in box)
+            self._reference_boxes[face['face_id']] = box
+            self._small_boxes[face['face_id']] = small_box
+            self._trackers.append(TemplateTracker(
+                face['face_id'], small, small_box, min_score=self.track_min_score
+            ))
+
+    def _locate(self, gray: np.ndarray, reference: bool) -> List[Dict]:
+        """Full-resolution boxes of the faces found in ``gray``"""
+        if not self._trackers:
+            return []
+
+        small = None if reference else self._downscale(gray)
+        height, width = self._shape
+        face_data = []
+        for tracker in self._trackers:
+            if small is not None and not tracker.update(small):
+                continue
+
+            x, y, w, h = self._reference_boxes[tracker.track_id]
+            small_x, small_y = self._small_boxes[tracker.track_id][:2]
+            x = min(max(x + int(round((tracker.box[0] - small_x) / self._scale)), 0), width - w)
+            y = min(max(y + int(round((tracker.box[1] - small_y) / self._scale)), 0), height - h)
+            face_data.append({
+                'face_id': tracker.track_id,
+                'bounding_box': {'x': x, 'y': y, 'width': w, 'height': h},
+                'match_score': 1.0 if reference else round(tracker.score, 3),
+            })
+
+        return face_data
+
+    def _downscale(self, gray: np.ndarray) -> np.ndarray:
+        if self._scale >= 1.0:
+            return gray
+        return cv2.resize(gray, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+
+
+def select_best_shot(frames: Iterable[np.ndarray], **options) -> Dict:
+    """
+    Run ``BurstSelector`` over grayscale ``frames`` (``options`` go to it),
+    stopping at the first frame that clears its ``target_score``, so the
+    rest are never decoded when ``frames`` is lazy.
+    """
+    selector = BurstSelector(**options)
+    for index, gray in enumerate(frames):
+        selector.process(index, gray)
+        if selector.stopped_early:
+            break
+
+    return selector.result()
@@ -0,0 +1,85 @@
+import threading
+from typing import Dict, Tuple
+
+import cv2
+import numpy as np
+
+
+class CorrectionEngine:
+    """
+    Face enhancement (bilateral filter, unsharp mask, CLAHE on the L channel)
+    without per-face allocations.
+
+    Every thread keeps its own CLAHE instance and flat scratch buffers that
+    only grow, to the largest face seen so far; each face works on views of
+    them. CLAHE runs on the L plane extracted from and inserted back into the
+    LAB buffer instead of a full split/merge, and the result is written
+    straight into the caller's output region.
+    """
+
+    def __init__(self, clip_limit: float = 3.0, tile_grid_size: Tuple[int, int] = (8, 8),
+                 sharpen_strength: float = 2.0):
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tile_grid_size
+        self.sharpen_strength = sharpen_strength
+        self._local = threading.local()
+
+    def _get_clahe(self):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid_size)
+            self._local.clahe = clahe
+        return clahe
+
+    def _get_workspace(self, height: int, width: int) -> Dict[str, np.ndarray]:
+        pixels = height * width
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None or buffers['l'].size < pixels:
+            buffers = {
+                'filtered': np.empty(pixels * 3, dtype=np.uint8),
+                'blurred': np.empty(pixels * 3, dtype=np.uint8),
+                'lab': np.empty(pixels * 3, dtype=np.uint8),
+                'l': np.empty(pixels, dtype=np.uint8),
+            }
+            self._local.buffers = buffers
+
+        return {
+            name: buffer[:pixels * (3 if name != 'l' else 1)].reshape(
+                (height, width, 3) if name != 'l' else (height, width)
+            )
+            for name, buffer in buffers.items()
+        }
+
+    def workspace_bytes(self) -> int:
+        buffers = getattr(self._local, 'buffers', None)
+        return sum(buffer.nbytes for buffer in buffers.values()) if buffers else 0
+
+    def enhance(self, face_region: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Enhance a BGR ``face_region`` into ``out`` (a new array when omitted).
+        ``out`` may be the same region of the source image.
+        """
+        height, width = face_region.shape[:2]
+        if out is None:
+            out = np.empty_like(face_region)
+        if height == 0 or width == 0:
+            return out
+
+        workspace = self._get_workspace(height, width)
+        filtered, blurred, lab, l_channel = (
+            workspace['filtered'], workspace['blurred'], workspace['lab'], workspace['l']
+        )
+
+        cv2.bilateralFilter(face_region, 9, 75, 75, dst=filtered)
+        cv2.GaussianBlur(filtered, (0, 0), 3, dst=blurred)
+        # Unsharp mask, written over the blurred copy once it is consumed
+        cv2.addWeighted(filtered, 1.0 + self.sharpen_strength, blurred,
+                        -self.sharpen_strength, 0, dst=blurred)
+
+        cv2.cvtColor(blurred, cv2.COLOR_BGR2LAB, dst=lab)
+        cv2.extractChannel(lab, 0, dst=l_channel)
+        self._get_clahe().apply(l_channel, dst=l_channel)
+        cv2.insertChannel(l_channel, lab, 0)
+        cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=out)
+
+        return out
@@ -0,0 +1,98 @@
+import math
+import os
+from typing import Dict, Optional
+
+import cv2
+
+CGROUP_V2_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_CPU_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+CGROUP_V1_CPU_PERIOD = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def read_cgroup_cpu_quota() -> Optional[float]:
+    """CPUs allowed by the cgroup CPU quota (v2 or v1), or None when unlimited"""
+    cpu_max = _read(CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / float(period)
+        return None
+
+    quota, period = _read(CGROUP_V1_CPU_QUOTA), _read(CGROUP_V1_CPU_PERIOD)
+    if quota and period and int(quota) > 0:
+        return int(quota) / float(period)
+    return None
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask capped by the cgroup quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = read_cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+
+    return max(1, cpus)
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+class CpuBudget:
+    """
+    How one node's CPUs are split: ``workers`` concurrent analyses (gunicorn
+    workers or Celery pool slots), each letting OpenCV use
+    ``opencv_threads`` threads, so that together they fill but never
+    oversubscribe the CPUs.
+    """
+
+    def __init__(self, cpus: int, workers: int, opencv_threads: int):
+        self.cpus = cpus
+        self.workers = workers
+        self.opencv_threads = opencv_threads
+
+    def as_dict(self) -> Dict:
+        return {
+            'cpus': self.cpus,
+            'workers': self.workers,
+            'opencv_threads': self.opencv_threads,
+        }
+
+    def __repr__(self):
+        return f'CpuBudget(cpus={self.cpus}, workers={self.workers}, opencv_threads={self.opencv_threads})'
+
+
+def plan_cpu_budget(workers: int = None, opencv_threads: int = None, cpus: int = None) -> CpuBudget:
+    """
+    The one policy used by gunicorn, Celery and the in-process thread pools.
+
+    Unset values come from ``CPU_BUDGET_WORKERS`` / ``CPU_BUDGET_OPENCV_THREADS``
+    and otherwise default to one worker per available CPU, each running
+    OpenCV with the CPUs left per worker (one thread when every CPU has a
+    worker). Request-level parallelism scales better than OpenCV's
+    internal threads; `manage.py bench_cpu_budget` measures the split.
+    """
+    cpus = cpus or available_cpus()
+    workers = workers or _env_int('CPU_BUDGET_WORKERS') or cpus
+    opencv_threads = opencv_threads or _env_int('CPU_BUDGET_OPENCV_THREADS') or max(1, cpus // workers)
+
+    return CpuBudget(cpus, workers, opencv_threads)
+
+
+def apply_cpu_budget(budget: CpuBudget):
+    """Limit OpenCV's thread pool in this process; forked children inherit it through the environment"""
+    cv2.setNumThreads(budget.opencv_threads)
+    os.environ['CPU_BUDGET_OPENCV_THREADS'] = str(budget.opencv_threads)
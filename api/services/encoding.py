@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import cv2
+
+from .cpu_budget import plan_cpu_budget
+
+FORMAT_EXTENSIONS = {
+    'jpeg': '.jpg',
+    'webp': '.webp',
+    'png': '.png',
+}
+FORMAT_CONTENT_TYPES = {
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+    'png': 'image/png',
+}
+
+DEFAULT_PROFILE = 'jpeg'
+
+_encode_executor = None
+_encode_executor_lock = threading.Lock()
+
+
+class EncodingProfile:
+    """
+    How a processed image is written: ``format`` plus its knobs. ``quality``
+    (1-100) applies to JPEG and WebP, ``progressive``/``optimize`` to JPEG and
+    ``compression`` (0-9) to PNG.
+    """
+
+    def __init__(self, name: str, format: str = 'jpeg', quality: int = 95,
+                 progressive: bool = False, optimize: bool = False, compression: int = 3):
+        if format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unsupported output format '{format}', use {', '.join(FORMAT_EXTENSIONS)}")
+        if not 1 <= quality <= 100:
+            raise ValueError(f"Quality must be between 1 and 100, got {quality}")
+        if not 0 <= compression <= 9:
+            raise ValueError(f"PNG compression must be between 0 and 9, got {compression}")
+
+        self.name = name
+        self.format = format
+        self.quality = quality
+        self.progressive = progressive
+        self.optimize = optimize
+        self.compression = compression
+
+    @property
+    def extension(self) -> str:
+        return FORMAT_EXTENSIONS[self.format]
+
+    @property
+    def content_type(self) -> str:
+        return FORMAT_CONTENT_TYPES[self.format]
+
+    def imencode_params(self) -> List[int]:
+        if self.format == 'jpeg':
+            return [
+                cv2.IMWRITE_JPEG_QUALITY, self.quality,
+                cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive),
+                cv2.IMWRITE_JPEG_OPTIMIZE, int(self.optimize),
+            ]
+        if self.format == 'webp':
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        return [cv2.IMWRITE_PNG_COMPRESSION, self.compression]
+
+    def as_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'format': self.format,
+            'quality': self.quality,
+            'progressive': self.progressive,
+            'optimize': self.optimize,
+            'compression': self.compression,
+        }
+
+    def __repr__(self):
+        return f'EncodingProfile({self.name!r}, format={self.format!r})'
+
+
+# 'jpeg' matches what cv2.imwrite produced before profiles existed
+BUILTIN_PROFILES = {
+    'jpeg': {'format': 'jpeg', 'quality': 95},
+    'jpeg-web': {'format': 'jpeg', 'quality': 82, 'progressive': True, 'optimize': True},
+    'jpeg-small': {'format': 'jpeg', 'quality': 70, 'progressive': True, 'optimize': True},
+    'webp': {'format': 'webp', 'quality': 80},
+    'png': {'format': 'png', 'compression': 3},
+    'png-small': {'format': 'png', 'compression': 6},
+}
+
+
+def build_encoding_profiles(overrides: Dict[str, Dict] = None) -> Dict[str, EncodingProfile]:
+    """The built-in profiles with ``overrides`` (name -> options) added or replacing them"""
+    definitions = dict(BUILTIN_PROFILES)
+    definitions.update(overrides or {})
+
+    return {
+        name: EncodingProfile(name, **options)
+        for name, options in definitions.items()
+    }
+
+
+def get_encode_executor(max_workers: int = None) -> ThreadPoolExecutor:
+    global _encode_executor
+
+    with _encode_executor_lock:
+        if _encode_executor is None:
+            # By default encoding uses this worker's share of the CPU budget
+            _encode_executor = ThreadPoolExecutor(
+                max_workers=max_workers or plan_cpu_budget().opencv_threads,
+                thread_name_prefix='encode'
+            )
+        return _encode_executor
@@ -5,6 +5,12 @@ import os
 
 
 class FaceDetector:
+    scale_factor = 1.1
+    min_neighbors = 5
+    min_size = (30, 30)
+    # Smallest window the frontal-face cascade was trained on
+    cascade_window = (24, 24)
+
     def __init__(self):
         cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         self.face_cascade = cv2.CascadeClassifier(cascade_path)
@@ -17,15 +23,92 @@ class FaceDetector:
         if image is None:
             raise ValueError(f"Failed to load image from {image_path}")
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = self.to_grayscale(image)
+        face_data = self.detect_faces_in_gray(gray)
+
+        return image, face_data
+
+    def to_grayscale(self, image: np.ndarray) -> np.ndarray:
+        if len(image.shape) == 2:
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def detect_faces_in_gray(self, gray: np.ndarray) -> List[Dict]:
+        faces = self.detect_boxes(gray, self.min_size)
+
+        return self.build_face_data(faces)
+
+    def detect_faces_coarse_to_fine(self, gray: np.ndarray, max_side: int = 1024,
+                                    refine: bool = True,
+                                    refine_margin: float = 0.25) -> List[Dict]:
+        """
+        Search a copy of ``gray`` downscaled so its longest side is at most
+        ``max_side``, map the boxes back to full resolution and, with
+        ``refine``, re-detect each one inside a small full-resolution ROI.
+
+        Faces smaller than ``cascade_window / scale`` pixels in the original
+        are below what the cascade can see in the downscaled copy; that is
+        the recall cost of a lower cap.
+        """
+        height, width = gray.shape[:2]
+        scale = max_side / float(max(height, width))
+        if scale >= 1.0:
+            return self.detect_faces_in_gray(gray)
+
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        min_size = (max(int(self.min_size[0] * scale), self.cascade_window[0]),
+                    max(int(self.min_size[1] * scale), self.cascade_window[1]))
+        coarse_faces = self.detect_boxes(small, min_size)
+
+        faces = []
+        for x, y, w, h in coarse_faces:
+            box = (int(round(x / scale)), int(round(y / scale)),
+                   int(round(w / scale)), int(round(h / scale)))
+            if refine:
+                box = self._refine_box(gray, box, refine_margin)
+            faces.append(box)
+
+        return self.build_face_data(faces)
+
+    def detect_boxes(self, gray: np.ndarray, min_size: Tuple[int, int],
+                     max_size: Tuple[int, int] = None):
         faces = self.face_cascade.detectMultiScale(
             gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30),
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=min_size,
+            maxSize=max_size or (0, 0),
             flags=cv2.CASCADE_SCALE_IMAGE
         )
 
+        return [tuple(int(v) for v in face) for face in faces]
+
+    def _refine_box(self, gray: np.ndarray, box: Tuple[int, int, int, int],
+                    margin: float) -> Tuple[int, int, int, int]:
+        x, y, w, h = box
+        height, width = gray.shape[:2]
+        pad_x, pad_y = int(w * margin), int(h * margin)
+        x0, y0 = max(x - pad_x, 0), max(y - pad_y, 0)
+        x1, y1 = min(x + w + pad_x, width), min(y + h + pad_y, height)
+
+        candidates = self.detect_boxes(
+            gray[y0:y1, x0:x1],
+            min_size=(max(int(w * 0.7), self.cascade_window[0]),
+                      max(int(h * 0.7), self.cascade_window[1])),
+            max_size=(int(w * 1.4) + 1, int(h * 1.4) + 1)
+        )
+        if not candidates:
+            return box
+
+        cx, cy = x + w / 2.0, y + h / 2.0
+        rx, ry, rw, rh = min(
+            candidates,
+            key=lambda c: (x0 + c[0] + c[2] / 2.0 - cx) ** 2 + (y0 + c[1] + c[3] / 2.0 - cy) ** 2
+        )
+
+        return x0 + rx, y0 + ry, rw, rh
+
+    def build_face_data(self, faces) -> List[Dict]:
         face_data = []
         for i, (x, y, w, h) in enumerate(faces):
             face_info = {
@@ -40,7 +123,7 @@ class FaceDetector:
             }
             face_data.append(face_info)
 
-        return image, face_data
+        return face_data
 
     def extract_face_regions(self, image: np.ndarray, face_data: List[Dict]) -> List[np.ndarray]:
         face_regions = []
@@ -54,8 +137,8 @@ class FaceDetector:
 
     def draw_faces(self, image: np.ndarray, face_data: List[Dict],
                    color: Tuple[int, int, int] = (0, 255, 0),
-                   thickness: int = 2) -> np.ndarray:
-        result_image = image.copy()
+                   thickness: int = 2, in_place: bool = False) -> np.ndarray:
+        result_image = image if in_place else image.copy()
 
         for face in face_data:
             bbox = face['bounding_box']
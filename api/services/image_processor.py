@@ -4,11 +4,22 @@ from typing import Tuple, List, Dict
 import os
 from PIL import Image
 
+from .correction import CorrectionEngine
+
+
+def get_face_labels(face: Dict) -> Tuple[str, str]:
+    """The two annotation lines drawn above a face"""
+    is_blurred = face.get('blur_analysis', {}).get('is_blurred', False)
+    blur_score = face.get('blur_analysis', {}).get('blur_score', 0)
+    status = "BLURRED" if is_blurred else "SHARP"
+
+    return f"Face {face['face_id']}: {status}", f"Score: {blur_score:.1f}"
+
 
 class ImageProcessor:
 
     def __init__(self):
-        pass
+        self.correction_engine = CorrectionEngine()
 
     def sharpen_image(self, image: np.ndarray, strength: float = 1.5) -> np.ndarray:
 
@@ -20,8 +31,6 @@ class ImageProcessor:
 
     def deblur_wiener(self, image: np.ndarray) -> np.ndarray:
 
-        img_float = image.astype(np.float64) / 255.0
-
         deblurred = cv2.bilateralFilter(image, 9, 75, 75)
 
         deblurred = self.sharpen_image(deblurred, strength=2.0)
@@ -33,20 +42,17 @@ class ImageProcessor:
         if not is_blurred:
             return face_region
 
-        enhanced = self.deblur_wiener(face_region)
+        return self.correction_engine.enhance(face_region)
 
-        lab = cv2.cvtColor(enhanced, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        l = clahe.apply(l)
-        enhanced = cv2.merge([l, a, b])
-        enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
+    def process_full_image(self, image: np.ndarray, face_data: List[Dict],
+                           in_place: bool = False) -> np.ndarray:
+        """
+        With ``in_place`` the enhanced faces are written back into ``image``
+        instead of a copy; only use it when the caller owns the buffer.
+        Overlapping faces then see the already enhanced pixels.
+        """
 
-        return enhanced
-
-    def process_full_image(self, image: np.ndarray, face_data: List[Dict]) -> np.ndarray:
-
-        result_image = image.copy()
+        result_image = image if in_place else image.copy()
 
         for face in face_data:
             bbox = face['bounding_box']
@@ -57,30 +63,46 @@ class ImageProcessor:
             if is_blurred:
                 face_region = image[y:y + h, x:x + w]
 
-                enhanced_face = self.enhance_face_region(face_region, True)
-
-                result_image[y:y + h, x:x + w] = enhanced_face
+                self.correction_engine.enhance(face_region, out=result_image[y:y + h, x:x + w])
 
         return result_image
 
-    def add_annotations(self, image: np.ndarray, face_data: List[Dict]) -> np.ndarray:
+    def crop_faces(self, image: np.ndarray, face_data: List[Dict],
+                   in_place: bool = False) -> List[Tuple[int, np.ndarray]]:
+        """
+        ``(face_id, crop)`` per face, blurred faces enhanced. Crops are views
+        of ``image``; with ``in_place`` enhanced faces are written back into
+        it, otherwise into new face-sized arrays.
+        """
+
+        crops = []
+        for face in face_data:
+            bbox = face['bounding_box']
+            x, y, w, h = bbox['x'], bbox['y'], bbox['width'], bbox['height']
+            crop = image[y:y + h, x:x + w]
+
+            if face.get('blur_analysis', {}).get('is_blurred', False):
+                crop = self.correction_engine.enhance(crop, out=crop if in_place else None)
+
+            crops.append((face['face_id'], crop))
 
-        annotated = image.copy()
+        return crops
+
+    def add_annotations(self, image: np.ndarray, face_data: List[Dict],
+                        in_place: bool = False) -> np.ndarray:
+
+        annotated = image if in_place else image.copy()
 
         for face in face_data:
             bbox = face['bounding_box']
             x, y, w, h = bbox['x'], bbox['y'], bbox['width'], bbox['height']
 
             is_blurred = face.get('blur_analysis', {}).get('is_blurred', False)
-            blur_score = face.get('blur_analysis', {}).get('blur_score', 0)
-
             color = (0, 0, 255) if is_blurred else (0, 255, 0)  # Red if blurred, green if sharp
 
             cv2.rectangle(annotated, (x, y), (x + w, y + h), color, 2)
 
-            status = "BLURRED" if is_blurred else "SHARP"
-            label = f"Face {face['face_id']}: {status}"
-            score_label = f"Score: {blur_score:.1f}"
+            label, score_label = get_face_labels(face)
 
             cv2.putText(annotated, label, (x, y - 25),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
@@ -89,10 +111,68 @@ class ImageProcessor:
 
         return annotated
 
-    def save_image(self, image: np.ndarray, output_path: str) -> str:
+    def get_read_flags(self, grayscale: bool = False, reduction: int = 1) -> int:
+        """
+        ``cv2.imread``/``cv2.imdecode`` flags. ``reduction`` of 2, 4 or 8 uses
+        the ``IMREAD_REDUCED_*`` modes, which let libjpeg decode straight to a
+        smaller size through DCT scaling.
+        """
+        if reduction not in (1, 2, 4, 8):
+            raise ValueError(f"Unsupported decode reduction {reduction}, use 1, 2, 4 or 8")
+
+        if reduction == 1:
+            return cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+
+        mode = 'GRAYSCALE' if grayscale else 'COLOR'
+        return getattr(cv2, f'IMREAD_REDUCED_{mode}_{reduction}')
+
+    def get_image_size(self, image_path: str) -> Tuple[int, int]:
+        """``(width, height)`` from the file header, without decoding the pixels"""
+
+        with Image.open(image_path) as image:
+            return image.size
+
+    def load_image(self, image_path: str, grayscale: bool = False,
+                   reduction: int = 1) -> np.ndarray:
+
+        image = cv2.imread(image_path, self.get_read_flags(grayscale, reduction))
+        if image is None:
+            raise ValueError(f"Failed to load image from {image_path}")
+
+        return image
+
+    def decode_image(self, data: bytes, grayscale: bool = False,
+                     reduction: int = 1) -> np.ndarray:
+
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        image = cv2.imdecode(buffer, self.get_read_flags(grayscale, reduction))
+        if image is None:
+            raise ValueError("Failed to decode image data")
+
+        return image
+
+    def encode_image(self, image: np.ndarray, extension: str = '.jpg',
+                     params: List[int] = None) -> bytes:
+
+        success, buffer = cv2.imencode(extension, image, params or [])
+        if not success:
+            raise ValueError(f"Failed to encode image as {extension}")
+
+        return buffer.tobytes()
+
+    def write_encoded_image(self, data: bytes, output_path: str) -> str:
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        with open(output_path, 'wb') as output_file:
+            output_file.write(data)
+
+        return output_path
+
+    def save_image(self, image: np.ndarray, output_path: str, params: List[int] = None) -> str:
 
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        cv2.imwrite(output_path, image)
+        cv2.imwrite(output_path, image, params or [])
 
-        return output_path
\ No newline at end of file
+        return output_path
@@ -0,0 +1,50 @@
+from typing import Dict, List
+from xml.sax.saxutils import escape, quoteattr
+
+from .image_processor import get_face_labels
+
+BLURRED_COLOR = '#ff0000'
+SHARP_COLOR = '#00ff00'
+
+
+def build_overlay(face_data: List[Dict], width: int, height: int) -> Dict:
+    """
+    The boxes and labels ``ImageProcessor.add_annotations`` burns in, as data
+    for clients to draw over the original image themselves.
+    """
+    faces = []
+    for face in face_data:
+        blur_analysis = face.get('blur_analysis', {})
+        is_blurred = blur_analysis.get('is_blurred', False)
+        faces.append({
+            'face_id': face['face_id'],
+            'bounding_box': face['bounding_box'],
+            'is_blurred': is_blurred,
+            'blur_score': blur_analysis.get('blur_score'),
+            'color': BLURRED_COLOR if is_blurred else SHARP_COLOR,
+            'labels': list(get_face_labels(face)),
+        })
+
+    return {'width': width, 'height': height, 'faces': faces}
+
+
+def render_overlay_svg(overlay: Dict) -> str:
+    """``overlay`` as a transparent SVG the size of the image"""
+    elements = []
+    for face in overlay['faces']:
+        box = face['bounding_box']
+        color = quoteattr(face['color'])
+        label, score_label = face['labels']
+        elements.append(
+            f'<rect x="{box["x"]}" y="{box["y"]}" width="{box["width"]}" height="{box["height"]}" '
+            f'fill="none" stroke={color} stroke-width="2"/>'
+            f'<text x="{box["x"]}" y="{box["y"] - 25}" fill={color} font-size="16">{escape(label)}</text>'
+            f'<text x="{box["x"]}" y="{box["y"] - 10}" fill={color} font-size="13">{escape(score_label)}</text>'
+        )
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{overlay["width"]}" height="{overlay["height"]}" '
+        f'viewBox="0 0 {overlay["width"]} {overlay["height"]}" font-family="sans-serif">'
+        + ''.join(elements)
+        + '</svg>'
+    )
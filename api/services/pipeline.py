@@ -0,0 +1,448 @@
+import time
+import tracemalloc
+from typing import Dict, Iterable, List, Optional
+
+from .encoding import BUILTIN_PROFILES, DEFAULT_PROFILE, EncodingProfile
+from .registry import get_face_detector, get_blur_detector, get_image_processor
+from .tiling import detect_faces_tiled
+
+# Bump whenever a change alters face_data or the processed image for the same
+# input and parameters; it is part of the result cache key.
+ALGORITHM_VERSION = '2'
+
+# full: the corrected, annotated frame; crops: one corrected image per face;
+# overlay: no pixels, clients draw the boxes from the face data
+OUTPUT_MODES = ('full', 'crops', 'overlay')
+
+
+class AnalysisContext:
+    """Mutable state handed from one pipeline stage to the next"""
+
+    def __init__(self, image_path: str = None, blur_threshold: float = 100.0,
+                 apply_correction: bool = True, output_path: str = None,
+                 detection_max_side: int = None, refine_detections: bool = True,
+                 image_bytes: bytes = None, metrics_decode_reduction: int = 1,
+                 copy_free: bool = True, tiled_min_pixels: int = None,
+                 tile_size: int = 1024, tile_workers: int = None, encoding: Dict = None,
+                 lazy_correction: bool = False, output_mode: str = 'full',
+                 crops_path: str = None):
+        self.image_path = image_path
+        self.image_bytes = image_bytes
+        self.blur_threshold = blur_threshold
+        self.apply_correction = apply_correction
+        # Record the metrics only; the processed image is rendered on first fetch
+        self.lazy_correction = lazy_correction
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode '{output_mode}', use {', '.join(OUTPUT_MODES)}")
+        self.output_mode = output_mode
+        self.output_path = output_path
+        # Face crops are written to crops_path.format(face_id=...)
+        self.crops_path = crops_path
+        self.detection_max_side = detection_max_side
+        self.refine_detections = refine_detections
+        self.tiled_min_pixels = tiled_min_pixels
+        self.tile_size = tile_size
+        self.tile_workers = tile_workers
+        self.metrics_decode_reduction = metrics_decode_reduction
+        self.decode_reduction = 1
+        self.encoding = EncodingProfile(**encoding) if encoding else EncodingProfile(
+            DEFAULT_PROFILE, **BUILTIN_PROFILES[DEFAULT_PROFILE]
+        )
+        # With an executor the output is encoded and written on its threads;
+        # wait_for_encode() joins it
+        self.encode_executor = None
+        self.encode_future = None
+        # With copy_free, stages write into buffers the pipeline allocated
+        # itself, so a request holds at most one output image
+        self.copy_free = copy_free
+        self.owns_image = False
+        # Cleared by re-evaluation when the existing processed image is still valid
+        self.needs_pixels = True
+        self.output_exists = False
+        # Whether an existing processed image no longer matches the results
+        self.output_stale = True
+
+        self.image = None
+        self.gray = None
+        self.face_data: List[Dict] = []
+        self.face_regions = []
+        self.blur_stats: Dict = {}
+        self.output_image = None
+        self.encoded_image: Optional[bytes] = None
+        # [{'face_id', 'data' or, once saved, 'path'}] when crops were rendered
+        self.face_crops: Optional[List[Dict]] = None
+        self.stage_timings: List[Dict] = []
+
+    def produces_output(self) -> bool:
+        """Whether this run writes correction output; lazy correction defers only the full frame"""
+        if not self.apply_correction:
+            return False
+        if self.output_mode == 'full':
+            return not self.lazy_correction
+        return self.output_mode == 'crops'
+
+    def renders_output(self, output_mode: str = None) -> bool:
+        if output_mode is not None and output_mode != self.output_mode:
+            return False
+        return self.needs_pixels and self.produces_output()
+
+    def wait_for_encode(self):
+        """
+        Join a background encode, re-raising its error. The timings of the
+        encode and save stages are replaced by the time the job took on its
+        thread.
+        """
+        if self.encode_future is None:
+            return
+
+        future, self.encode_future = self.encode_future, None
+        self.encoded_image, timings = future.result()
+        for timing in self.stage_timings:
+            if timing['stage'] in timings:
+                timing.update(timings[timing['stage']], background=True)
+
+
+class PipelineStage:
+    name = None
+
+    def is_enabled(self, context: AnalysisContext) -> bool:
+        return True
+
+    def run(self, context: AnalysisContext):
+        raise NotImplementedError
+
+
+class DecodeStage(PipelineStage):
+    """
+    Decode from the in-memory upload when there is one, otherwise from disk.
+    Runs that render no output never need colour, so they decode straight
+    to grayscale; metrics-only runs also decode at ``metrics_decode_reduction``.
+    """
+    name = 'decode'
+
+    def is_enabled(self, context):
+        return context.needs_pixels
+
+    def run(self, context):
+        image_processor = get_image_processor()
+        grayscale = not context.renders_output()
+        context.decode_reduction = 1 if context.apply_correction else context.metrics_decode_reduction
+
+        if context.image_bytes is not None:
+            context.image = image_processor.decode_image(
+                context.image_bytes,
+                grayscale=grayscale,
+                reduction=context.decode_reduction
+            )
+        else:
+            context.image = image_processor.load_image(
+                context.image_path,
+                grayscale=grayscale,
+                reduction=context.decode_reduction
+            )
+        context.owns_image = True
+
+
+class DetectStage(PipelineStage):
+    name = 'detect'
+
+    def run(self, context):
+        face_detector = get_face_detector()
+        context.gray = face_detector.to_grayscale(context.image)
+        if context.detection_max_side:
+            context.face_data = face_detector.detect_faces_coarse_to_fine(
+                context.gray,
+                max_side=context.detection_max_side,
+                refine=context.refine_detections
+            )
+        elif context.tiled_min_pixels and context.gray.size >= context.tiled_min_pixels:
+            context.face_data = detect_faces_tiled(
+                context.gray,
+                tile_size=context.tile_size,
+                workers=context.tile_workers
+            )
+        else:
+            context.face_data = face_detector.detect_faces_in_gray(context.gray)
+
+
+class ExtractStage(PipelineStage):
+    name = 'extract'
+
+    def run(self, context):
+        context.face_regions = get_face_detector().extract_face_regions(
+            context.image,
+            context.face_data
+        )
+
+
+class BlurScoreStage(PipelineStage):
+    name = 'blur_score'
+
+    def run(self, context):
+        blur_detector = get_blur_detector()
+        context.face_data = blur_detector.analyze_faces_blur(
+            context.face_regions,
+            context.face_data,
+            threshold=context.blur_threshold,
+            gray=context.gray
+        )
+        if context.decode_reduction > 1:
+            self._scale_boxes(context.face_data, context.decode_reduction)
+        context.blur_stats = blur_detector.get_overall_blur_stats(context.face_data)
+
+    def _scale_boxes(self, face_data: List[Dict], factor: int):
+        for face in face_data:
+            face['bounding_box'] = {
+                key: value * factor for key, value in face['bounding_box'].items()
+            }
+
+
+def blurred_face_ids(face_data: List[Dict]) -> set:
+    return {
+        face['face_id'] for face in face_data
+        if face.get('blur_analysis', {}).get('is_blurred', False)
+    }
+
+
+class ReclassifyStage(PipelineStage):
+    """
+    Apply a new threshold to stored scores. Pixels are only needed again when
+    correction output is requested and the set of blurred faces changed, or
+    there is no processed image yet. With lazy correction a stale output is
+    only flagged, to be dropped and rendered again on its next fetch.
+    """
+    name = 'reclassify'
+
+    def run(self, context):
+        blur_detector = get_blur_detector()
+        previous = blurred_face_ids(context.face_data)
+        context.face_data = blur_detector.reclassify_faces(context.face_data, context.blur_threshold)
+        context.blur_stats = blur_detector.get_overall_blur_stats(context.face_data)
+
+        changed = blurred_face_ids(context.face_data) != previous
+        context.output_stale = changed or not context.output_exists
+        context.needs_pixels = context.output_stale and context.produces_output()
+
+
+class CorrectStage(PipelineStage):
+    name = 'correct'
+
+    def is_enabled(self, context):
+        return context.renders_output('full')
+
+    def run(self, context):
+        context.output_image = get_image_processor().process_full_image(
+            context.image,
+            context.face_data,
+            in_place=context.copy_free and context.owns_image
+        )
+
+
+class AnnotateStage(PipelineStage):
+    name = 'annotate'
+
+    def is_enabled(self, context):
+        return context.renders_output('full')
+
+    def run(self, context):
+        # The corrected image is always a buffer this pipeline allocated
+        context.output_image = get_image_processor().add_annotations(
+            context.output_image,
+            context.face_data,
+            in_place=context.copy_free
+        )
+
+
+class EncodeStage(PipelineStage):
+    name = 'encode'
+
+    def is_enabled(self, context):
+        return context.renders_output('full')
+
+    def run(self, context):
+        if context.encode_executor is not None:
+            context.encode_future = context.encode_executor.submit(
+                self._encode_and_save,
+                context.output_image,
+                context.encoding,
+                context.output_path
+            )
+            return
+
+        context.encoded_image = get_image_processor().encode_image(
+            context.output_image,
+            context.encoding.extension,
+            context.encoding.imencode_params()
+        )
+
+    def _encode_and_save(self, image, encoding: EncodingProfile, output_path: str):
+        image_processor = get_image_processor()
+        timings = {}
+
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        data = image_processor.encode_image(image, encoding.extension, encoding.imencode_params())
+        timings['encode'] = {
+            'wall_ms': round((time.perf_counter() - start_wall) * 1000, 3),
+            'cpu_ms': round((time.thread_time() - start_cpu) * 1000, 3),
+        }
+
+        if output_path is not None:
+            start_wall, start_cpu = time.perf_counter(), time.thread_time()
+            image_processor.write_encoded_image(data, output_path)
+            timings['save'] = {
+                'wall_ms': round((time.perf_counter() - start_wall) * 1000, 3),
+                'cpu_ms': round((time.thread_time() - start_cpu) * 1000, 3),
+            }
+
+        return data, timings
+
+
+class SaveStage(PipelineStage):
+    name = 'save'
+
+    def is_enabled(self, context):
+        return context.renders_output('full') and context.output_path is not None
+
+    def run(self, context):
+        # A background encode writes the file itself
+        if context.encode_future is None:
+            get_image_processor().write_encoded_image(context.encoded_image, context.output_path)
+
+
+class CropStage(PipelineStage):
+    """
+    Cut each face out of the decoded image, enhance it when blurred and
+    encode it on its own, so the work scales with face area rather than
+    image size.
+    """
+    name = 'crop'
+
+    def is_enabled(self, context):
+        return context.renders_output('crops')
+
+    def run(self, context):
+        image_processor = get_image_processor()
+        params = context.encoding.imencode_params()
+        context.face_crops = [
+            {
+                'face_id': face_id,
+                'data': image_processor.encode_image(crop, context.encoding.extension, params),
+            }
+            for face_id, crop in image_processor.crop_faces(
+                context.image,
+                context.face_data,
+                in_place=context.copy_free and context.owns_image
+            )
+        ]
+
+
+class SaveCropsStage(PipelineStage):
+    name = 'save_crops'
+
+    def is_enabled(self, context):
+        return context.renders_output('crops') and context.crops_path is not None
+
+    def run(self, context):
+        image_processor = get_image_processor()
+        for crop in context.face_crops:
+            crop['path'] = image_processor.write_encoded_image(
+                crop.pop('data'),
+                context.crops_path.format(face_id=crop['face_id'])
+            )
+
+
+class AnalysisPipeline:
+    """
+    Runs the analysis stages in order and records, for every stage, wall
+    time, CPU time of the calling thread and - when ``tracemalloc`` is
+    tracing - the peak number of bytes allocated while it ran.
+
+    ``cpu_ms`` leaves out work a stage hands to other threads (tiled
+    detection, background encoding). ``tracemalloc`` peaks are
+    process-wide, so ``bytes_allocated`` is only meaningful while a single
+    analysis runs at a time, as under DEBUG.
+    """
+
+    def __init__(self, stages: Iterable[PipelineStage]):
+        self.stages = list(stages)
+
+    def with_stages(self, *stages: PipelineStage) -> 'AnalysisPipeline':
+        return AnalysisPipeline(self.stages + list(stages))
+
+    def replace_stage(self, stage: PipelineStage) -> 'AnalysisPipeline':
+        return AnalysisPipeline([
+            stage if existing.name == stage.name else existing
+            for existing in self.stages
+        ])
+
+    def run(self, context: AnalysisContext) -> AnalysisContext:
+        for stage in self.stages:
+            if stage.is_enabled(context):
+                self._run_stage(stage, context)
+
+        return context
+
+    def _run_stage(self, stage: PipelineStage, context: AnalysisContext):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            start_memory, _ = tracemalloc.get_traced_memory()
+
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        failed = True
+        try:
+            stage.run(context)
+            failed = False
+        finally:
+            timing = {
+                'stage': stage.name,
+                'wall_ms': round((time.perf_counter() - start_wall) * 1000, 3),
+                'cpu_ms': round((time.thread_time() - start_cpu) * 1000, 3),
+                'bytes_allocated': None,
+            }
+            if tracing:
+                _, peak_memory = tracemalloc.get_traced_memory()
+                timing['bytes_allocated'] = max(peak_memory - start_memory, 0)
+            if failed:
+                timing['failed'] = True
+            context.stage_timings.append(timing)
+
+
+def build_default_pipeline() -> AnalysisPipeline:
+    return AnalysisPipeline([
+        DecodeStage(),
+        DetectStage(),
+        ExtractStage(),
+        BlurScoreStage(),
+        CorrectStage(),
+        AnnotateStage(),
+        EncodeStage(),
+        SaveStage(),
+        CropStage(),
+        SaveCropsStage(),
+    ])
+
+
+def build_reevaluation_pipeline() -> AnalysisPipeline:
+    return AnalysisPipeline([
+        ReclassifyStage(),
+        DecodeStage(),
+        CorrectStage(),
+        AnnotateStage(),
+        EncodeStage(),
+        SaveStage(),
+        CropStage(),
+        SaveCropsStage(),
+    ])
+
+
+def build_render_pipeline() -> AnalysisPipeline:
+    """Correction output for face_data that is already on the context"""
+    return AnalysisPipeline([
+        DecodeStage(),
+        CorrectStage(),
+        AnnotateStage(),
+        EncodeStage(),
+        SaveStage(),
+    ])
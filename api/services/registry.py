@@ -0,0 +1,78 @@
+import threading
+from typing import Dict
+
+from .face_detector import FaceDetector
+from .blur_detector import BlurDetector
+from .image_processor import ImageProcessor
+
+
+class ServiceRegistry:
+    """
+    Process-wide home for the analysis services.
+
+    ``cv2.CascadeClassifier`` is not safe to share between threads, so every
+    thread gets its own ``FaceDetector``; the stateless ``BlurDetector`` and
+    ``ImageProcessor`` are shared by the whole process.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._blur_detector = BlurDetector()
+        self._image_processor = ImageProcessor()
+        self._counters = {
+            'face_detector_loads': 0,
+            'face_detector_hits': 0,
+            'blur_detector_hits': 0,
+            'image_processor_hits': 0,
+        }
+
+    def _increment(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def get_face_detector(self) -> FaceDetector:
+        detector = getattr(self._local, 'face_detector', None)
+        if detector is None:
+            detector = FaceDetector()
+            self._local.face_detector = detector
+            self._increment('face_detector_loads')
+        else:
+            self._increment('face_detector_hits')
+        return detector
+
+    def get_blur_detector(self) -> BlurDetector:
+        self._increment('blur_detector_hits')
+        return self._blur_detector
+
+    def get_image_processor(self) -> ImageProcessor:
+        self._increment('image_processor_hits')
+        return self._image_processor
+
+    def preload(self):
+        if getattr(self._local, 'face_detector', None) is None:
+            self._local.face_detector = FaceDetector()
+            self._increment('face_detector_loads')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counters)
+
+
+registry = ServiceRegistry()
+
+
+def get_face_detector() -> FaceDetector:
+    return registry.get_face_detector()
+
+
+def get_blur_detector() -> BlurDetector:
+    return registry.get_blur_detector()
+
+
+def get_image_processor() -> ImageProcessor:
+    return registry.get_image_processor()
+
+
+def preload_services():
+    registry.preload()
@@ -0,0 +1,130 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from .cpu_budget import plan_cpu_budget
+from .registry import get_face_detector
+
+Box = Tuple[int, int, int, int]
+
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_tile_executor(workers: int = None) -> ThreadPoolExecutor:
+    # By default a tiled detection uses this worker's share of the CPU budget
+    workers = workers or plan_cpu_budget().opencv_threads
+    with _executors_lock:
+        if workers not in _executors:
+            _executors[workers] = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix='face-tiles'
+            )
+        return _executors[workers]
+
+
+def plan_tiles(width: int, height: int, tile_size: int, overlap: int) -> List[Box]:
+    """
+    ``(x0, y0, x1, y1)`` tiles covering the image. Neighbouring tiles share
+    ``overlap`` pixels, so every face up to ``overlap`` pixels wide lies
+    entirely inside at least one tile.
+    """
+    step = tile_size - overlap
+    xs = range(0, max(width - overlap, 1), step)
+    ys = range(0, max(height - overlap, 1), step)
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in ys
+        for x in xs
+    ]
+
+
+def _box_iou(a: Box, b: Box) -> Tuple[float, float]:
+    inter_w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    inter_h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0, 0.0
+
+    intersection = inter_w * inter_h
+    area_a, area_b = a[2] * a[3], b[2] * b[3]
+    return intersection / float(area_a + area_b - intersection), intersection / float(area_b)
+
+
+def non_max_suppression(boxes: List[Box], iou_threshold: float = 0.3,
+                        containment_threshold: float = 0.8) -> List[Box]:
+    """
+    Merge duplicates found by overlapping tiles. Larger boxes win; a box is
+    dropped when it overlaps a kept one by more than ``iou_threshold`` or
+    lies mostly inside it (a face cut by a tile edge).
+    """
+    kept = []
+    for box in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+        suppressed = False
+        for kept_box in kept:
+            overlap, containment = _box_iou(kept_box, box)
+            if overlap > iou_threshold or containment > containment_threshold:
+                suppressed = True
+                break
+        if not suppressed:
+            kept.append(box)
+
+    return sorted(kept, key=lambda b: (b[1], b[0]))
+
+
+def _detect_tile(gray: np.ndarray, tile: Box, max_face_size: int) -> List[Box]:
+    # Runs on a pool thread: each thread uses its own warm classifier
+    detector = get_face_detector()
+    x0, y0, x1, y1 = tile
+    boxes = detector.detect_boxes(
+        gray[y0:y1, x0:x1],
+        min_size=detector.min_size,
+        max_size=(max_face_size, max_face_size)
+    )
+
+    return [(x + x0, y + y0, w, h) for x, y, w, h in boxes]
+
+
+def _detect_large_faces(gray: np.ndarray, max_face_size: int) -> List[Box]:
+    """Faces too big for a tile are found on a small copy of the whole image"""
+    detector = get_face_detector()
+    window = detector.cascade_window[0]
+    scale = (window * 1.25) / max_face_size
+    if scale >= 1.0:
+        return []
+
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    boxes = detector.detect_boxes(small, min_size=detector.cascade_window)
+
+    return [
+        (int(round(x / scale)), int(round(y / scale)), int(round(w / scale)), int(round(h / scale)))
+        for x, y, w, h in boxes
+    ]
+
+
+def detect_faces_tiled(gray: np.ndarray, tile_size: int = 1024, max_face_size: int = None,
+                       workers: int = None) -> List[Dict]:
+    """
+    Detect faces on overlapping tiles in parallel (``detectMultiScale``
+    releases the GIL) and merge the per-tile boxes with non-maximum
+    suppression. Tiles overlap by ``max_face_size`` (half a tile by default)
+    and are at least twice that size; larger faces come from one extra pass
+    over a downscaled copy of the whole image.
+    """
+    height, width = gray.shape[:2]
+    max_face_size = max_face_size or tile_size // 2
+    tile_size = max(tile_size, 2 * max_face_size)
+    tiles = plan_tiles(width, height, tile_size, max_face_size)
+
+    executor = get_tile_executor(workers)
+    futures = [executor.submit(_detect_tile, gray, tile, max_face_size) for tile in tiles]
+    futures.append(executor.submit(_detect_large_faces, gray, max_face_size))
+
+    boxes = []
+    for future in futures:
+        boxes.extend(future.result())
+
+    return get_face_detector().build_face_data(non_max_suppression(boxes))
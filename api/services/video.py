@@ -0,0 +1,274 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .registry import get_blur_detector, get_face_detector
+
+Box = Tuple[int, int, int, int]
+
+
+def read_frames(path: str, stride: int = 1,
+                max_frames: int = None) -> Iterator[Tuple[int, Optional[float], np.ndarray]]:
+    """
+    ``(index, timestamp_ms, frame)`` for every ``stride``-th frame of the
+    video at ``path``. Skipped frames are grabbed but never decoded, and only
+    the current frame is held in memory.
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Failed to open video {path}")
+
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        index = 0
+        yielded = 0
+        while max_frames is None or yielded < max_frames:
+            if index % stride:
+                if not capture.grab():
+                    break
+                index += 1
+                continue
+
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield index, round(index * 1000.0 / fps, 3) if fps > 0 else None, frame
+            index += 1
+            yielded += 1
+    finally:
+        capture.release()
+
+
+def get_frame_count(path: str) -> Optional[int]:
+    """Frame count from the container header, None when it does not say"""
+    capture = cv2.VideoCapture(path)
+    try:
+        count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) if capture.isOpened() else 0
+    finally:
+        capture.release()
+
+    return count if count > 0 else None
+
+
+class SceneChangeDetector:
+    """
+    Flags a frame whose grayscale histogram, taken from a small thumbnail,
+    correlates with the previous frame's below ``threshold``.
+    """
+
+    def __init__(self, threshold: float = 0.7, thumbnail_width: int = 64):
+        self.threshold = threshold
+        self.thumbnail_width = thumbnail_width
+        self._previous = None
+
+    def update(self, gray: np.ndarray) -> bool:
+        height, width = gray.shape[:2]
+        scale = self.thumbnail_width / float(width)
+        thumbnail = cv2.resize(
+            gray, (self.thumbnail_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA
+        )
+        histogram = cv2.calcHist([thumbnail], [0], None, [32], [0, 256])
+        cv2.normalize(histogram, histogram)
+
+        previous, self._previous = self._previous, histogram
+        if previous is None:
+            return False
+        return cv2.compareHist(previous, histogram, cv2.HISTCMP_CORREL) < self.threshold
+
+
+class TemplateTracker:
+    """
+    Follows one face between detections: its appearance at the last
+    detection is matched (normalized cross-correlation) inside a window of
+    ``search_margin`` face sizes around its last box. One ``matchTemplate``
+    over that window costs far less than a cascade pass over the frame.
+    """
+
+    def __init__(self, track_id: int, gray: np.ndarray, box: Box,
+                 search_margin: float = 0.5, min_score: float = 0.5):
+        x, y, w, h = box
+        self.track_id = track_id
+        self.box = box
+        self.score = 1.0
+        self.search_margin = search_margin
+        self.min_score = min_score
+        self.template = gray[y:y + h, x:x + w].copy()
+
+    def update(self, gray: np.ndarray) -> bool:
+        """Move to the best match in ``gray``; False once the face is lost"""
+        x, y, w, h = self.box
+        height, width = gray.shape[:2]
+        pad_x, pad_y = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(x - pad_x, 0), max(y - pad_y, 0)
+        x1, y1 = min(x + w + pad_x, width), min(y + h + pad_y, height)
+        if x1 - x0 < w or y1 - y0 < h:
+            return False
+
+        result = cv2.matchTemplate(gray[y0:y1, x0:x1], self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (match_x, match_y) = cv2.minMaxLoc(result)
+        if score < self.min_score:
+            return False
+
+        self.box = (x0 + match_x, y0 + match_y, w, h)
+        self.score = float(score)
+        return True
+
+
+def box_iou(a: Box, b: Box) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    overlap_w = min(ax + aw, bx + bw) - max(ax, bx)
+    overlap_h = min(ay + ah, by + bh) - max(ay, by)
+    if overlap_w <= 0 or overlap_h <= 0:
+        return 0.0
+
+    overlap = overlap_w * overlap_h
+    return overlap / float(aw * ah + bw * bh - overlap)
+
+
+class VideoAnalyzer:
+    """
+    Per-frame face blur scores for a stream of frames. The Haar cascade
+    runs on the first frame, every ``detect_every`` frames, on a scene
+    change and after a tracker lost its face; in between the faces are
+    followed by ``TemplateTracker``. Detections that overlap a track keep
+    its ``face_id``, so ids are stable across a clip.
+    """
+
+    def __init__(self, blur_threshold: float = 100.0, detect_every: int = 10,
+                 scene_threshold: float = 0.7, track_min_score: float = 0.5,
+                 match_iou: float = 0.3, detection_max_side: int = None):
+        self.blur_threshold = blur_threshold
+        self.detect_every = detect_every
+        self.track_min_score = track_min_score
+        self.match_iou = match_iou
+        self.detection_max_side = detection_max_side
+        self.scene_detector = SceneChangeDetector(scene_threshold)
+        self.trackers: List[TemplateTracker] = []
+        self._next_track_id = 1
+        self._since_detection = None
+        self._track_lost = False
+
+    def process(self, index: int, timestamp_ms: Optional[float], frame: np.ndarray) -> Dict:
+        face_detector = get_face_detector()
+        gray = face_detector.to_grayscale(frame)
+        scene_change = self.scene_detector.update(gray)
+
+        detect = (
+            self._since_detection is None
+            or self._since_detection + 1 >= self.detect_every
+            or scene_change
+            or self._track_lost
+        )
+        if detect:
+            self._detect(gray, drop_tracks=scene_change)
+            self._since_detection = 0
+            self._track_lost = False
+        else:
+            tracked = [tracker for tracker in self.trackers if tracker.update(gray)]
+            self._track_lost = len(tracked) < len(self.trackers)
+            self.trackers = tracked
+            self._since_detection += 1
+
+        face_data = [
+            {
+                'face_id': tracker.track_id,
+                'bounding_box': dict(zip(('x', 'y', 'width', 'height'), tracker.box)),
+                'confidence': 1.0 if detect else round(tracker.score, 3),
+            }
+            for tracker in self.trackers
+        ]
+        face_data = get_blur_detector().analyze_faces_blur(
+            [], face_data, threshold=self.blur_threshold, gray=gray
+        )
+
+        return {
+            'frame': index,
+            'timestamp_ms': timestamp_ms,
+            'detected': detect,
+            'scene_change': scene_change,
+            'faces': face_data,
+        }
+
+    def _detect(self, gray: np.ndarray, drop_tracks: bool = False):
+        face_detector = get_face_detector()
+        if self.detection_max_side:
+            face_data = face_detector.detect_faces_coarse_to_fine(gray, max_side=self.detection_max_side)
+        else:
+            face_data = face_detector.detect_faces_in_gray(gray)
+
+        previous = [] if drop_tracks else list(self.trackers)
+        trackers = []
+        for face in face_data:
+            box = tuple(face['bounding_box'][key] for key in ('x', 'y', 'width', 'height'))
+            match = max(previous, key=lambda tracker: box_iou(tracker.box, box), default=None)
+            if match is not None and box_iou(match.box, box) >= self.match_iou:
+                previous.remove(match)
+                track_id = match.track_id
+            else:
+                track_id = self._next_track_id
+                self._next_track_id += 1
+            trackers.append(TemplateTracker(track_id, gray, box, min_score=self.track_min_score))
+
+        self.trackers = sorted(trackers, key=lambda tracker: tracker.track_id)
+
+
+class VideoSummary:
+    """Running per-face totals over the frame results, in constant memory per face"""
+
+    def __init__(self):
+        self.frames = 0
+        self.detections = 0
+        self.scene_changes = 0
+        self._faces: Dict[int, Dict] = {}
+
+    def add(self, result: Dict):
+        self.frames += 1
+        self.detections += int(result['detected'])
+        self.scene_changes += int(result['scene_change'])
+
+        for face in result['faces']:
+            score = face['blur_analysis']['blur_score']
+            summary = self._faces.get(face['face_id'])
+            if summary is None:
+                summary = self._faces[face['face_id']] = {
+                    'face_id': face['face_id'],
+                    'first_frame': result['frame'],
+                    'frames': 0,
+                    'blurred_frames': 0,
+                    'score_sum': 0.0,
+                    'min_blur_score': score,
+                    'max_blur_score': score,
+                    'sharpest_frame': result['frame'],
+                }
+            summary['frames'] += 1
+            summary['blurred_frames'] += int(face['blur_analysis']['is_blurred'])
+            summary['score_sum'] += score
+            summary['last_frame'] = result['frame']
+            summary['min_blur_score'] = min(summary['min_blur_score'], score)
+            if score > summary['max_blur_score']:
+                summary['max_blur_score'] = score
+                summary['sharpest_frame'] = result['frame']
+
+    def as_dict(self) -> Dict:
+        faces = []
+        for summary in self._faces.values():
+            face = {key: value for key, value in summary.items() if key != 'score_sum'}
+            face['average_blur_score'] = round(summary['score_sum'] / summary['frames'], 2)
+            faces.append(face)
+
+        return {
+            'frames': self.frames,
+            'detections': self.detections,
+            'scene_changes': self.scene_changes,
+            'faces': faces,
+        }
+
+
+def analyze_video(path: str, frame_stride: int = 1, max_frames: int = None,
+                  **options) -> Iterator[Dict]:
+    """Frame results as the video is read; ``options`` go to ``VideoAnalyzer``"""
+    analyzer = VideoAnalyzer(**options)
+    for index, timestamp_ms, frame in read_frames(path, frame_stride, max_frames):
+        yield analyzer.process(index, timestamp_ms, frame)
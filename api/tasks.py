@@ -1,61 +1,46 @@
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
-from django.db import models
-import os
+from django.db import DatabaseError, models
+import random
 import logging
 
-from .models import ImageAnalysis
-from .services import FaceDetector, BlurDetector, ImageProcessor
+from .models import AnalysisRollup, ImageAnalysis, VideoAnalysis
+from .analysis import run_analysis, run_analysis_batch
+from .video import run_video_analysis
+from .cleanup import cleanup_expired_analyses, cleanup_expired_videos
+from .rollups import bucket_start
 
 logger = logging.getLogger(__name__)
 
 
+def retry_countdown(retries):
+    """Exponential backoff with full jitter, so failed tasks do not retry in lockstep"""
+    base = getattr(settings, 'ANALYSIS_RETRY_BACKOFF', 5)
+    cap = getattr(settings, 'ANALYSIS_RETRY_BACKOFF_MAX', 300)
+    return random.uniform(0, min(cap, base * 2 ** retries))
+
+
 @shared_task(bind=True, max_retries=3)
-def process_image_async(self, analysis_id, blur_threshold=100.0, apply_correction=True):
+def process_image_async(self, analysis_id, blur_threshold=100.0, apply_correction=True,
+                        encoding_profile=None, output_mode=None):
     
     try:
         analysis = ImageAnalysis.objects.get(id=analysis_id)
-        analysis.status = 'processing'
-        analysis.save()
 
         logger.info(f"Starting processing for analysis {analysis_id}")
 
-        image_path = analysis.original_image.path
-
-        face_detector = FaceDetector()
-        blur_detector = BlurDetector(threshold=blur_threshold)
-        image_processor = ImageProcessor()
-
-        image, face_data = face_detector.detect_faces(image_path)
-        logger.info(f"Detected {len(face_data)} faces")
-
-        face_regions = face_detector.extract_face_regions(image, face_data)
-
-        face_data_with_blur = blur_detector.analyze_faces_blur(face_regions, face_data)
-
-        blur_stats = blur_detector.get_overall_blur_stats(face_data_with_blur)
+        context = run_analysis(
+            analysis,
+            blur_threshold=blur_threshold,
+            apply_correction=apply_correction,
+            encoding_profile=encoding_profile,
+            output_mode=output_mode
+        )
+        blur_stats = context.blur_stats
+        logger.info(f"Detected {blur_stats['total_faces']} faces")
         logger.info(f"Blur stats: {blur_stats}")
 
-        if apply_correction:
-            processed_image = image_processor.process_full_image(image, face_data_with_blur)
-            annotated_image = image_processor.add_annotations(processed_image, face_data_with_blur)
-
-            processed_path = os.path.join(
-                'media',
-                'processed',
-                f'processed_{analysis.id}.jpg'
-            )
-            image_processor.save_image(annotated_image, processed_path)
-
-            analysis.processed_image = processed_path.replace('media/', '')
-
-        analysis.total_faces = blur_stats['total_faces']
-        analysis.blurred_faces = blur_stats['blurred_faces']
-        analysis.face_data = face_data_with_blur
-        analysis.status = 'completed'
-        analysis.processed_at = timezone.now()
-        analysis.save()
-
         logger.info(f"Successfully completed processing for analysis {analysis_id}")
 
         return {
@@ -72,56 +57,129 @@ def process_image_async(self, analysis_id, blur_threshold=100.0, apply_correctio
     except Exception as e:
         logger.error(f"Error processing analysis {analysis_id}: {str(e)}")
 
-        try:
-            analysis = ImageAnalysis.objects.get(id=analysis_id)
-            analysis.status = 'failed'
-            analysis.error_message = str(e)
-            analysis.save()
-        except:
-            pass
+        raise self.retry(exc=e, countdown=retry_countdown(self.request.retries))
 
-        raise self.retry(exc=e, countdown=60)
 
+@shared_task(bind=True, max_retries=3)
+def process_images_batch(self, analysis_ids, blur_threshold=100.0, apply_correction=True,
+                         encoding_profile=None, output_mode=None):
+    """
+    Analyze several queued images in one task with the warm services and a
+    single bulk_update. Images that fail are marked failed; only database
+    errors retry the batch.
+    """
+    try:
+        analyses = list(ImageAnalysis.objects.filter(id__in=analysis_ids))
+        missing = len(analysis_ids) - len(analyses)
+        if missing:
+            logger.warning(f"{missing} analyses of batch {self.request.id} not found")
 
-@shared_task
-def cleanup_old_images(days=30):
+        logger.info(f"Starting batch of {len(analyses)} analyses")
+        run_analysis_batch(
+            analyses,
+            blur_threshold=blur_threshold,
+            apply_correction=apply_correction,
+            encoding_profile=encoding_profile,
+            output_mode=output_mode
+        )
 
-    from datetime import timedelta
+    except DatabaseError as e:
+        logger.error(f"Database error in batch {self.request.id}: {str(e)}")
 
-    cutoff_date = timezone.now() - timedelta(days=days)
-    old_analyses = ImageAnalysis.objects.filter(created_at__lt=cutoff_date)
+        raise self.retry(exc=e, countdown=retry_countdown(self.request.retries))
 
-    deleted_count = 0
-    for analysis in old_analyses:
-        try:
-            if analysis.original_image and os.path.exists(analysis.original_image.path):
-                os.remove(analysis.original_image.path)
+    completed = [analysis for analysis in analyses if analysis.status == 'completed']
+    logger.info(f"Completed {len(completed)} of {len(analyses)} analyses in batch")
 
-            if analysis.processed_image and os.path.exists(analysis.processed_image.path):
-                os.remove(analysis.processed_image.path)
+    return {
+        'analysis_ids': [str(analysis.id) for analysis in analyses],
+        'completed': len(completed),
+        'failed': len(analyses) - len(completed),
+        'total_faces': sum(analysis.total_faces for analysis in completed),
+        'blurred_faces': sum(analysis.blurred_faces for analysis in completed)
+    }
 
-            analysis.delete()
-            deleted_count += 1
 
-        except Exception as e:
-            logger.error(f"Error deleting analysis {analysis.id}: {str(e)}")
+@shared_task
+def process_video_async(video_id, max_frames=None):
+    """
+    Analyze a stored clip frame by frame. Not retried: an error is usually
+    in the file itself, and the row is already marked failed.
+    """
+    video = VideoAnalysis.objects.get(id=video_id)
+    logger.info(f"Starting video analysis {video_id}")
 
-    logger.info(f"Cleaned up {deleted_count} old image analyses")
-    return {'deleted_count': deleted_count}
+    try:
+        for _ in run_video_analysis(video, max_frames=max_frames):
+            pass
+    except Exception as e:
+        logger.error(f"Error processing video {video_id}: {str(e)}")
+        raise
+
+    logger.info(f"Video analysis {video_id} processed {video.frames_processed} frames")
+
+    return {
+        'video_id': str(video_id),
+        'status': video.status,
+        'frames_processed': video.frames_processed,
+        'detections': video.summary['detections'],
+        'faces': len(video.summary['faces'])
+    }
 
 
 @shared_task
-def generate_statistics_report():
+def cleanup_old_images(days=30, dry_run=False):
+    """
+    Delete expired analyses in chunks for at most CLEANUP_TIME_BUDGET seconds;
+    the next run resumes from the checkpoint this one left. Expired video
+    analyses and their clips go too.
+    """
+    report = cleanup_expired_analyses(
+        days=days,
+        time_budget=getattr(settings, 'CLEANUP_TIME_BUDGET', None),
+        dry_run=dry_run
+    )
+    report['deleted_count'] = report['rows_deleted']
+    report['videos'] = cleanup_expired_videos(days=days, dry_run=dry_run)
 
-    from django.db.models import Count, Avg, Q
+    return report
 
-    stats = ImageAnalysis.objects.aggregate(
-        total_analyses=Count('id'),
-        completed=Count('id', filter=Q(status='completed')),
-        failed=Count('id', filter=Q(status='failed')),
-        avg_faces=Avg('total_faces'),
-        avg_blurred=Avg('blurred_faces')
+
+@shared_task
+def generate_statistics_report(days=None):
+    """
+    Overall analysis counts and per-analysis averages, as before the
+    rollups, but read from them instead of scanning every analysis. Only
+    pending and processing rows are counted directly (through the status
+    index). ``days`` limits the report to recent analyses.
+    """
+    from datetime import timedelta
+    from django.db.models import Sum
+
+    rollups = AnalysisRollup.objects.filter(period='day')
+    in_progress = ImageAnalysis.objects.filter(status__in=['pending', 'processing'])
+    if days is not None:
+        since = timezone.now() - timedelta(days=days)
+        rollups = rollups.filter(bucket_start__gte=bucket_start(since, 'day'))
+        in_progress = in_progress.filter(created_at__gte=since)
+
+    totals = rollups.aggregate(
+        completed=Sum('completed'),
+        failed=Sum('failed'),
+        total_faces=Sum('total_faces'),
+        blurred_faces=Sum('blurred_faces')
     )
+    completed, failed = totals['completed'] or 0, totals['failed'] or 0
+    total_analyses = completed + failed + in_progress.count()
+
+    stats = {
+        'total_analyses': total_analyses,
+        'completed': completed,
+        'failed': failed,
+        # Averages over every analysis, unfinished ones counting zero faces
+        'avg_faces': (totals['total_faces'] or 0) / total_analyses if total_analyses else None,
+        'avg_blurred': (totals['blurred_faces'] or 0) / total_analyses if total_analyses else None,
+    }
 
     logger.info(f"System statistics: {stats}")
-    return stats
\ No newline at end of file
+    return stats
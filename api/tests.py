@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
@@ -24,6 +24,17 @@ class ImageAnalysisAPITestCase(APITestCase):
             content_type='image/jpeg'
         )
 
+    def create_face_image(self, filename='faces.jpg', face_count=3):
+        import cv2
+        from .benchmarks import generate_synthetic_image
+
+        image, _ = generate_synthetic_image(1200, 800, face_count, seed=2)
+        return SimpleUploadedFile(
+            filename,
+            cv2.imencode('.jpg', image)[1].tobytes(),
+            content_type='image/jpeg'
+        )
+
     def test_upload_image(self):
         image = self.create_test_image()
 
@@ -78,6 +89,375 @@ class ImageAnalysisAPITestCase(APITestCase):
             status.HTTP_202_ACCEPTED
         ])
 
+    def test_analyze_image_records_stage_timings(self):
+        response = self.client.post(
+            '/api/images/analyze/',
+            {'image': self.create_test_image(), 'apply_correction': True},
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stages = [timing['stage'] for timing in response.data['data']['stage_timings']]
+        self.assertEqual(stages, [
+            'decode', 'detect', 'extract', 'blur_score',
+            'correct', 'annotate', 'encode', 'save', 'db_save'
+        ])
+        analysis = ImageAnalysis.objects.get(id=response.data['data']['id'])
+        self.assertEqual(len(analysis.stage_timings), 9)
+
+    def test_analyze_batch_streams_ndjson(self):
+        import json
+
+        existing = ImageAnalysis.objects.create(
+            original_image=self.create_test_image('existing.jpg'),
+            status='pending'
+        )
+
+        response = self.client.post(
+            '/api/images/analyze-batch/',
+            {
+                'images': [self.create_test_image('a.jpg'), self.create_test_image('b.jpg')],
+                'image_ids': [str(existing.id)],
+                'apply_correction': False
+            },
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        results = [json.loads(line) for line in lines]
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result['status'] == 'completed' for result in results))
+        self.assertEqual(ImageAnalysis.objects.filter(status='completed').count(), 3)
+
+    def test_abandoned_batch_leaves_no_row_processing(self):
+        from .analysis import create_analyses_from_uploads, run_batch_analysis
+
+        analyses = create_analyses_from_uploads(
+            [self.create_test_image(f'{name}.jpg') for name in 'abcd']
+        )
+        results = run_batch_analysis(analyses, apply_correction=False)
+        first = next(results)
+        results.close()
+
+        self.assertFalse(ImageAnalysis.objects.filter(status='processing').exists())
+        self.assertEqual(ImageAnalysis.objects.get(id=first.id).status, 'completed')
+        failed = ImageAnalysis.objects.filter(status='failed')
+        self.assertEqual(failed.count(), 3)
+        self.assertTrue(all(analysis.error_message for analysis in failed))
+
+    def test_analyze_upload_from_memory_persists_original(self):
+        response = self.client.post(
+            '/api/images/analyze/',
+            {'image': self.create_test_image('memory.jpg'), 'apply_correction': False},
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        analysis = ImageAnalysis.objects.get(id=response.data['data']['id'])
+        self.assertEqual(analysis.status, 'completed')
+        self.assertTrue(os.path.exists(analysis.original_image.path))
+
+    def test_repeated_upload_hits_result_cache(self):
+        payload = {'apply_correction': False, 'blur_threshold': 80.0}
+        first = self.client.post(
+            '/api/images/analyze/',
+            dict(payload, image=self.create_test_image('first.jpg')),
+            format='multipart'
+        )
+        second = self.client.post(
+            '/api/images/analyze/',
+            dict(payload, image=self.create_test_image('second.jpg')),
+            format='multipart'
+        )
+        other_threshold = self.client.post(
+            '/api/images/analyze/',
+            dict(payload, image=self.create_test_image('third.jpg'), blur_threshold=50.0),
+            format='multipart'
+        )
+
+        self.assertNotIn('cached', first.data)
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(second.data['data']['id'], first.data['data']['id'])
+        self.assertNotIn('cached', other_threshold.data)
+        self.assertEqual(ImageAnalysis.objects.count(), 2)
+
+    def test_metrics_endpoint_reports_stages_and_cache(self):
+        payload = {'apply_correction': True, 'blur_threshold': 100.0}
+        for _ in range(2):
+            self.client.post(
+                '/api/images/analyze/',
+                dict(payload, image=self.create_face_image()),
+                format='multipart'
+            )
+
+        response = self.client.get('/metrics')
+        body = response.content.decode()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for stage in ('decode', 'detect', 'blur_score', 'correct', 'annotate', 'encode', 'db_save'):
+            self.assertIn(f'face_blur_stage_duration_seconds_count{{stage="{stage}"}}', body)
+        self.assertIn('face_blur_images_analyzed_total{status="completed"}', body)
+        self.assertIn('face_blur_cache_lookups_total{result="hit"}', body)
+
+    def test_encoding_profile_selects_output_format(self):
+        response = self.client.post(
+            '/api/images/analyze/',
+            {'image': self.create_face_image(), 'encoding_profile': 'webp'},
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        analysis = ImageAnalysis.objects.get(id=response.data['data']['id'])
+        self.assertEqual(analysis.encoding_profile, 'webp')
+        self.assertTrue(analysis.processed_image.name.endswith('.webp'))
+        with open(analysis.processed_image.path, 'rb') as f:
+            self.assertEqual(f.read(12)[8:], b'WEBP')
+        encode = next(t for t in analysis.stage_timings if t['stage'] == 'encode')
+        self.assertTrue(encode['background'])
+
+        # Same blurred faces, but a different profile: the output is rewritten
+        webp_path = analysis.processed_image.path
+        self.client.post(
+            f'/api/images/{analysis.id}/reevaluate/',
+            {'blur_threshold': 100.0, 'encoding_profile': 'png'},
+            format='json'
+        )
+        analysis.refresh_from_db()
+        self.assertTrue(analysis.processed_image.name.endswith('.png'))
+        self.assertTrue(os.path.exists(analysis.processed_image.path))
+        self.assertFalse(os.path.exists(webp_path))
+
+        invalid = self.client.post(
+            '/api/images/analyze/',
+            {'image': self.create_face_image(), 'encoding_profile': 'gif'},
+            format='multipart'
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_variant_is_cached_and_revalidated(self):
+        import tempfile
+        import cv2
+        import numpy as np
+        from django.test import override_settings
+        from .variants import VariantCache, render_variant
+
+        response = self.client.post(
+            '/api/images/analyze/',
+            {'image': self.create_face_image()},
+            format='multipart'
+        )
+        analysis_id = response.data['data']['id']
+
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(VARIANT_CACHE_DIR=cache_dir):
+            url = f'/api/images/{analysis_id}/variant/'
+            variant = self.client.get(url, {'size': 256, 'format': 'webp'})
+            self.assertEqual(variant.status_code, status.HTTP_200_OK)
+            self.assertEqual(variant['Content-Type'], 'image/webp')
+            image = cv2.imdecode(
+                np.frombuffer(b''.join(variant.streaming_content), np.uint8), cv2.IMREAD_COLOR
+            )
+            self.assertEqual(max(image.shape[:2]), 256)
+
+            revalidated = self.client.get(
+                url, {'size': 256, 'format': 'webp'}, HTTP_IF_NONE_MATCH=variant['ETag']
+            )
+            self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            original = self.client.get(url, {'size': 128, 'source': 'original'})
+            self.assertEqual(original['Content-Type'], 'image/jpeg')
+            self.assertNotEqual(original['ETag'], variant['ETag'])
+            self.assertEqual(self.client.get(url, {'size': 300}).status_code, status.HTTP_400_BAD_REQUEST)
+
+            # Past the cap the least recently used variants go first
+            from .analysis import get_encoding_profile
+
+            jpeg = get_encoding_profile('jpeg')
+            cache = VariantCache(root=os.path.join(cache_dir, 'lru'), max_bytes=10 ** 9)
+            source = ImageAnalysis.objects.get(id=analysis_id).original_image.path
+            paths = {size: cache.get_or_create(source, size, jpeg)[0] for size in (64, 128, 256)}
+            for age, size in enumerate((64, 128, 256)):
+                os.utime(paths[size], (1000 + age, 1000 + age))
+            cache.get_or_create(source, 64, jpeg)
+
+            # Room for the recently used 64px variant and the new 512px one only
+            kept = os.path.getsize(paths[64]) + len(render_variant(source, 512, jpeg))
+            cache._max_bytes = int(kept / 0.9) + 1
+            # Another request's variant being written: never evicted or counted
+            in_flight = f'{paths[128]}.in-flight.tmp'
+            with open(in_flight, 'wb') as temporary:
+                temporary.write(b'0' * 1024)
+            os.utime(in_flight, (1, 1))
+            cache.get_or_create(source, 512, jpeg)
+            self.assertTrue(os.path.exists(paths[64]))
+            self.assertFalse(os.path.exists(paths[128]))
+            self.assertTrue(os.path.exists(in_flight))
+            self.assertLessEqual(cache.stats()['bytes'], cache.max_bytes)
+
+    def test_lazy_correction_renders_on_first_fetch(self):
+        import threading
+        import time
+        from django.test import override_settings
+        from .singleflight import SingleFlight
+
+        with override_settings(LAZY_CORRECTION=True):
+            response = self.client.post(
+                '/api/images/analyze/',
+                {'image': self.create_face_image(), 'encoding_profile': 'webp'},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['data']
+        self.assertGreater(data['total_faces'], 0)
+        self.assertNotIn('encode', [timing['stage'] for timing in data['stage_timings']])
+        self.assertTrue(data['processed_image_url'].endswith(f"/api/images/{data['id']}/processed/"))
+
+        analysis = ImageAnalysis.objects.get(id=data['id'])
+        self.assertTrue(analysis.output_pending)
+
+        rendered = self.client.get(f"/api/images/{data['id']}/processed/")
+        self.assertEqual(rendered.status_code, status.HTTP_200_OK)
+        self.assertEqual(rendered['Content-Type'], 'image/webp')
+        b''.join(rendered.streaming_content)
+        analysis.refresh_from_db()
+        self.assertFalse(analysis.output_pending)
+        self.assertTrue(analysis.processed_image.name.endswith('.webp'))
+        self.assertTrue(any(timing.get('deferred') for timing in analysis.stage_timings))
+
+        # A threshold that flips faces to blurred drops the now stale image
+        with override_settings(LAZY_CORRECTION=True):
+            self.client.post(
+                f"/api/images/{data['id']}/reevaluate/",
+                {'blur_threshold': 1e9, 'encoding_profile': 'webp'},
+                format='json'
+            )
+        analysis.refresh_from_db()
+        self.assertTrue(analysis.output_pending)
+
+        # Callers arriving during a render share it
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def render():
+            started.set()
+            release.wait(5)
+            return 'rendered'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', render)))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do('key', render)))
+            for _ in range(3)
+        ]
+        for thread in followers:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while flight.shared < 3 and time.monotonic() < deadline:
+            threading.Event().wait(0.01)
+        release.set()
+        self.assertEqual(flight.shared, 3)
+        for thread in [leader] + followers:
+            thread.join(5)
+        self.assertEqual(results, ['rendered'] * 4)
+        self.assertEqual(flight.executions, 1)
+
+    def test_crops_and_overlay_output_modes(self):
+        import cv2
+        from django.core.files.storage import default_storage
+
+        response = self.client.post(
+            '/api/images/analyze/',
+            {'image': self.create_face_image(), 'output_mode': 'crops', 'blur_threshold': 1e9},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['data']
+        stages = [timing['stage'] for timing in data['stage_timings']]
+        self.assertIn('crop', stages)
+        self.assertNotIn('correct', stages)
+        self.assertIsNone(data['processed_image_url'])
+        self.assertEqual(len(data['face_crops']), data['total_faces'])
+
+        analysis = ImageAnalysis.objects.get(id=data['id'])
+        boxes = {face['face_id']: face['bounding_box'] for face in analysis.face_data}
+        crop_paths = []
+        for crop in analysis.face_crops:
+            path = default_storage.path(crop['image'])
+            crop_paths.append(path)
+            height, width = cv2.imread(path).shape[:2]
+            box = boxes[crop['face_id']]
+            self.assertEqual((width, height), (box['width'], box['height']))
+
+        overlay = self.client.get(f"/api/images/{data['id']}/overlay/").json()
+        self.assertEqual((overlay['width'], overlay['height']), (1200, 800))
+        self.assertEqual(len(overlay['faces']), data['total_faces'])
+        self.assertTrue(all(face['is_blurred'] for face in overlay['faces']))
+
+        svg = self.client.get(f"/api/images/{data['id']}/overlay/", {'format': 'svg'})
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertEqual(svg.content.count(b'<rect'), data['total_faces'])
+
+        # Switching to overlay-only drops the crops without decoding again
+        reevaluated = self.client.post(
+            f"/api/images/{data['id']}/reevaluate/",
+            {'blur_threshold': 1e9, 'output_mode': 'overlay'},
+            format='json'
+        )
+        self.assertEqual(reevaluated.data['data']['face_crops'], [])
+        self.assertNotIn('decode', [timing['stage'] for timing in reevaluated.data['data']['stage_timings']])
+        self.assertFalse(any(os.path.exists(path) for path in crop_paths))
+
+    def test_reevaluate_uses_stored_scores(self):
+        analyze_response = self.client.post(
+            '/api/images/analyze/',
+            {'image': self.create_face_image(), 'apply_correction': True, 'blur_threshold': 100.0},
+            format='multipart'
+        )
+        analysis_id = analyze_response.data['data']['id']
+        self.assertEqual(analyze_response.data['data']['blurred_faces'], 0)
+
+        unchanged = self.client.post(
+            f'/api/images/{analysis_id}/reevaluate/',
+            {'blur_threshold': 200.0, 'apply_correction': True},
+            format='json'
+        )
+        changed = self.client.post(
+            '/api/images/analyze/',
+            {'image_id': analysis_id, 'blur_threshold': 5000.0, 'apply_correction': True},
+            format='json'
+        )
+
+        self.assertEqual(unchanged.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [timing['stage'] for timing in unchanged.data['data']['stage_timings']],
+            ['reclassify', 'db_save']
+        )
+        self.assertEqual(changed.data['data']['blurred_faces'], 3)
+        self.assertEqual(
+            [timing['stage'] for timing in changed.data['data']['stage_timings']],
+            ['reclassify', 'decode', 'correct', 'annotate', 'encode', 'save', 'db_save']
+        )
+        processed_path = ImageAnalysis.objects.get(id=analysis_id).processed_image.path
+
+        # Without correction, the stored image is only kept while it still matches
+        kept = self.client.post(
+            f'/api/images/{analysis_id}/reevaluate/',
+            {'blur_threshold': 6000.0, 'apply_correction': False},
+            format='json'
+        )
+        self.assertIsNotNone(kept.data['data']['processed_image_url'])
+        cleared = self.client.post(
+            f'/api/images/{analysis_id}/reevaluate/',
+            {'blur_threshold': 100.0, 'apply_correction': False},
+            format='json'
+        )
+        self.assertEqual(cleared.data['data']['blurred_faces'], 0)
+        self.assertIsNone(cleared.data['data']['processed_image_url'])
+        self.assertFalse(os.path.exists(processed_path))
+
     def test_get_analysis_results(self):
         analysis = ImageAnalysis.objects.create(
             original_image=self.create_test_image(),
@@ -105,6 +485,43 @@ class ImageAnalysisAPITestCase(APITestCase):
         self.assertIn('data', response.data)
         self.assertEqual(len(response.data['data']), 3)
 
+    def test_list_cursor_pagination_fields_and_filters(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        now = timezone.now()
+        for i in range(5):
+            analysis = ImageAnalysis.objects.create(
+                original_image=f'uploads/page_{i}.jpg',
+                status='completed' if i % 2 == 0 else 'failed',
+                face_data=[{'face_id': 0, 'bounding_box': {}, 'confidence': 1.0}]
+            )
+            ImageAnalysis.objects.filter(pk=analysis.pk).update(created_at=now - timedelta(hours=i))
+
+        first = self.client.get('/api/images/', {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+        pages = [first, second, third]
+
+        ids = [row['id'] for page in pages for row in page.data['data']]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+        self.assertIsNone(third.data['next'])
+        self.assertNotIn('face_data', first.data['data'][0])
+
+        projected = self.client.get('/api/images/', {'fields': 'id,status,face_data'})
+        self.assertEqual(set(projected.data['data'][0]), {'id', 'status', 'face_data'})
+        self.assertEqual(len(projected.data['data'][0]['face_data']), 1)
+
+        filtered = self.client.get('/api/images/', {
+            'status': 'completed',
+            'created_after': (now - timedelta(hours=3, minutes=30)).isoformat()
+        })
+        self.assertEqual(len(filtered.data['data']), 2)
+
+        invalid = self.client.get('/api/images/', {'fields': 'id,password'})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_delete_analysis(self):
         analysis = ImageAnalysis.objects.create(
             original_image=self.create_test_image(),
@@ -116,6 +533,107 @@ class ImageAnalysisAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(ImageAnalysis.objects.filter(id=analysis.id).exists())
 
+    def test_rollups_follow_completion_reevaluation_and_deletion(self):
+        from .models import AnalysisRollup
+
+        analyze = self.client.post(
+            '/api/images/analyze/',
+            {'image': self.create_face_image(), 'apply_correction': False},
+            format='multipart'
+        )
+        analysis_id = analyze.data['data']['id']
+        analysis = ImageAnalysis.objects.get(id=analysis_id)
+        self.assertEqual(analysis.statistics['total_faces'], 3)
+        self.assertEqual(sum(analysis.statistics['blur_histogram']), 3)
+
+        for period in ('hour', 'day'):
+            rollup = AnalysisRollup.objects.get(period=period)
+            self.assertEqual((rollup.completed, rollup.total_faces), (1, 3))
+
+        self.client.post(
+            '/api/images/analyze/',
+            {'image_id': analysis_id, 'blur_threshold': 5000.0, 'apply_correction': False},
+            format='json'
+        )
+        stats = self.client.get('/api/images/stats/', {'period': 'hour'})
+        self.assertEqual(stats.status_code, status.HTTP_200_OK)
+        totals = stats.data['data']['totals']
+        self.assertEqual((totals['completed'], totals['total_faces'], totals['blurred_faces']), (1, 3, 3))
+        self.assertEqual(sum(totals['blur_histogram']), 3)
+
+        self.client.delete(f'/api/images/{analysis_id}/')
+        totals = self.client.get('/api/images/stats/').data['data']['totals']
+        self.assertEqual((totals['completed'], totals['total_faces']), (0, 0))
+        self.assertEqual(sum(totals['blur_histogram']), 0)
+
+        too_wide = self.client.get('/api/images/stats/', {
+            'period': 'hour', 'since': '2020-01-01T00:00:00Z'
+        })
+        self.assertEqual(too_wide.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_backfill_folds_existing_analyses_into_rollups(self):
+        from .rollups import backfill_rollups
+        from .tasks import generate_statistics_report
+
+        face_data = [
+            {'face_id': i, 'blur_analysis': {'blur_score': score, 'is_blurred': score < 100}}
+            for i, score in enumerate([30.0, 150.0, 900.0], start=1)
+        ]
+        ImageAnalysis.objects.create(
+            original_image='uploads/old.jpg', status='completed',
+            total_faces=3, blurred_faces=1, face_data=face_data
+        )
+        ImageAnalysis.objects.create(original_image='uploads/broken.jpg', status='failed')
+        ImageAnalysis.objects.create(original_image='uploads/queued.jpg', status='processing')
+
+        self.assertEqual(backfill_rollups(batch_size=1), {'batches': 2, 'rows': 2})
+        self.assertEqual(backfill_rollups()['rows'], 0)
+
+        totals = self.client.get('/api/images/stats/').data['data']['totals']
+        self.assertEqual((totals['completed'], totals['failed'], totals['total_faces']), (1, 1, 3))
+        self.assertEqual(sum(totals['blur_histogram']), 3)
+
+        report = generate_statistics_report()
+        self.assertEqual((report['total_analyses'], report['completed'], report['failed']), (3, 1, 1))
+        self.assertEqual((report['avg_faces'], report['avg_blurred']), (1.0, 1 / 3))
+
+    def test_best_shot_picks_sharpest_frame_and_stops_at_target(self):
+        import cv2
+        import numpy as np
+        from .benchmarks import generate_synthetic_image
+
+        image, _ = generate_synthetic_image(1200, 800, 3, seed=2)
+
+        def burst():
+            frames = []
+            for index, sigma in enumerate([6, 3, 0, 4]):
+                frame = np.roll(image, index * 4, axis=1)
+                if sigma:
+                    frame = cv2.GaussianBlur(frame, (0, 0), sigma)
+                frames.append(SimpleUploadedFile(
+                    f'burst_{index}.jpg', cv2.imencode('.jpg', frame)[1].tobytes(),
+                    content_type='image/jpeg'
+                ))
+            return frames
+
+        response = self.client.post('/api/images/best-shot/', {'images': burst()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['data']
+        self.assertEqual((data['frames_analyzed'], data['frames_received']), (4, 4))
+        self.assertEqual((data['best_frame'], data['best_filename']), (2, 'burst_2.jpg'))
+        self.assertEqual(len(data['faces']), 3)
+        self.assertTrue(all(face['best_frame'] == 2 for face in data['faces']))
+        self.assertTrue(all(len(frame['faces']) == 3 for frame in data['frames']))
+
+        response = self.client.post(
+            '/api/images/best-shot/',
+            {'images': burst(), 'target_score': data['best_frame_score'] / 2},
+            format='multipart'
+        )
+        data = response.data['data']
+        self.assertTrue(data['stopped_early'])
+        self.assertEqual((data['frames_analyzed'], data['best_frame']), (3, 2))
+
 
 class FaceDetectionTestCase(TestCase):
 
@@ -125,8 +643,667 @@ class FaceDetectionTestCase(TestCase):
         detector = FaceDetector()
         self.assertIsNotNone(detector.face_cascade)
 
+    def test_coarse_to_fine_detection_matches_full_resolution(self):
+        import cv2
+        from .benchmarks import face_boxes, generate_synthetic_image, matched_count
+        from .services import FaceDetector
+
+        image, _ = generate_synthetic_image(1600, 1200, 4, seed=1)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        detector = FaceDetector()
+
+        full = face_boxes(detector.detect_faces_in_gray(gray))
+        coarse = face_boxes(detector.detect_faces_coarse_to_fine(gray, max_side=640))
+
+        self.assertEqual(len(full), 4)
+        self.assertEqual(matched_count(full, coarse), 4)
+
+    def test_tiled_detection_matches_whole_image(self):
+        import cv2
+        from .benchmarks import face_boxes, generate_synthetic_image, matched_count
+        from .services import FaceDetector, detect_faces_tiled
+
+        detector = FaceDetector()
+        # Small faces fall on tile seams; large ones come from the downscaled pass
+        for face_count, face_size in ((12, 90), (4, None)):
+            image, _ = generate_synthetic_image(1600, 1200, face_count, face_size=face_size, seed=3)
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+            full = face_boxes(detector.detect_faces_in_gray(gray))
+            tiled = face_boxes(detect_faces_tiled(gray, tile_size=512, workers=2))
+
+            self.assertEqual(len(full), face_count)
+            self.assertEqual(len(tiled), face_count)
+            self.assertEqual(matched_count(full, tiled), face_count)
+
     def test_blur_detector_initialization(self):
         from .services import BlurDetector
 
         detector = BlurDetector(threshold=100.0)
-        self.assertEqual(detector.threshold, 100.0)
\ No newline at end of file
+        self.assertEqual(detector.threshold, 100.0)
+
+class BatchedBlurScoringTestCase(TestCase):
+
+    def test_batched_scores_match_per_crop_scores(self):
+        import numpy as np
+        from .services import BlurDetector
+
+        rng = np.random.default_rng(0)
+        gray = rng.integers(0, 256, (480, 640), dtype=np.uint8)
+        boxes = [(0, 0, 60, 60), (100, 50, 45, 80), (590, 430, 60, 60), (300, 200, 3, 3)]
+        detector = BlurDetector()
+
+        batched = detector.calculate_blur_scores(gray, boxes)
+        per_crop = [detector.calculate_blur_score(gray[y:y + h, x:x + w]) for x, y, w, h in boxes]
+
+        for batched_score, crop_score in zip(batched, per_crop):
+            self.assertAlmostEqual(batched_score, crop_score, places=4)
+
+    def test_integral_scoring_only_for_overlapping_boxes(self):
+        from unittest import mock
+        import numpy as np
+        from .services import BlurDetector
+
+        gray = np.zeros((3000, 4000), dtype=np.uint8)
+        spread = [(x, y, 160, 160) for x in range(0, 4000, 800) for y in range(0, 3000, 600)]
+        packed = [(x, y, 160, 160) for x in range(0, 100, 20) for y in range(0, 100, 20)]
+        detector = BlurDetector()
+
+        self.assertFalse(detector.uses_integral(spread))
+        self.assertFalse(detector.uses_integral(packed[:1]))
+        self.assertTrue(detector.uses_integral(packed))
+        with mock.patch.object(detector, 'calculate_blur_scores', wraps=detector.calculate_blur_scores) as integral:
+            self.assertEqual(len(detector.score_boxes(gray, spread)), len(spread))
+            integral.assert_not_called()
+            self.assertEqual(len(detector.score_boxes(gray, packed)), len(packed))
+            integral.assert_called_once()
+
+
+class AnalysisPipelineTestCase(TestCase):
+
+    def encode_synthetic_image(self, face_count=3):
+        import cv2
+        from .benchmarks import generate_synthetic_image
+
+        image, _ = generate_synthetic_image(1200, 800, face_count, seed=2)
+        return cv2.imencode('.jpg', image)[1].tobytes()
+
+    def test_metrics_only_decodes_grayscale_from_memory(self):
+        from .services import AnalysisContext, build_default_pipeline
+
+        context = AnalysisContext(image_bytes=self.encode_synthetic_image(), apply_correction=False)
+        build_default_pipeline().run(context)
+
+        self.assertEqual(context.image.ndim, 2)
+        self.assertEqual(context.blur_stats['total_faces'], 3)
+        self.assertNotIn('encode', [timing['stage'] for timing in context.stage_timings])
+
+    def test_copy_free_correction_reuses_decoded_buffer(self):
+        from .services import AnalysisContext, build_default_pipeline
+
+        context = AnalysisContext(image_bytes=self.encode_synthetic_image(), blur_threshold=5000.0)
+        build_default_pipeline().run(context)
+
+        self.assertEqual(context.blur_stats['blurred_faces'], 3)
+        self.assertIs(context.output_image, context.image)
+        self.assertIsNotNone(context.encoded_image)
+
+    def test_reduced_decode_maps_boxes_to_full_resolution(self):
+        from .benchmarks import face_boxes, matched_count
+        from .services import AnalysisContext, build_default_pipeline
+
+        data = self.encode_synthetic_image()
+        full = build_default_pipeline().run(
+            AnalysisContext(image_bytes=data, apply_correction=False)
+        )
+        reduced = build_default_pipeline().run(
+            AnalysisContext(image_bytes=data, apply_correction=False, metrics_decode_reduction=2)
+        )
+
+        self.assertEqual(reduced.image.shape[0], full.image.shape[0] // 2)
+        self.assertEqual(
+            matched_count(face_boxes(full.face_data), face_boxes(reduced.face_data)),
+            3
+        )
+
+
+class CorrectionEngineTestCase(TestCase):
+
+    def legacy_enhance(self, face):
+        import cv2
+
+        filtered = cv2.bilateralFilter(face, 9, 75, 75)
+        blurred = cv2.GaussianBlur(filtered, (0, 0), 3)
+        sharpened = cv2.addWeighted(filtered, 3.0, blurred, -2.0, 0)
+        l, a, b = cv2.split(cv2.cvtColor(sharpened, cv2.COLOR_BGR2LAB))
+        l = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8)).apply(l)
+        return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+
+    def test_enhance_matches_split_merge_path_and_reuses_workspace(self):
+        import numpy as np
+        from .services.correction import CorrectionEngine
+
+        image = np.random.default_rng(3).integers(0, 256, (300, 400, 3), dtype=np.uint8)
+        engine = CorrectionEngine()
+
+        large = image[10:130, 20:120]
+        self.assertTrue(np.array_equal(engine.enhance(large), self.legacy_enhance(large)))
+        workspace_bytes = engine.workspace_bytes()
+
+        small = image[150:210, 200:270]
+        expected = self.legacy_enhance(small)
+        engine.enhance(small, out=small)
+        self.assertTrue(np.array_equal(small, expected))
+        self.assertEqual(engine.workspace_bytes(), workspace_bytes)
+
+
+class ServiceRegistryTestCase(TestCase):
+
+    def test_face_detector_reused_within_thread(self):
+        from .services import ServiceRegistry
+
+        registry = ServiceRegistry()
+        registry.preload()
+        first = registry.get_face_detector()
+        second = registry.get_face_detector()
+
+        self.assertIs(first, second)
+        self.assertEqual(registry.stats()['face_detector_loads'], 1)
+        self.assertEqual(registry.stats()['face_detector_hits'], 2)
+
+    def test_face_detector_per_thread(self):
+        import threading
+        from .services import ServiceRegistry
+
+        registry = ServiceRegistry()
+        main_detector = registry.get_face_detector()
+        detectors = []
+        thread = threading.Thread(target=lambda: detectors.append(registry.get_face_detector()))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(main_detector, detectors[0])
+        self.assertEqual(registry.stats()['face_detector_loads'], 2)
+
+
+class MetricsAggregationTestCase(TestCase):
+    def test_samples_from_worker_processes_are_combined(self):
+        import subprocess
+        import sys
+        import tempfile
+        from prometheus_client import CollectorRegistry, multiprocess
+
+        script = (
+            "from api.metrics import observe_analysis; "
+            "observe_analysis([{'stage': 'detect', 'wall_ms': 5.0}], "
+            "{'total_faces': 2, 'blurred_faces': 1})"
+        )
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=metrics_dir)
+            for _ in range(2):
+                subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                               cwd=os.path.dirname(os.path.dirname(__file__)))
+
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=metrics_dir)
+
+            self.assertEqual(registry.get_sample_value('face_blur_faces_processed_total'), 4.0)
+            self.assertEqual(registry.get_sample_value(
+                'face_blur_stage_duration_seconds_count', {'stage': 'detect'}
+            ), 2.0)
+
+
+class AsyncViewsTestCase(TestCase):
+    def create_face_image(self, filename='faces.jpg'):
+        import cv2
+        from .benchmarks import generate_synthetic_image
+
+        image, _ = generate_synthetic_image(1200, 800, 3, seed=2)
+        return SimpleUploadedFile(filename, cv2.imencode('.jpg', image)[1].tobytes(),
+                                  content_type='image/jpeg')
+
+    async def test_async_analyze_reevaluate_and_delete(self):
+        response = await self.async_client.post(
+            '/api/async/images/analyze/',
+            {'image': self.create_face_image(), 'apply_correction': 'true'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()['data']
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual(data['total_faces'], 3)
+        self.assertEqual(data['stage_timings'][-1]['stage'], 'db_save')
+
+        reevaluated = await self.async_client.post(
+            f"/api/async/images/{data['id']}/reevaluate/",
+            {'blur_threshold': 10000.0, 'apply_correction': False},
+            content_type='application/json'
+        )
+        self.assertEqual(reevaluated.status_code, status.HTTP_200_OK)
+        self.assertEqual(reevaluated.json()['data']['blurred_faces'], 3)
+
+        listed = await self.async_client.get('/api/async/images/?fields=id,status')
+        self.assertEqual(listed.json()['data'], [{'id': data['id'], 'status': 'completed'}])
+
+        deleted = await self.async_client.delete(f"/api/async/images/{data['id']}/")
+        self.assertEqual(deleted.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await ImageAnalysis.objects.filter(id=data['id']).aexists())
+
+        stats = await self.async_client.get('/api/async/images/compute-stats/')
+        self.assertGreaterEqual(stats.json()['data']['completed'], 2)
+
+    async def test_malformed_json_is_a_bad_request(self):
+        response = await self.async_client.post(
+            '/api/async/images/analyze/', '{"image_id": ', content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.json()['detail'].startswith('JSON parse error'))
+
+    def test_compute_executor_rejects_past_queue_limit(self):
+        import threading
+        from .compute import ComputeExecutor, ComputeQueueFull
+
+        executor = ComputeExecutor(max_workers=1, max_queue=1)
+        started, release = threading.Event(), threading.Event()
+        running = executor.submit(lambda: (started.set(), release.wait()))
+        started.wait()
+        queued = executor.submit(lambda: None)
+        with self.assertRaises(ComputeQueueFull):
+            executor.submit(lambda: None)
+
+        release.set()
+        running.result()
+        queued.result()
+        stats = executor.stats()
+        self.assertEqual(stats['completed'], 2)
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    async def test_rejected_compute_job_leaves_completed_analysis_untouched(self):
+        import threading
+        from . import compute
+        from .models import AnalysisRollup
+
+        response = await self.async_client.post(
+            '/api/async/images/analyze/',
+            {'image': self.create_face_image(), 'apply_correction': 'false'}
+        )
+        analysis_id = response.json()['data']['id']
+
+        full = compute.ComputeExecutor(max_workers=1, max_queue=1)
+        started, release = threading.Event(), threading.Event()
+        running = full.submit(lambda: (started.set(), release.wait()))
+        started.wait()
+        queued = full.submit(lambda: None)
+        original, compute._compute_executor = compute._compute_executor, full
+        try:
+            reevaluated = await self.async_client.post(
+                f'/api/async/images/{analysis_id}/reevaluate/',
+                {'blur_threshold': 10000.0, 'apply_correction': False},
+                content_type='application/json'
+            )
+            reanalyzed = await self.async_client.post(
+                '/api/async/images/analyze/',
+                {'image_id': analysis_id, 'force_reanalyze': 'true', 'apply_correction': 'false'}
+            )
+        finally:
+            compute._compute_executor = original
+            release.set()
+            running.result()
+            queued.result()
+
+        self.assertEqual(reevaluated.status_code, 503)
+        self.assertEqual(reanalyzed.status_code, 503)
+        analysis = await ImageAnalysis.objects.aget(id=analysis_id)
+        self.assertEqual(analysis.status, 'completed')
+        self.assertEqual(analysis.blurred_faces, 0)
+        self.assertFalse(await AnalysisRollup.objects.filter(failed__gt=0).aexists())
+
+
+class BatchedTaskTestCase(TestCase):
+    def setUp(self):
+        from face_blur_api.celery import app
+
+        self.celery_app = app
+        self.celery_app.conf.task_always_eager = True
+
+    def tearDown(self):
+        self.celery_app.conf.task_always_eager = False
+
+    def create_face_upload(self, filename, seed):
+        import cv2
+        from .benchmarks import generate_synthetic_image
+
+        image, _ = generate_synthetic_image(640, 480, 2, seed=seed)
+        return SimpleUploadedFile(filename, cv2.imencode('.jpg', image)[1].tobytes(),
+                                  content_type='image/jpeg')
+
+    def test_batch_task_marks_each_analysis(self):
+        from .tasks import process_images_batch
+
+        good = [
+            ImageAnalysis.objects.create(
+                original_image=self.create_face_upload(f'face_{i}.jpg', seed=i),
+                status='processing'
+            )
+            for i in range(2)
+        ]
+        broken = ImageAnalysis.objects.create(
+            original_image=SimpleUploadedFile('broken.jpg', b'not a jpeg', content_type='image/jpeg'),
+            status='processing'
+        )
+
+        result = process_images_batch.apply(
+            args=([str(analysis.id) for analysis in good + [broken]], 100.0, False)
+        ).get()
+
+        self.assertEqual(result['completed'], 2)
+        self.assertEqual(result['failed'], 1)
+        self.assertEqual(
+            ImageAnalysis.objects.filter(status='completed', total_faces=2).count(), 2
+        )
+        self.assertEqual(ImageAnalysis.objects.get(id=broken.id).status, 'failed')
+
+    def test_queue_analyses_publishes_batches_and_fails_unsent_rows(self):
+        from unittest import mock
+        from .batching import QueueUnavailable, queue_analyses
+        from .tasks import process_images_batch
+
+        analyses = [
+            ImageAnalysis.objects.create(
+                original_image=self.create_face_upload(f'queued_{i}.jpg', seed=i),
+                status='processing'
+            )
+            for i in range(3)
+        ]
+        task_ids = queue_analyses([analysis.id for analysis in analyses], 100.0, False, batch_size=2)
+        self.assertEqual(len(task_ids), 2)
+        self.assertEqual(ImageAnalysis.objects.filter(status='completed').count(), 3)
+
+        queued = ImageAnalysis.objects.create(
+            original_image=self.create_face_upload('unsent.jpg', seed=9),
+            status='processing'
+        )
+        with mock.patch.object(process_images_batch, 'apply_async', side_effect=ConnectionError('broker down')):
+            with self.assertRaises(QueueUnavailable):
+                queue_analyses([queued.id], 100.0, False)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'failed')
+        self.assertIn('broker down', queued.error_message)
+
+    def test_analyze_batch_async_endpoint_queues_batches(self):
+        from django.test import override_settings
+
+        with override_settings(ANALYSIS_TASK_BATCH_SIZE=2):
+            response = self.client.post(
+                '/api/images/analyze-batch-async/',
+                {
+                    'images': [self.create_face_upload(f'b{i}.jpg', seed=i) for i in range(3)],
+                    'apply_correction': False
+                }
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(response.data['task_ids']), 2)
+        self.assertEqual(
+            ImageAnalysis.objects.filter(id__in=response.data['analysis_ids'], status='completed').count(),
+            3
+        )
+
+
+class CpuBudgetTestCase(TestCase):
+    def test_cgroup_quota_caps_the_budget(self):
+        import tempfile
+        from .services import cpu_budget
+
+        original = cpu_budget.CGROUP_V2_CPU_MAX
+        with tempfile.NamedTemporaryFile('w', suffix='cpu.max') as cpu_max:
+            cpu_max.write('150000 100000\n')
+            cpu_max.flush()
+            cpu_budget.CGROUP_V2_CPU_MAX = cpu_max.name
+            try:
+                self.assertEqual(cpu_budget.read_cgroup_cpu_quota(), 1.5)
+                self.assertLessEqual(cpu_budget.available_cpus(), 2)
+            finally:
+                cpu_budget.CGROUP_V2_CPU_MAX = original
+
+    def test_workers_share_cpus_without_oversubscribing(self):
+        from .services import plan_cpu_budget
+
+        self.assertEqual(plan_cpu_budget(cpus=8).as_dict(), {'cpus': 8, 'workers': 8, 'opencv_threads': 1})
+        self.assertEqual(plan_cpu_budget(workers=2, cpus=8).opencv_threads, 4)
+        self.assertEqual(plan_cpu_budget(workers=16, cpus=8).opencv_threads, 1)
+
+    def test_batch_pool_uses_the_worker_share(self):
+        import os
+        from unittest import mock
+        from .services.batch import get_process_pool, shutdown_process_pool
+
+        shutdown_process_pool()
+        with mock.patch.dict(os.environ, {'CPU_BUDGET_OPENCV_THREADS': '4'}):
+            try:
+                pool = get_process_pool()
+                self.assertEqual(pool._max_workers, 4)
+                self.assertEqual(pool._initargs, (1,))
+                shutdown_process_pool()
+
+                pool = get_process_pool(2)
+                self.assertEqual(pool._max_workers, 2)
+                self.assertEqual(pool._initargs, (2,))
+            finally:
+                shutdown_process_pool()
+
+
+class CleanupTestCase(TestCase):
+    def create_analysis(self, days_old):
+        from datetime import timedelta
+        from django.core.files.base import ContentFile
+        from django.utils import timezone
+
+        from .analysis import save_with_rollups
+
+        analysis = ImageAnalysis(status='completed', total_faces=2)
+        analysis.original_image.save('old.jpg', ContentFile(b'x' * 100), save=False)
+        save_with_rollups(analysis)
+        ImageAnalysis.objects.filter(pk=analysis.pk).update(
+            created_at=timezone.now() - timedelta(days=days_old)
+        )
+        return analysis
+
+    def test_chunked_cleanup_resumes_and_reports_bytes(self):
+        from .cleanup import cleanup_expired_analyses
+        from .models import CleanupCheckpoint
+        from .rollups import get_rollup_stats
+
+        expired = [self.create_analysis(40) for _ in range(5)]
+        recent = self.create_analysis(1)
+
+        dry_run = cleanup_expired_analyses(days=30, batch_size=2, dry_run=True)
+        self.assertEqual((dry_run['rows_deleted'], dry_run['bytes_freed']), (5, 500))
+        self.assertEqual(ImageAnalysis.objects.count(), 6)
+        self.assertFalse(CleanupCheckpoint.objects.exists())
+
+        paused = cleanup_expired_analyses(days=30, batch_size=2, time_budget=0)
+        self.assertFalse(paused['complete'])
+        self.assertEqual((paused['batches'], paused['rows_deleted']), (1, 2))
+        self.assertTrue(CleanupCheckpoint.objects.exists())
+
+        resumed = cleanup_expired_analyses(days=30, batch_size=2)
+        self.assertTrue(resumed['resumed'])
+        self.assertTrue(resumed['complete'])
+        self.assertEqual((resumed['rows_deleted'], resumed['files_deleted']), (3, 3))
+        self.assertFalse(CleanupCheckpoint.objects.exists())
+
+        self.assertEqual(list(ImageAnalysis.objects.values_list('id', flat=True)), [recent.id])
+        self.assertFalse(any(os.path.exists(analysis.original_image.path) for analysis in expired))
+        self.assertTrue(os.path.exists(recent.original_image.path))
+
+        totals = get_rollup_stats('day')['totals']
+        self.assertEqual((totals['completed'], totals['total_faces']), (1, 2))
+
+    def test_concurrent_cleanup_runs_skip_a_claimed_checkpoint(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .cleanup import cleanup_expired_analyses
+        from .models import CleanupCheckpoint
+
+        for _ in range(3):
+            self.create_analysis(40)
+
+        paused = cleanup_expired_analyses(days=30, batch_size=1, time_budget=0)
+        self.assertEqual(paused['rows_deleted'], 1)
+        self.assertIsNone(CleanupCheckpoint.objects.get().locked_by)
+
+        # Another run is working from the checkpoint
+        CleanupCheckpoint.objects.update(locked_until=timezone.now() + timedelta(minutes=5))
+        skipped = cleanup_expired_analyses(days=30, batch_size=1, restart=True)
+        self.assertTrue(skipped['skipped'])
+        self.assertEqual(ImageAnalysis.objects.count(), 2)
+
+        # Its claim lapsed, so the next run resumes from the checkpoint
+        CleanupCheckpoint.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        resumed = cleanup_expired_analyses(days=30, batch_size=1)
+        self.assertTrue(resumed['resumed'])
+        self.assertTrue(resumed['complete'])
+        self.assertFalse(ImageAnalysis.objects.exists())
+
+
+class VideoAnalysisTestCase(APITestCase):
+    def create_video(self, frame_count=24, cut_at=12):
+        """A panning shot of the synthetic faces, cut to a brighter scene at ``cut_at``"""
+        import tempfile
+        import cv2
+        import numpy as np
+        from .benchmarks import generate_synthetic_image
+
+        image, _ = generate_synthetic_image(640, 480, 2, seed=2)
+        cut = cv2.convertScaleAbs(image, alpha=0.6, beta=90)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'clip.avi')
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 12, (640, 480))
+            for index in range(frame_count):
+                writer.write(np.roll(image if index < cut_at else cut, index * 2, axis=1))
+            writer.release()
+            with open(path, 'rb') as f:
+                return SimpleUploadedFile('clip.avi', f.read(), content_type='video/x-msvideo')
+
+    def test_streams_frames_with_tracking_between_detections(self):
+        import json
+        from .models import VideoAnalysis
+
+        response = self.client.post(
+            '/api/videos/analyze/',
+            {'video': self.create_video(), 'detect_every': 5},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        frames, final = lines[:-1], lines[-1]
+
+        self.assertEqual([frame['frame'] for frame in frames], list(range(24)))
+        self.assertEqual([frame['frame'] for frame in frames if frame['scene_change']], [12])
+        detected = [frame['frame'] for frame in frames if frame['detected']]
+        self.assertIn(12, detected)
+        self.assertLess(len(detected), 12)
+
+        face_ids = {face['face_id'] for face in frames[0]['faces']}
+        self.assertTrue(face_ids)
+        for frame in frames[1:12]:
+            self.assertEqual({face['face_id'] for face in frame['faces']}, face_ids)
+
+        self.assertEqual(final['status'], 'completed')
+        self.assertEqual(final['summary']['frames'], 24)
+        video = VideoAnalysis.objects.get(id=final['video_id'])
+        self.assertEqual(video.frames_processed, 24)
+        self.assertTrue(os.path.exists(video.results_file.path))
+
+    def test_sync_stream_is_bounded_and_videos_expire(self):
+        import json
+        from datetime import timedelta
+        from django.test import override_settings
+        from django.utils import timezone
+        from .cleanup import cleanup_expired_videos
+        from .models import VideoAnalysis
+
+        with override_settings(VIDEO_SYNC_MAX_FRAMES=10):
+            too_long = self.client.post(
+                '/api/videos/analyze/', {'video': self.create_video()}, format='multipart'
+            )
+            self.assertEqual(too_long.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(VideoAnalysis.objects.exists())
+
+        with override_settings(VIDEO_SYNC_TIME_BUDGET=0):
+            response = self.client.post(
+                '/api/videos/analyze/',
+                {'video': self.create_video(), 'max_frames': 8},
+                format='multipart'
+            )
+            final = json.loads(b''.join(response.streaming_content).splitlines()[-1])
+        self.assertEqual(final['status'], 'failed')
+        self.assertIn('Time budget', final['error'])
+
+        video = VideoAnalysis.objects.get(id=final['video_id'])
+        self.assertEqual(video.frames_processed, 1)
+        VideoAnalysis.objects.filter(pk=video.pk).update(created_at=timezone.now() - timedelta(days=40))
+
+        report = cleanup_expired_videos(days=30)
+        self.assertEqual((report['rows_deleted'], report['files_deleted']), (1, 2))
+        self.assertFalse(os.path.exists(video.video.path))
+        self.assertFalse(os.path.exists(video.results_file.path))
+
+
+class LazyRenderConcurrencyTestCase(TransactionTestCase):
+    def test_concurrent_fetches_render_once(self):
+        import threading
+        import time
+        import cv2
+        from unittest import mock
+        from django.db import connection
+        from django.test import Client, override_settings
+        from . import analysis as analysis_module
+        from .benchmarks import generate_synthetic_image
+
+        image, _ = generate_synthetic_image(1200, 800, 3, seed=2)
+        with override_settings(LAZY_CORRECTION=True):
+            response = self.client.post('/api/images/analyze/', {
+                'image': SimpleUploadedFile('faces.jpg', cv2.imencode('.jpg', image)[1].tobytes(),
+                                            content_type='image/jpeg')
+            })
+        url = f"/api/images/{response.json()['data']['id']}/processed/"
+
+        flight = analysis_module._render_flight
+        shared = flight.shared
+        renders = []
+        build_render_pipeline = analysis_module.build_render_pipeline
+
+        class WaitingPipeline:
+            """Holds the render until the second request has joined it"""
+
+            def run(self, context):
+                renders.append(context)
+                deadline = time.monotonic() + 5
+                while flight.shared == shared and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                return build_render_pipeline().run(context)
+
+        responses = []
+
+        def fetch():
+            try:
+                fetched = Client().get(url)
+                responses.append((fetched.status_code, b''.join(fetched.streaming_content)))
+            finally:
+                connection.close()
+
+        with mock.patch.object(analysis_module, 'build_render_pipeline', WaitingPipeline):
+            threads = [threading.Thread(target=fetch) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(flight.shared - shared, 1)
+        self.assertEqual([code for code, _ in responses], [200, 200])
+        self.assertEqual(responses[0][1], responses[1][1])
@@ -1,10 +1,23 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ImageAnalysisViewSet
+from .views import ImageAnalysisViewSet, VideoAnalysisViewSet, image_overlay, image_variant, processed_image
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'images', ImageAnalysisViewSet, basename='image-analysis')
+router.register(r'videos', VideoAnalysisViewSet, basename='video-analysis')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('images/<uuid:pk>/variant/', image_variant, name='image-variant'),
+    path('images/<uuid:pk>/processed/', processed_image, name='image-processed'),
+    path('images/<uuid:pk>/overlay/', image_overlay, name='image-overlay'),
+    path('async/images/', async_views.AsyncImageListView.as_view(), name='async-image-list'),
+    path('async/images/upload/', async_views.AsyncUploadView.as_view(), name='async-image-upload'),
+    path('async/images/analyze/', async_views.AsyncAnalyzeView.as_view(), name='async-image-analyze'),
+    path('async/images/compute-stats/', async_views.AsyncComputeStatsView.as_view(),
+         name='async-compute-stats'),
+    path('async/images/<uuid:pk>/', async_views.AsyncImageDetailView.as_view(), name='async-image-detail'),
+    path('async/images/<uuid:pk>/reevaluate/', async_views.AsyncReevaluateView.as_view(),
+         name='async-image-reevaluate'),
 ]
\ No newline at end of file
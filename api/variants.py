@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Optional, Tuple
+
+import cv2
+from django.conf import settings
+from PIL import Image
+
+from .services import get_image_processor
+from .services.encoding import EncodingProfile
+
+logger = logging.getLogger(__name__)
+
+
+class VariantCache:
+    """
+    Resized, re-encoded copies of analysis images on local disk.
+
+    A variant's file name is derived from its source file (name, size and
+    mtime), target size and encoding profile, so a replaced source never
+    serves a stale variant and the name doubles as a strong ETag. Hits bump
+    the file's mtime; once the cache grows past ``max_bytes`` the least
+    recently used files are removed until it is back under 90% of the cap.
+    The running total is per process and re-measured from disk before
+    evicting, so several processes can share one directory.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @property
+    def root(self) -> str:
+        return self._root or getattr(
+            settings, 'VARIANT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'variants')
+        )
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes or getattr(settings, 'VARIANT_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+    def make_key(self, source_path: str, size: int, profile: EncodingProfile) -> str:
+        stat = os.stat(source_path)
+        payload = json.dumps({
+            'source': source_path,
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'size': size,
+            'profile': profile.as_dict(),
+        }, sort_keys=True)
+
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_path(self, key: str, profile: EncodingProfile) -> str:
+        return os.path.join(self.root, key[:2], f'{key}{profile.extension}')
+
+    def get_or_create(self, source_path: str, size: int, profile: EncodingProfile) -> Tuple[str, str]:
+        """``(path, key)`` of the variant, rendering it on a miss"""
+        key = self.make_key(source_path, size, profile)
+        path = self.get_path(key, profile)
+
+        try:
+            os.utime(path)
+            return path, key
+        except FileNotFoundError:
+            pass
+
+        data = render_variant(source_path, size, profile)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Concurrent misses each write a temporary file; the last rename wins
+        temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temporary, 'wb') as output_file:
+            output_file.write(data)
+        os.replace(temporary, path)
+
+        self._added(len(data))
+        return path, key
+
+    def _scan(self):
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                # Other writers' files in flight; they are not cached yet
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(file_size for _, file_size, _ in self._scan())
+            else:
+                self._total_bytes += size
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            files = sorted(self._scan())
+            total = sum(file_size for _, file_size, _ in files)
+            target = self.max_bytes * 0.9
+            evicted = 0
+            for _, file_size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= file_size
+                evicted += 1
+            self._total_bytes = total
+
+        if evicted:
+            logger.info(f"Evicted {evicted} image variants, {total} bytes cached")
+
+    def stats(self) -> dict:
+        files = self._scan()
+        return {
+            'files': len(files),
+            'bytes': sum(file_size for _, file_size, _ in files),
+            'max_bytes': self.max_bytes,
+        }
+
+
+def get_decode_reduction(source_path: str, size: int) -> int:
+    """Largest JPEG DCT reduction that still leaves the longest side at least ``size``"""
+    try:
+        with Image.open(source_path) as image:
+            if image.format != 'JPEG':
+                return 1
+            longest = max(image.size)
+    except OSError:
+        return 1
+
+    for reduction in (8, 4, 2):
+        if longest // reduction >= size:
+            return reduction
+    return 1
+
+
+def render_variant(source_path: str, size: int, profile: EncodingProfile) -> bytes:
+    """``source_path`` scaled down to fit ``size`` x ``size`` (never up) and encoded with ``profile``"""
+    image_processor = get_image_processor()
+    image = image_processor.load_image(source_path, reduction=get_decode_reduction(source_path, size))
+
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    if scale < 1:
+        image = cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+
+    return image_processor.encode_image(image, profile.extension, profile.imencode_params())
+
+
+variant_cache = VariantCache()
+
+
+def get_variant_source(analysis, source: str) -> Optional[str]:
+    image = analysis.processed_image if source == 'processed' else analysis.original_image
+    if not image or not os.path.exists(image.path):
+        return None
+    return image.path
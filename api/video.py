@@ -0,0 +1,102 @@
+import json
+import math
+import os
+import time
+from typing import Dict, Iterator
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import VideoAnalysis
+from .services.video import VideoSummary, analyze_video, get_frame_count
+
+
+def get_video_options(video: VideoAnalysis) -> Dict:
+    return {
+        'blur_threshold': video.blur_threshold,
+        'detect_every': video.detect_every,
+        'frame_stride': video.frame_stride,
+        'scene_threshold': getattr(settings, 'VIDEO_SCENE_THRESHOLD', 0.7),
+        'track_min_score': getattr(settings, 'VIDEO_TRACK_MIN_SCORE', 0.5),
+        'detection_max_side': getattr(settings, 'FACE_DETECTION_MAX_SIDE', None),
+    }
+
+
+def get_max_frames(requested: int = None) -> int:
+    """``requested``, capped at VIDEO_MAX_FRAMES"""
+    limit = getattr(settings, 'VIDEO_MAX_FRAMES', 18000)
+    return min(requested, limit) if requested else limit
+
+
+def get_planned_frames(video: VideoAnalysis, max_frames: int = None) -> int:
+    """How many frames analyzing ``video`` will process, at most; the cap when the header has no count"""
+    limit = get_max_frames(max_frames)
+    frame_count = get_frame_count(video.video.path)
+    if frame_count is None:
+        return limit
+    return min(math.ceil(frame_count / video.frame_stride), limit)
+
+
+def fits_sync_budget(video: VideoAnalysis, max_frames: int = None) -> bool:
+    """Whether ``video`` is short enough to stream back within a web worker's timeout"""
+    return get_planned_frames(video, max_frames) <= getattr(settings, 'VIDEO_SYNC_MAX_FRAMES', 600)
+
+
+def run_video_analysis(video: VideoAnalysis, max_frames: int = None,
+                       time_budget: float = None) -> Iterator[Dict]:
+    """
+    Analyze ``video`` frame by frame and yield each frame's result as soon
+    as it is scored. Results are appended to the row's NDJSON file and
+    folded into a running summary, and progress is saved every
+    VIDEO_PROGRESS_EVERY frames, so memory does not grow with the clip.
+    The row is finished when the iteration ends; stopping early, running
+    past ``time_budget`` seconds or an error marks it failed.
+    """
+    started = time.monotonic()
+    video.status = 'processing'
+    video.save(update_fields=['status', 'updated_at'])
+
+    name = f'video_results/{video.id}.ndjson'
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    progress_every = getattr(settings, 'VIDEO_PROGRESS_EVERY', 25)
+    summary = VideoSummary()
+    error = None
+
+    try:
+        with open(path, 'w') as results_file:
+            frames = analyze_video(
+                video.video.path,
+                max_frames=get_max_frames(max_frames),
+                **get_video_options(video)
+            )
+            for result in frames:
+                results_file.write(json.dumps(result) + '\n')
+                summary.add(result)
+                if summary.frames % progress_every == 0:
+                    VideoAnalysis.objects.filter(pk=video.pk).update(
+                        frames_processed=summary.frames,
+                        updated_at=timezone.now()
+                    )
+                yield result
+                if time_budget is not None and time.monotonic() - started > time_budget:
+                    error = (
+                        f'Time budget of {time_budget}s reached after {summary.frames} frames; '
+                        f'use async_processing for longer clips'
+                    )
+                    break
+    except GeneratorExit:
+        error = f'Stopped after {summary.frames} frames'
+        raise
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        video.status = 'failed' if error else 'completed'
+        video.error_message = error
+        video.frames_processed = summary.frames
+        video.summary = summary.as_dict()
+        video.results_file = name
+        video.processed_at = timezone.now()
+        video.save()
@@ -1,22 +1,59 @@
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 import os
+import json
 import cv2
 
-from .models import ImageAnalysis
+from .models import ImageAnalysis, VideoAnalysis
+from .pagination import AnalysisCursorPagination
 from .serializers import (
     ImageUploadSerializer,
     ImageAnalysisSerializer,
     ImageAnalysisDetailSerializer,
-    AnalyzeImageSerializer
+    AnalyzeImageSerializer,
+    AnalysisListQuerySerializer,
+    AnalysisStatsQuerySerializer,
+    BatchAnalyzeSerializer,
+    BestShotSerializer,
+    OverlayQuerySerializer,
+    ReevaluateSerializer,
+    VariantQuerySerializer,
+    VideoAnalysisSerializer,
+    VideoAnalyzeSerializer
+)
+from .services import build_overlay, get_image_processor, registry, render_overlay_svg
+from .cache import hash_content, hash_upload, result_cache
+from .batching import QueueUnavailable, queue_analyses
+from .compute import get_compute_executor
+from .metrics import render_metrics
+from .rollups import delete_analyses, get_rollup_stats
+from .variants import get_variant_source, variant_cache
+from .burst import run_best_shot
+from .tasks import process_video_async
+from .video import fits_sync_budget, run_video_analysis
+from .analysis import (
+    can_reevaluate,
+    get_encoding_profile,
+    get_pipeline_options,
+    reevaluate_analysis,
+    remove_output_files,
+    render_processed_image,
+    run_analysis,
+    create_analyses_from_uploads,
+    create_analysis_from_bytes,
+    run_batch_analysis
 )
-from .services import FaceDetector, BlurDetector, ImageProcessor
 
 
 class ImageAnalysisViewSet(viewsets.ModelViewSet):
@@ -74,68 +111,91 @@ class ImageAnalysisViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
 
         data = serializer.validated_data
+        image_bytes = None
+        persist_future = None
         if data.get('image_id'):
             analysis = get_object_or_404(ImageAnalysis, id=data['image_id'])
-            image_path = analysis.original_image.path
+            if can_reevaluate(analysis) and not data.get('force_reanalyze', False):
+                return self._reevaluate(request, analysis, data)
         else:
-            analysis = ImageAnalysis.objects.create(
-                original_image=data['image'],
-                status='pending'
-            )
-            image_path = analysis.original_image.path
-        if data.get('async_processing', False):
-            from .tasks import process_image_async
-            task = process_image_async.delay(
-                str(analysis.id),
-                data.get('blur_threshold', 100.0),
-                data.get('apply_correction', True)
+            upload = data['image']
+            if data.get('async_processing', False):
+                content_hash = hash_upload(upload)
+            else:
+                upload.seek(0)
+                image_bytes = upload.read()
+                content_hash = hash_content(image_bytes)
+
+            cached = result_cache.lookup(
+                content_hash,
+                get_pipeline_options(
+                    data.get('blur_threshold', 100.0),
+                    data.get('apply_correction', True),
+                    data.get('encoding_profile'),
+                    data.get('output_mode')
+                )
             )
+            if cached is not None:
+                result_serializer = ImageAnalysisDetailSerializer(
+                    cached,
+                    context={'request': request}
+                )
+                return Response({
+                    'message': 'Image analysis completed (cached result)',
+                    'cached': True,
+                    'data': result_serializer.data
+                }, status=status.HTTP_200_OK)
+
+            if image_bytes is None:
+                analysis = ImageAnalysis.objects.create(
+                    original_image=upload,
+                    status='processing',
+                    content_hash=content_hash
+                )
+            else:
+                analysis, persist_future = create_analysis_from_bytes(
+                    upload.name,
+                    image_bytes,
+                    content_hash=content_hash
+                )
 
-            analysis.status = 'processing'
-            analysis.save()
+        if data.get('async_processing', False):
+            if analysis.status != 'processing':
+                ImageAnalysis.objects.filter(pk=analysis.pk).update(
+                    status='processing',
+                    updated_at=timezone.now()
+                )
+            try:
+                task_id, = queue_analyses(
+                    [analysis.id],
+                    data.get('blur_threshold', 100.0),
+                    data.get('apply_correction', True),
+                    data.get('encoding_profile'),
+                    data.get('output_mode')
+                )
+            except QueueUnavailable as e:
+                return Response({
+                    'error': 'Could not queue analysis',
+                    'detail': str(e)
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
             return Response({
                 'message': 'Image processing started',
-                'task_id': task.id,
+                'task_id': task_id,
                 'analysis_id': str(analysis.id),
                 'status': 'processing'
             }, status=status.HTTP_202_ACCEPTED)
 
         try:
-            analysis.status = 'processing'
-            analysis.save()
-
-            face_detector = FaceDetector()
-            blur_detector = BlurDetector(threshold=data.get('blur_threshold', 100.0))
-            image_processor = ImageProcessor()
-
-            image, face_data = face_detector.detect_faces(image_path)
-
-            face_regions = face_detector.extract_face_regions(image, face_data)
-
-            face_data_with_blur = blur_detector.analyze_faces_blur(face_regions, face_data)
-
-            blur_stats = blur_detector.get_overall_blur_stats(face_data_with_blur)
-
-            if data.get('apply_correction', True):
-                processed_image = image_processor.process_full_image(image, face_data_with_blur)
-                annotated_image = image_processor.add_annotations(processed_image, face_data_with_blur)
-
-                processed_path = os.path.join(
-                    'media',
-                    'processed',
-                    f'processed_{analysis.id}.jpg'
-                )
-                image_processor.save_image(annotated_image, processed_path)
-
-                analysis.processed_image = processed_path.replace('media/', '')
-
-            analysis.total_faces = blur_stats['total_faces']
-            analysis.blurred_faces = blur_stats['blurred_faces']
-            analysis.face_data = face_data_with_blur
-            analysis.status = 'completed'
-            analysis.processed_at = timezone.now()
-            analysis.save()
+            run_analysis(
+                analysis,
+                blur_threshold=data.get('blur_threshold', 100.0),
+                apply_correction=data.get('apply_correction', True),
+                image_bytes=image_bytes,
+                persist_future=persist_future,
+                encoding_profile=data.get('encoding_profile'),
+                output_mode=data.get('output_mode')
+            )
 
             result_serializer = ImageAnalysisDetailSerializer(
                 analysis,
@@ -148,15 +208,236 @@ class ImageAnalysisViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            analysis.status = 'failed'
-            analysis.error_message = str(e)
-            analysis.save()
-
             return Response({
                 'error': 'Image processing failed',
                 'detail': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @swagger_auto_schema(
+        operation_description="Re-evaluate a completed analysis for a new blur threshold "
+                              "from its stored per-face scores",
+        request_body=ReevaluateSerializer,
+        responses={
+            200: ImageAnalysisDetailSerializer,
+            400: "Bad Request",
+            404: "Not Found",
+            409: "Analysis not completed"
+        }
+    )
+    @action(detail=True, methods=['post'], url_path='reevaluate')
+    def reevaluate(self, request, pk=None):
+        serializer = ReevaluateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        analysis = get_object_or_404(ImageAnalysis, pk=pk)
+        if not can_reevaluate(analysis):
+            return Response({
+                'error': 'Analysis has no stored scores to re-evaluate',
+                'detail': f"Status is '{analysis.status}'"
+            }, status=status.HTTP_409_CONFLICT)
+
+        return self._reevaluate(request, analysis, serializer.validated_data)
+
+    def _reevaluate(self, request, analysis, data):
+        try:
+            reevaluate_analysis(
+                analysis,
+                blur_threshold=data.get('blur_threshold', 100.0),
+                apply_correction=data.get('apply_correction', True),
+                encoding_profile=data.get('encoding_profile'),
+                output_mode=data.get('output_mode')
+            )
+        except Exception as e:
+            return Response({
+                'error': 'Image re-evaluation failed',
+                'detail': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        result_serializer = ImageAnalysisDetailSerializer(
+            analysis,
+            context={'request': request}
+        )
+
+        return Response({
+            'message': 'Image analysis re-evaluated',
+            'data': result_serializer.data
+        }, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Analyze many images on a process pool; results stream back as NDJSON",
+        request_body=BatchAnalyzeSerializer,
+        responses={
+            200: "One JSON analysis result per line (application/x-ndjson)",
+            400: "Bad Request"
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='analyze-batch')
+    def analyze_batch(self, request):
+        serializer = BatchAnalyzeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        analyses, error_response = self._get_batch_analyses(data)
+        if error_response is not None:
+            return error_response
+
+        results = run_batch_analysis(
+            analyses,
+            blur_threshold=data.get('blur_threshold', 100.0),
+            apply_correction=data.get('apply_correction', True),
+            encoding_profile=data.get('encoding_profile'),
+            output_mode=data.get('output_mode')
+        )
+
+        def stream_results():
+            for analysis in results:
+                yield json.dumps(self._batch_result(request, analysis)) + '\n'
+
+        return StreamingHttpResponse(stream_results(), content_type='application/x-ndjson')
+
+    @swagger_auto_schema(
+        operation_description="Queue many images for Celery as batch tasks of up to ANALYSIS_TASK_BATCH_SIZE",
+        request_body=BatchAnalyzeSerializer,
+        responses={
+            202: "Analysis IDs and the batch task IDs they were queued in",
+            400: "Bad Request",
+            503: "The broker is unavailable; unqueued analyses are marked failed"
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='analyze-batch-async')
+    def analyze_batch_async(self, request):
+        serializer = BatchAnalyzeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        analyses, error_response = self._get_batch_analyses(data)
+        if error_response is not None:
+            return error_response
+
+        try:
+            task_ids = queue_analyses(
+                [analysis.id for analysis in analyses],
+                data.get('blur_threshold', 100.0),
+                data.get('apply_correction', True),
+                data.get('encoding_profile'),
+                data.get('output_mode')
+            )
+        except QueueUnavailable as e:
+            return Response({
+                'error': 'Could not queue analyses',
+                'detail': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        return Response({
+            'message': 'Batch processing started',
+            'task_ids': task_ids,
+            'analysis_ids': [str(analysis.id) for analysis in analyses],
+            'status': 'processing'
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @swagger_auto_schema(
+        operation_description="Pick the sharpest frame of a burst, overall and per face. Faces are "
+                              "detected once and matched across frames; with target_score, frames "
+                              "after the first one that clears it are not analyzed",
+        request_body=BestShotSerializer,
+        responses={
+            200: "Best frame, best frame per face and the score of every analyzed frame",
+            400: "Bad Request"
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='best-shot')
+    def best_shot(self, request):
+        serializer = BestShotSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        try:
+            result = run_best_shot(
+                data['images'],
+                blur_threshold=data['blur_threshold'],
+                target_score=data.get('target_score')
+            )
+        except ValueError as e:
+            return Response({
+                'error': 'Best shot selection failed',
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'message': 'Best shot selected',
+            'data': result
+        }, status=status.HTTP_200_OK)
+
+    def _get_batch_analyses(self, data):
+        """Existing rows (marked processing) plus rows for the new uploads"""
+        image_ids = data.get('image_ids', [])
+        analyses = list(ImageAnalysis.objects.filter(id__in=image_ids))
+        missing_ids = set(image_ids) - {analysis.id for analysis in analyses}
+        if missing_ids:
+            return None, Response({
+                'error': 'Unknown image_ids',
+                'detail': sorted(str(image_id) for image_id in missing_ids)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if analyses:
+            ImageAnalysis.objects.filter(id__in=image_ids).update(
+                status='processing',
+                updated_at=timezone.now()
+            )
+        analyses += create_analyses_from_uploads(data.get('images', []))
+
+        return analyses, None
+
+    def _batch_result(self, request, analysis):
+        result = {
+            'analysis_id': str(analysis.id),
+            'status': analysis.status,
+        }
+        if analysis.status == 'failed':
+            result['error'] = analysis.error_message
+            return result
+
+        result.update({
+            'total_faces': analysis.total_faces,
+            'blurred_faces': analysis.blurred_faces,
+            'face_data': analysis.face_data,
+        })
+        result.update(ImageAnalysisSerializer(
+            analysis,
+            fields=['processed_image_url', 'face_crops', 'overlay_url'],
+            context={'request': request}
+        ).data)
+        return result
+
+    @swagger_auto_schema(
+        operation_description="Get load and reuse counters of the warm analysis services and the result cache",
+        responses={200: "Service registry counters"}
+    )
+    @action(detail=False, methods=['get'], url_path='service-stats')
+    def service_stats(self, request):
+        stats = registry.stats()
+        stats['result_cache'] = result_cache.stats()
+        stats['compute_executor'] = get_compute_executor().stats()
+
+        return Response({
+            'data': stats
+        }, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Get completed/failed counts, face totals and the blur-score histogram "
+                              "per hour or day, read from the incrementally maintained rollups",
+        query_serializer=AnalysisStatsQuerySerializer,
+        responses={200: "Rollup buckets and their totals"}
+    )
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        query = AnalysisStatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        return Response({
+            'data': get_rollup_stats(**query.validated_data)
+        }, status=status.HTTP_200_OK)
+
     @swagger_auto_schema(
         operation_description="Get analysis results by ID",
         responses={
@@ -176,19 +457,36 @@ class ImageAnalysisViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
-        operation_description="List all image analyses",
+        operation_description="List image analyses, newest first, one cursor page at a time",
+        query_serializer=AnalysisListQuerySerializer,
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Opaque cursor from the 'next'/'previous' links"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Rows per page (default 50, max 200)"),
+        ],
         responses={200: ImageAnalysisSerializer(many=True)}
     )
     def list(self, request):
-        queryset = self.get_queryset()
+        query = AnalysisListQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        paginator = AnalysisCursorPagination()
+        page = paginator.paginate_queryset(
+            query.filter_queryset(self.get_queryset()),
+            request,
+            view=self
+        )
         serializer = ImageAnalysisSerializer(
-            queryset,
+            page,
             many=True,
+            fields=query.get_fields_to_render(),
             context={'request': request}
         )
 
         return Response({
-            'count': queryset.count(),
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
             'data': serializer.data
         }, status=status.HTTP_200_OK)
 
@@ -205,13 +503,180 @@ class ImageAnalysisViewSet(viewsets.ModelViewSet):
             if os.path.exists(analysis.original_image.path):
                 os.remove(analysis.original_image.path)
 
-        if analysis.processed_image:
-            if os.path.exists(analysis.processed_image.path):
-                os.remove(analysis.processed_image.path)
-
-        analysis.delete()
+        remove_output_files(analysis)
+        delete_analyses([analysis])
 
         return Response(
             {'message': 'Image analysis deleted successfully'},
             status=status.HTTP_204_NO_CONTENT
-        )
\ No newline at end of file
+        )
+
+
+class VideoAnalysisViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = VideoAnalysis.objects.all()
+    serializer_class = VideoAnalysisSerializer
+    parser_classes = (MultiPartParser, FormParser)
+
+    @swagger_auto_schema(
+        operation_description="Score face blur over a video clip. Per-frame results stream back "
+                              "as NDJSON while the clip is read, followed by a summary line",
+        request_body=VideoAnalyzeSerializer,
+        responses={
+            200: "One JSON frame result per line, then the summary (application/x-ndjson)",
+            202: "Queued for Celery",
+            400: "Bad Request, or too long to stream without async_processing"
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='analyze')
+    def analyze(self, request):
+        serializer = VideoAnalyzeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        video = VideoAnalysis.objects.create(
+            video=data['video'],
+            blur_threshold=data['blur_threshold'],
+            detect_every=data.get('detect_every') or getattr(settings, 'VIDEO_DETECT_EVERY', 10),
+            frame_stride=data['frame_stride']
+        )
+
+        if data['async_processing']:
+            task = process_video_async.delay(str(video.id), data.get('max_frames'))
+            return Response({
+                'message': 'Video processing started',
+                'task_id': task.id,
+                'video_id': str(video.id),
+                'status': 'processing'
+            }, status=status.HTTP_202_ACCEPTED)
+
+        if not fits_sync_budget(video, data.get('max_frames')):
+            video.video.delete(save=False)
+            video.delete()
+            return Response({
+                'error': 'Video too long to stream',
+                'detail': f"Clips of more than {getattr(settings, 'VIDEO_SYNC_MAX_FRAMES', 600)} "
+                          f"processed frames need async_processing=true (or a lower max_frames "
+                          f"or higher frame_stride)."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        time_budget = getattr(settings, 'VIDEO_SYNC_TIME_BUDGET', 90)
+
+        def stream_results():
+            try:
+                for result in run_video_analysis(video, data.get('max_frames'), time_budget):
+                    yield json.dumps(result) + '\n'
+            except Exception:
+                # Recorded on the row and reported in the summary line
+                pass
+            yield json.dumps({
+                'video_id': str(video.id),
+                'status': video.status,
+                'error': video.error_message,
+                'summary': video.summary
+            }) + '\n'
+
+        return StreamingHttpResponse(stream_results(), content_type='application/x-ndjson')
+
+
+@require_GET
+def image_variant(request, pk):
+    """
+    A resized copy of the processed or original image. Variants are rendered
+    once into the disk cache, and the ETag/Last-Modified check runs before
+    any rendering so repeat requests get 304.
+    """
+    query = VariantQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return JsonResponse(query.errors, status=400)
+
+    data = query.validated_data
+    analysis = get_object_or_404(ImageAnalysis, pk=pk)
+    if data['source'] == 'processed' and analysis.output_pending:
+        analysis = render_processed_image(analysis)
+    source_path = get_variant_source(analysis, data['source'])
+    if source_path is None:
+        return JsonResponse({
+            'error': 'Image not available',
+            'detail': f"Analysis has no {data['source']} image"
+        }, status=404)
+
+    profile = get_encoding_profile(settings.VARIANT_FORMATS[data['format']])
+    etag = f'"{variant_cache.make_key(source_path, data["size"], profile)}"'
+    last_modified = int(os.stat(source_path).st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        try:
+            path, _ = variant_cache.get_or_create(source_path, data['size'], profile)
+            variant_file = open(path, 'rb')
+        except FileNotFoundError:
+            # Evicted by another process between rendering and opening
+            path, _ = variant_cache.get_or_create(source_path, data['size'], profile)
+            variant_file = open(path, 'rb')
+        response = FileResponse(variant_file, content_type=profile.content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = f"max-age={getattr(settings, 'VARIANT_CACHE_MAX_AGE', 86400)}"
+    return response
+
+
+@require_GET
+def processed_image(request, pk):
+    """
+    The processed image. With LAZY_CORRECTION it is rendered by the first
+    request for it; concurrent first requests wait for that one render.
+    """
+    analysis = get_object_or_404(ImageAnalysis, pk=pk)
+    if analysis.output_pending:
+        try:
+            analysis = render_processed_image(analysis)
+        except Exception as e:
+            return JsonResponse({
+                'error': 'Image rendering failed',
+                'detail': str(e)
+            }, status=500)
+
+    if not analysis.processed_image or not os.path.exists(analysis.processed_image.path):
+        return JsonResponse({
+            'error': 'Image not available',
+            'detail': 'Analysis has no processed image'
+        }, status=404)
+
+    return FileResponse(open(analysis.processed_image.path, 'rb'))
+
+
+@require_GET
+def image_overlay(request, pk):
+    """
+    Boxes and labels of a completed analysis as JSON or SVG, for clients
+    that draw them over the original image instead of fetching a
+    re-encoded one. Only the image header is read.
+    """
+    query = OverlayQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return JsonResponse(query.errors, status=400)
+
+    analysis = get_object_or_404(ImageAnalysis, pk=pk)
+    if analysis.status != 'completed':
+        return JsonResponse({
+            'error': 'Analysis not completed',
+            'detail': f"Status is '{analysis.status}'"
+        }, status=409)
+    if not analysis.original_image or not os.path.exists(analysis.original_image.path):
+        return JsonResponse({
+            'error': 'Image not available',
+            'detail': 'Analysis has no original image'
+        }, status=404)
+
+    width, height = get_image_processor().get_image_size(analysis.original_image.path)
+    overlay = build_overlay(analysis.face_data, width, height)
+    if query.validated_data['format'] == 'svg':
+        return HttpResponse(render_overlay_svg(overlay), content_type='image/svg+xml')
+    return JsonResponse(overlay)
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, aggregated across worker processes"""
+    payload, content_type = render_metrics()
+    return HttpResponse(payload, content_type=content_type)
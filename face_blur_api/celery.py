@@ -1,5 +1,7 @@
 import os
+import shutil
 from celery import Celery
+from celery.signals import celeryd_init, worker_process_init, worker_process_shutdown, worker_ready
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'face_blur_api.settings')
 
@@ -10,6 +12,62 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@celeryd_init.connect
+def apply_worker_cpu_budget(conf=None, options=None, **kwargs):
+    """
+    Size the pool from the CPU budget unless --concurrency/--autoscale say
+    otherwise, and split the CPUs between pool slots for OpenCV
+    """
+    from api.services.cpu_budget import apply_cpu_budget, plan_cpu_budget
+
+    options = options or {}
+    autoscale = options.get('autoscale')
+    if autoscale:
+        workers = max(int(value) for value in str(autoscale).split(','))
+    else:
+        workers = options.get('concurrency') or conf.worker_concurrency or None
+
+    budget = plan_cpu_budget(workers=workers)
+    if not options.get('concurrency') and not autoscale:
+        conf.worker_concurrency = budget.workers
+    apply_cpu_budget(budget)
+
+
+@worker_process_init.connect
+def preload_analysis_services(**kwargs):
+    """Load the Haar cascade once per worker process instead of per task"""
+    from api.services import plan_cpu_budget, apply_cpu_budget, preload_services
+    apply_cpu_budget(plan_cpu_budget())
+    preload_services()
+
+
+@celeryd_init.connect
+def reset_metrics_dir(**kwargs):
+    """Pool processes share PROMETHEUS_MULTIPROC_DIR; start from empty files"""
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+@worker_ready.connect
+def start_metrics_server(**kwargs):
+    """Serve /metrics for the whole worker (all pool processes) from the main process"""
+    from django.conf import settings
+    from prometheus_client import start_http_server
+    from api.metrics import get_metrics_registry
+
+    port = getattr(settings, 'WORKER_METRICS_PORT', None)
+    if port:
+        start_http_server(port, registry=get_metrics_registry())
+
+
+@worker_process_shutdown.connect
+def release_process_metrics(pid=None, **kwargs):
+    from api.metrics import mark_process_dead
+    mark_process_dead(pid or os.getpid())
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     """Debug task for testing Celery"""
@@ -141,6 +141,135 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Record bytes allocated per analysis pipeline stage (uses tracemalloc). The
+# peaks are process-wide, so the numbers only hold while one analysis runs at a time.
+ANALYSIS_TRACE_ALLOCATIONS = DEBUG
+
+# Coarse-to-fine face detection: cap the longest side of the first detection
+# pass (None searches the full-resolution image) and re-detect every candidate
+# in a small full-resolution ROI. See `manage.py bench_detection`.
+FACE_DETECTION_MAX_SIDE = None
+FACE_DETECTION_REFINE = True
+
+# Images with at least this many pixels are split into overlapping tiles that
+# are searched on FACE_DETECTION_TILE_WORKERS threads (None: this process'
+# OpenCV threads from the CPU budget). Under the default gunicorn policy that
+# is one thread, so tiles are searched one after another in web workers; set
+# it explicitly to search them in parallel. Ignored when FACE_DETECTION_MAX_SIDE
+# is set.
+FACE_DETECTION_TILED_MIN_PIXELS = 40_000_000
+FACE_DETECTION_TILE_SIZE = 1024
+FACE_DETECTION_TILE_WORKERS = None
+
+# Metrics-only analyses (apply_correction=False) decode JPEGs at 1/2, 1/4 or 1/8
+# size when set above 1. Faster and smaller, but blur scores are then measured
+# on the reduced image and are not directly comparable to full-size scores.
+ANALYSIS_METRICS_DECODE_REDUCTION = 1
+
+# Content-addressed result cache: repeated uploads with the same SHA-256 and
+# analysis parameters return the stored analysis without running OpenCV.
+ANALYSIS_CACHE_ENABLED = True
+ANALYSIS_CACHE_MAX_ENTRIES = 10000
+
+# Threads writing uploaded originals to storage while the analysis runs
+FILE_PERSIST_WORKERS = 2
+
+# Batch analysis: worker processes (None: this process' OpenCV threads from the
+# CPU budget, i.e. one under the default gunicorn policy) and images per request
+BATCH_MAX_WORKERS = None
+BATCH_MAX_IMAGES = 500
+
+# Images queued in one request (analyze-batch-async) are published as Celery
+# batch tasks of up to ANALYSIS_TASK_BATCH_SIZE images before the response is
+# sent. Failed tasks retry with exponential backoff
+# (ANALYSIS_RETRY_BACKOFF * 2^retry seconds, capped, with jitter).
+ANALYSIS_TASK_BATCH_SIZE = 32
+ANALYSIS_RETRY_BACKOFF = 5
+ANALYSIS_RETRY_BACKOFF_MAX = 300
+
+# Thread pool for the OpenCV stages of the async views (/api/async/images/).
+# None uses one thread per CPU; analyses beyond COMPUTE_MAX_QUEUE waiting jobs
+# are rejected with 503 instead of queueing without bound.
+COMPUTE_MAX_WORKERS = None
+COMPUTE_MAX_QUEUE = 64
+
+# Port of the Prometheus endpoint each Celery worker serves (0 disables it).
+# Workers aggregate their pool processes through PROMETHEUS_MULTIPROC_DIR;
+# the web app serves the same metrics at /metrics.
+WORKER_METRICS_PORT = int(os.environ.get('WORKER_METRICS_PORT', 9808))
+
+# Output encoding of processed images. OUTPUT_ENCODING_PROFILE is used unless
+# a request names another profile. ENCODING_PROFILES adds or replaces profiles
+# next to the built-in jpeg, jpeg-web, jpeg-small, webp, png and png-small,
+# e.g. {'thumb': {'format': 'webp', 'quality': 60}}. Encoding and writing run
+# on ENCODE_WORKERS threads (None: this process' OpenCV threads from the CPU
+# budget) unless ENCODE_IN_BACKGROUND is off. See `manage.py bench_encoding`.
+OUTPUT_ENCODING_PROFILE = 'jpeg'
+ENCODING_PROFILES = {}
+ENCODE_IN_BACKGROUND = True
+ENCODE_WORKERS = None
+
+# With LAZY_CORRECTION, analyze only detects and scores faces. The corrected,
+# annotated image is rendered and stored by the first request for its
+# processed_image_url (/api/images/<id>/processed/).
+LAZY_CORRECTION = False
+
+# What correction output analyze writes unless a request sets output_mode:
+# 'full' (the corrected, annotated frame), 'crops' (each face corrected and
+# encoded on its own) or 'overlay' (nothing; clients draw
+# /api/images/<id>/overlay/ themselves).
+OUTPUT_MODE = 'full'
+
+# Video analysis (/api/videos/analyze/) runs the face cascade every
+# VIDEO_DETECT_EVERY processed frames and on scene changes (grayscale
+# histogram correlation below VIDEO_SCENE_THRESHOLD); faces are followed by
+# template matching in between and dropped when the match scores below
+# VIDEO_TRACK_MIN_SCORE. Progress is saved every VIDEO_PROGRESS_EVERY frames.
+VIDEO_DETECT_EVERY = 10
+VIDEO_SCENE_THRESHOLD = 0.7
+VIDEO_TRACK_MIN_SCORE = 0.5
+VIDEO_MAX_FRAMES = 18000
+VIDEO_MAX_UPLOAD_SIZE = 200 * 1024 * 1024  # 200MB
+VIDEO_PROGRESS_EVERY = 25
+# The synchronous (streamed) path has to finish inside gunicorn's 120s
+# timeout: clips planned at more than VIDEO_SYNC_MAX_FRAMES frames need
+# async_processing, and a stream is cut off (row marked failed) after
+# VIDEO_SYNC_TIME_BUDGET seconds. Uploads and results expire with
+# the image analyses (cleanup_old_images).
+VIDEO_SYNC_MAX_FRAMES = 600
+VIDEO_SYNC_TIME_BUDGET = 90
+
+# Burst best-shot selection (/api/images/best-shot/) detects faces once, on
+# the first frame downscaled to BURST_DETECTION_MAX_SIDE, and finds them in
+# the other frames by template matching (dropped below BURST_TRACK_MIN_SCORE).
+BURST_MAX_FRAMES = 20
+BURST_DETECTION_MAX_SIDE = 640
+BURST_TRACK_MIN_SCORE = 0.5
+
+# Resized variants (/api/images/<id>/variant/?size=&format=) are rendered once
+# into VARIANT_CACHE_DIR; past VARIANT_CACHE_MAX_BYTES the least recently used
+# are evicted. Only VARIANT_SIZES (longest side) are served, and each format
+# maps to the encoding profile it is written with.
+VARIANT_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'variants')
+VARIANT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+VARIANT_CACHE_MAX_AGE = 86400
+VARIANT_SIZES = [64, 128, 256, 512, 1024, 2048]
+VARIANT_FORMATS = {
+    'jpeg': 'jpeg-web',
+    'webp': 'webp',
+    'png': 'png',
+}
+
+# cleanup_old_images deletes expired analyses in batches of CLEANUP_BATCH_SIZE
+# rows, unlinking their files on CLEANUP_UNLINK_WORKERS threads, and stops
+# after CLEANUP_TIME_BUDGET seconds; the next run resumes from a checkpoint.
+CLEANUP_BATCH_SIZE = 500
+CLEANUP_UNLINK_WORKERS = 8
+CLEANUP_TIME_BUDGET = 600
+# Only one run at a time works from the checkpoint. A run claims it for
+# CLEANUP_LOCK_TIMEOUT seconds, renewed every batch; others skip meanwhile.
+CLEANUP_LOCK_TIMEOUT = 900
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'basic': {
@@ -0,0 +1,44 @@
+import os
+import shutil
+
+from api.services.cpu_budget import apply_cpu_budget, plan_cpu_budget
+
+# Requests spend much of their time on I/O (10 MB uploads, NDJSON and video
+# streams), so a small CPU quota must not leave a single worker that one slow
+# client can hold up. Keep at least 4 threaded workers (GUNICORN_WORKERS and
+# GUNICORN_THREADS override) and let the CPU budget limit only OpenCV:
+# each worker gets cpus // workers OpenCV threads, at least one.
+MIN_WORKERS = 4
+
+cpu_budget = plan_cpu_budget(
+    workers=int(os.environ.get('GUNICORN_WORKERS', 0)) or max(plan_cpu_budget().workers, MIN_WORKERS)
+)
+
+bind = '0.0.0.0:8000'
+workers = cpu_budget.workers
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+timeout = 120
+
+# Workers write Prometheus samples here so /metrics can aggregate all of them.
+# Must be set before any worker imports prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/face_blur_metrics/web')
+
+
+def on_starting(server):
+    """Start every deployment with empty metric files"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    """Warm the analysis services in every worker before it accepts requests"""
+    from api.services import preload_services
+    apply_cpu_budget(cpu_budget)
+    preload_services()
+
+
+def child_exit(server, worker):
+    from api.metrics import mark_process_dead
+    mark_process_dead(worker.pid)